@@ -16,6 +16,9 @@ if __name__ == '__main__':
         login_user,
         upsert_vectors,
         gen_systematic_review,
-        gen_quality_check
+        gen_quality_check,
+        jobs
     )
+    from services.job_worker_service import start_job_workers
+    start_job_workers()
     app.run(port=5000)
\ No newline at end of file
@@ -15,16 +15,38 @@ SPEC_CLOUD = 'aws'
 SPEC_REGION = 'us-east-1'
 VECTOR_DIMENSION = 1536  # OpenAI Embeddings dimension
 
+# Vector store backend: 'pinecone', or 'local' for an in-process index that works offline
+VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'pinecone')
+# Namespace layout: 'paper' stores each paper's section in its own namespace; 'tenant' stores all of a
+# user's papers in one namespace and tells papers and sections apart by metadata filters
+VECTOR_LAYOUT = os.getenv('VECTOR_LAYOUT', 'paper')
+TENANT_QUERY_MAX_TOP_K = 1000  # Pinecone's limit for queries returning metadata
+LOCAL_SEGMENT_MAX_ROWS = 65536  # Vectors per append-only segment file
+LOCAL_COMPACT_MIN_DEAD_ROWS = 4096  # Segments are rewritten once this many superseded or deleted rows outnumber the live ones
+# Namespaces this large are searched on int8 codes, re-scoring top_k * LOCAL_RESCORE_FACTOR candidates exactly
+LOCAL_QUANTIZED_SEARCH_MIN_VECTORS = 50000
+LOCAL_RESCORE_FACTOR = 4
+# Serve queries from a local mmap copy of every vector written to Pinecone. Namespaces with
+# writes made while this was off are not complete locally and keep being queried remotely.
+PINECONE_LOCAL_MIRROR = os.getenv('PINECONE_LOCAL_MIRROR', '0') == '1'
+
 # MySQL Initialisation
 MYSQL_HOST = 'localhost'
 MYSQL_USER = 'root'
 MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD')
 DATABASE_NAME = 'user_data'
 
-pinecone = Pinecone(api_key=PINECONE_API_KEY)
+# Concurrent Pinecone queries per retrieval session (one per paper and section)
+RETRIEVAL_CONCURRENCY = 16
+# Parallel upsert requests per batched write
+UPSERT_CONCURRENCY = 8
+# Connections kept alive per shared index handle, enough for the busier of the two
+PINECONE_POOL_SIZE = max(RETRIEVAL_CONCURRENCY, UPSERT_CONCURRENCY)
+pinecone = Pinecone(api_key=PINECONE_API_KEY, connection_pool_maxsize=PINECONE_POOL_SIZE)
 embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+LLM_MODEL_NAME = 'gpt-3.5-turbo'
 model = ChatOpenAI(api_key=OPENAI_API_KEY, 
-                  model='gpt-3.5-turbo',
+                  model=LLM_MODEL_NAME,
                   temperature=0)
 
 # Load BERT model for similarity-based filtering
@@ -39,5 +61,82 @@ SECTION_LENGTH_LIMITS = {
     'Conclusion': 600, 
 }
 
-# Define the character limit for each section for use in context prompt
-SECTION_CHAR_LIMIT = 2000
\ No newline at end of file
+# Token budgets of the section prompts, counted with the model's tokenizer
+LLM_CONTEXT_WINDOW = 16385  # gpt-3.5-turbo
+LLM_MAX_OUTPUT_TOKENS = 4096
+TOKENS_PER_WORD = 1.35  # Turns the word limits above into max output tokens
+OUTPUT_TOKEN_HEADROOM = 0.25  # Extra share of tokens above the word limit so a section is not cut off mid-sentence
+SECTION_CONTEXT_TOKEN_BUDGET = 8000  # Most tokens of earlier sections and research chunks in one prompt
+PREVIOUS_SECTIONS_TOKEN_SHARE = 0.25  # Part of that budget given to earlier sections, before the chunks
+
+# Number of worker processes used to extract and split uploaded PDFs
+PDF_WORKERS = os.cpu_count() or 1
+
+# PDFs at least this large are streamed page by page instead of parsed whole
+PDF_STREAMING_MIN_BYTES = 16 * 1024 * 1024
+PDF_STREAMING_BATCH = 256  # Chunks of a streamed PDF labelled, embedded and stored at a time
+
+# Local on-disk caches
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+PDF_CACHE_DIR = os.path.join(CACHE_DIR, 'pdf_text')
+PDF_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Oldest extractions are evicted beyond this size
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, 'embeddings.sqlite3')
+EMBEDDING_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # Least recently used vectors are evicted beyond this size
+EMBEDDING_CACHE_DTYPE = 'float16'  # 'float32' keeps full precision at twice the size
+EMBEDDING_MEMORY_CACHE_SIZE = 4096  # Hot vectors also kept in memory
+LOCAL_VECTOR_STORE_DIR = os.path.join(CACHE_DIR, 'vectors')  # Segment files of the local store and the Pinecone mirror
+INGEST_MANIFEST_DIR = os.path.join(CACHE_DIR, 'ingest_manifest')  # Per-paper record of stored chunk hashes
+LEXICAL_INDEX_PATH = os.path.join(CACHE_DIR, 'lexical_index.sqlite3')  # BM25 inverted index over chunk text
+
+# Seconds before the in-process namespace catalog is reconciled with the index stats in the background
+CORPUS_CATALOG_TTL = 300
+CORPUS_CATALOG_STATS_LAG = 60  # Seconds the index stats may trail our own writes; namespaces written since keep their local count
+CORPUS_CATALOG_STAMP_PATH = os.path.join(CACHE_DIR, 'corpus_catalog.stamp')  # Rewritten when papers finish storing; other processes then reload their catalog
+
+# Hybrid retrieval: BM25 over the chunk text blended with the dense cosine scores
+HYBRID_SEARCH = os.getenv('HYBRID_SEARCH', '1') == '1'
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_SATURATION = 5.0  # BM25 score that counts as half a full keyword match
+LEXICAL_WEIGHT = 0.3
+SECTION_RETRIEVAL_TOP_K = 40  # Candidate chunks retrieved across all papers for each review section
+SECTION_CONTEXT_CHUNKS = 20  # Candidates selected for the section prompt
+# Each paper is queried for at most RETRIEVAL_PAPER_QUOTA_FACTOR times its even share of a
+# section's chunks (never fewer than RETRIEVAL_MIN_PER_PAPER) and may contribute no more
+RETRIEVAL_PAPER_QUOTA_FACTOR = 2
+RETRIEVAL_MIN_PER_PAPER = 5
+
+# Candidate selection: maximal marginal relevance with near-duplicate suppression
+MMR_LAMBDA = 0.7  # 1.0 ranks by relevance alone, lower values favour diversity
+SHINGLE_SIZE = 5  # Words per shingle
+NEAR_DUPLICATE_OVERLAP = 0.6  # Share of a chunk's shingles found in a selected chunk that makes it a duplicate
+
+# Background jobs: SQLite queue shared by the web server and worker processes
+JOB_DB_PATH = os.path.join(CACHE_DIR, 'jobs.sqlite3')
+JOB_WORKERS = 2
+JOB_POLL_INTERVAL = 1  # Seconds an idle worker waits before checking the queue again
+JOB_SHUTDOWN_TIMEOUT = 30  # Seconds workers get to finish their current job on shutdown; unfinished jobs are requeued on the next start
+
+# Batched Pinecone upserts: vectors per request, request size cap, requests in flight and retries
+UPSERT_BATCH_SIZE = 100
+UPSERT_MAX_REQUEST_BYTES = 2 * 1024 * 1024
+UPSERT_MAX_IN_FLIGHT = 16
+UPSERT_RETRIES = 3
+FETCH_BATCH_SIZE = 1000  # IDs per fetch request; Pinecone rejects larger fetches
+WRITE_OVERLAY_MAX_VECTORS = 20000  # Recently written vectors served locally until the index confirms them
+WRITE_CONFIRM_TIMEOUT = 60  # Seconds an upsert job waits for the index to serve its writes before reporting done
+WRITE_CONFIRM_INTERVAL = 1  # Seconds between confirmation checks
+
+# Batched embedding requests: OpenAI allows up to 300k tokens and 2048 inputs per request
+EMBEDDING_BATCH_TOKEN_LIMIT = 200000
+EMBEDDING_BATCH_MAX_INPUTS = 1000
+EMBEDDING_CONCURRENCY = 4
+
+# Batched LLM section classification: chunk tokens per request and chunks per request
+LLM_CLASSIFY_TOKEN_BUDGET = 6000
+LLM_CLASSIFY_MAX_BATCH = 25
+
+# Local section classifier: chunks scored below this confidence are sent to the LLM
+SECTION_LABEL_CACHE_PATH = os.path.join(CACHE_DIR, 'section_labels.jsonl')
+SECTION_LABEL_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Compacted to the most recent labels beyond this size
+LOCAL_CLASSIFIER_MIN_CONFIDENCE = 0.6
\ No newline at end of file
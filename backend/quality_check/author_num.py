@@ -1,6 +1,5 @@
 import os
 import re
-import pdfplumber
 import pandas as pd
 import matplotlib
 matplotlib.use('Agg')
@@ -8,16 +7,10 @@ import matplotlib.pyplot as plt
 from collections import Counter
 from langchain.schema import SystemMessage, HumanMessage
 from config import model
+from utils.pdf_util import parse_pdf, parse_pdfs
 
 def extract_first_pages(pdf_path, max_pages=2):
-    text = ''
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for i in range(min(max_pages, len(pdf.pages))):
-                text += pdf.pages[i].extract_text() + '\n'
-    except Exception as e:
-        print(f'Error reading {pdf_path}: {e}')
-    return text
+    return parse_pdf(pdf_path).first_pages_text(max_pages)
 
 def extract_author_section(text):
     abstract_keywords = ['Abstract', 'ABSTRACT']
@@ -71,14 +64,16 @@ def get_authors_from_langchain(text):
         return []
 
 def process_pdfs(pdf_folder):
+    return process_documents(parse_pdfs(pdf_folder))
+
+def process_documents(documents):
+    '''Counts authors across already parsed documents.'''
     author_counter = Counter()
-    for file in os.listdir(pdf_folder):
-        if file.endswith('.pdf'):
-            pdf_path = os.path.join(pdf_folder, file)
-            full_text = extract_first_pages(pdf_path, max_pages=2)
-            author_text = extract_author_section(full_text)
-            authors = get_authors_from_langchain(author_text)
-            author_counter.update(authors)
+    for document in documents:
+        full_text = document.first_pages_text(max_pages=2)
+        author_text = extract_author_section(full_text)
+        authors = get_authors_from_langchain(author_text)
+        author_counter.update(authors)
     return author_counter
 
 def save_and_plot_results(author_counts, id, output_image='author_counts.png'):
@@ -6,13 +6,13 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
-import pdfplumber
 from wordcloud import WordCloud
 from langchain.schema import HumanMessage
 import chardet
 from collections import Counter
 from tenacity import retry, stop_after_attempt, wait_random
 from config import model
+from utils.pdf_util import parse_pdf
 
 # Detect OS and set font path
 if platform.system() == 'Windows':
@@ -29,24 +29,16 @@ MEDICAL_STOPWORDS = {
     'conclusion', 'introduction', 'background', 'objective', 'purpose'
 }
 
-def load_documents(folder_path):
+def load_documents(folder_path, parsed_documents=None):
+    '''Loads document texts from a folder, reusing any PDFs that were already parsed.'''
+    parsed = {os.path.abspath(doc.path): doc for doc in parsed_documents or []}
     documents = []
     for file_name in os.listdir(folder_path):
         file_path = os.path.join(folder_path, file_name)
         try:
             if file_name.lower().endswith('.pdf'):
-                with pdfplumber.open(file_path) as pdf:
-                    text_pages = []
-                    for page in pdf.pages:
-                        raw_text = page.extract_text()
-                        if raw_text:
-                            cleaned = '\n'.join(
-                                line for line in raw_text.split('\n')
-                                if not line.strip().isdigit()
-                                and not line.startswith('Received:')
-                            )
-                            text_pages.append(cleaned)
-                    documents.append('\n'.join(text_pages))
+                document = parsed.get(os.path.abspath(file_path)) or parse_pdf(file_path)
+                documents.append(document.thematic_text())
             elif file_name.lower().endswith(('.txt', '.md')):
                 with open(file_path, 'rb') as f:
                     raw_data = f.read()
@@ -1,15 +1,5 @@
-from services.pinecone_service import search_pinecone, get_all_paper_ids
-from utils.truncate_previous_sections import _get_fixed_limit_previous_sections
-from utils.get_files import get_files
-from utils.store_as_pdf import store_pdf
-from services.section_prompts_service import (
-  generate_background_section,
-  generate_methods_section,
-  generate_results_section,
-  generate_discussion_section,
-  generate_conclusion_section
-)
-from config import SECTION_CHAR_LIMIT
+from services.review_service import generate_systematic_review
+from services.job_queue_service import enqueue_job
 from flask import jsonify, request
 from __main__ import app
 
@@ -29,65 +19,12 @@ def generate_full_systematic_review():
 
     if not isinstance(query, str) or not query.strip():
         return jsonify({"error": "Prompt cannot be empty."}), 400
-    
-    
-    paper_ids = [paper for paper in get_files(id)]
-
-    systematic_review = {}  # Dictionary to store all generated sections
-
-    
-    
-
-    print('🔍 Generating Background section...')
-    background_results = search_pinecone(query, paper_ids=paper_ids, section='Background', top_k=50)
-    systematic_review['Background'] = generate_background_section(
-        results=background_results,
-        query=query,
-        chunk_size=30,
-        previous_sections=[]
-    )
-
-    print('🔍 Generating Methods section...')
-    methods_results = search_pinecone(query, paper_ids=paper_ids, section='Methods', top_k=50)
-    systematic_review['Methods'] = generate_methods_section(
-        results=methods_results,
-        query=query,
-        chunk_size=30,
-        previous_sections=_get_fixed_limit_previous_sections(systematic_review, SECTION_CHAR_LIMIT)
-    )
-
-    print('🔍 Generating Results section...')
-    results_results = search_pinecone(query, paper_ids=paper_ids, section='Results', top_k=50)
-    systematic_review['Results'] = generate_results_section(
-        results=results_results,
-        query=query,
-        chunk_size=30,
-        previous_sections=_get_fixed_limit_previous_sections(systematic_review, SECTION_CHAR_LIMIT)
-    )
-
-    print('🔍 Generating Discussion section...')
-    discussion_results = search_pinecone(query, paper_ids=paper_ids, section='Discussion', top_k=50)
-    systematic_review['Discussion'] = generate_discussion_section(
-        results=discussion_results,
-        query=query,
-        chunk_size=30,
-        previous_sections=_get_fixed_limit_previous_sections(systematic_review, SECTION_CHAR_LIMIT)
-    )
-
-    print('🔍 Generating Conclusion section...')
-    conclusion_results = search_pinecone(query, paper_ids=paper_ids, section='Conclusion', top_k=50)
-    systematic_review['Conclusion'] = generate_conclusion_section(
-        results=conclusion_results,
-        query=query,
-        chunk_size=30,
-        previous_sections=_get_fixed_limit_previous_sections(systematic_review, SECTION_CHAR_LIMIT)
-    )
 
-    # Join all sections into one
-    combined_sections = ''.join(systematic_review[section] + '\n' for section in systematic_review).replace('---', '')
+    # ✅ Opt-in background mode: return a job ID straight away and poll /api/jobs/<job_id>
+    if data.get('async'):
+        job_id = enqueue_job('generate', {'prompt': query, 'id': id})
+        return jsonify({'job_id': job_id, 'status_url': f'/api/jobs/{job_id}'}), 202
 
-    store_pdf(text=combined_sections[:-1], id=id)
-    print(f'Systematic Review: {combined_sections[:-1]}')
+    systematic_review = generate_systematic_review(query=query, id=id)
 
-    # Remove last '\n'
-    return jsonify({'systematic_review': combined_sections[:-1]}), 200 
\ No newline at end of file
+    return jsonify({'systematic_review': systematic_review}), 200 
@@ -0,0 +1,21 @@
+from services.job_queue_service import get_job
+from flask import jsonify
+from __main__ import app
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+  '''Reports the stage, progress and result of a background job.'''
+  job = get_job(job_id)
+
+  if job is None:
+    return jsonify({'error': 'Job not found'}), 404
+
+  return jsonify({
+    'job_id': job['id'],
+    'kind': job['kind'],
+    'status': job['status'],
+    'stage': job['stage'],
+    'progress': job['progress'],
+    'result': job['result'],
+    'error': job['error']
+  }), 200
@@ -1,6 +1,7 @@
 from services.pinecone_service import initialise_pinecone
 from services.pdf_processing_service import process_and_store_all_pdfs
-from services.check_upserts_service import check_all_upserted_chunks
+from services.job_queue_service import enqueue_job
+from services.corpus_catalog_service import invalidate_catalog
 from flask import request, jsonify
 from __main__ import app
 
@@ -9,11 +10,18 @@ def init_pinecone():
   data = request.json
   id = data.get('id')
 
+  # ✅ Opt-in background mode: return a job ID straight away and poll /api/jobs/<job_id>
+  if data.get('async'):
+    job_id = enqueue_job('upsert', {'id': id})
+    return jsonify({'job_id': job_id, 'status_url': f'/api/jobs/{job_id}'}), 202
+
   try:
     initialise_pinecone()
+    # Acknowledged writes are served from the write overlay until the index catches up, so no need to wait here
     text_chunks_count, files = process_and_store_all_pdfs(id)
-    check_all_upserted_chunks(files=files, chunks_count=text_chunks_count)
-    
+    invalidate_catalog()  # Job workers keep their own catalog of stored papers
+    print(f'✅ {text_chunks_count} chunks from {len(files)} files are ready for querying')
+
   except Exception as e:
     print(f"Error: {e}")
     return jsonify({'error': str(e)}), 500
@@ -0,0 +1,81 @@
+import re
+import zlib
+import numpy as np
+from config import MMR_LAMBDA, SHINGLE_SIZE, NEAR_DUPLICATE_OVERLAP
+
+def _shingles(text, size):
+    '''Hashed word n-grams of a text; texts shorter than `size` words give one shingle.'''
+    words = re.findall(r'\w+', text.lower())
+    grams = [' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))]
+    return {zlib.crc32(gram.encode('utf-8')) for gram in grams if gram}
+
+def shingle_overlap(texts, size=None):
+    '''
+    (n x n) matrix of shingle containment |A ∩ B| / min(|A|, |B|): 1.0 when one text
+    repeats the other, high for chunks that restate the same sentences.
+    '''
+    size = size or SHINGLE_SIZE
+    sets = [_shingles(text, size) for text in texts]
+    vocabulary = {}
+    rows, columns = [], []
+    for row, shingles in enumerate(sets):
+        for shingle in shingles:
+            rows.append(row)
+            columns.append(vocabulary.setdefault(shingle, len(vocabulary)))
+
+    incidence = np.zeros((len(texts), max(len(vocabulary), 1)), dtype=np.float32)
+    incidence[rows, columns] = 1
+    shared = incidence @ incidence.T
+    sizes = incidence.sum(axis=1)
+    smaller = np.minimum(sizes[:, None], sizes[None, :])
+    return np.divide(shared, smaller, out=np.zeros_like(shared), where=smaller > 0)
+
+def _unit_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+def select_diverse_matches(matches, k, mmr_lambda=None, max_overlap=None):
+    '''
+    Picks `k` of the score-ordered retrieval `matches` by maximal marginal relevance:
+    each pick maximises mmr_lambda * score - (1 - mmr_lambda) * similarity to the chunks
+    already picked. Chunks whose shingles overlap a picked chunk by `max_overlap` or
+    more are near-duplicates (chunk overlap, findings repeated across papers) and are
+    never picked. Similarity uses the vectors retrieval returned in each match's
+    'values'; a match without one (a keyword-only hit) is ranked by relevance alone.
+    '''
+    mmr_lambda = MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+    max_overlap = NEAR_DUPLICATE_OVERLAP if max_overlap is None else max_overlap
+    if len(matches) <= 1 or k <= 0:
+        return matches[:k]
+
+    texts = [match['text'] for match in matches]
+    similarity = np.zeros((len(matches), len(matches)), dtype=np.float32)
+    known = [i for i, match in enumerate(matches) if match.get('values')]
+    if known:
+        vectors = _unit_rows([matches[i]['values'] for i in known])
+        similarity[np.ix_(known, known)] = vectors @ vectors.T
+    overlap = shingle_overlap(texts)
+    relevance = np.asarray([match['score'] for match in matches], dtype=np.float32)
+
+    # Running maxima against the picked set, updated with one row per pick
+    max_similarity = np.full(len(matches), -np.inf, dtype=np.float32)
+    max_overlap_seen = np.zeros(len(matches), dtype=np.float32)
+    available = np.ones(len(matches), dtype=bool)
+    picked = []
+    while len(picked) < k:
+        redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0)
+        mmr = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        mmr[~available | (max_overlap_seen >= max_overlap)] = -np.inf
+        best = int(np.argmax(mmr))
+        if not np.isfinite(mmr[best]):
+            break
+        picked.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+        max_overlap_seen = np.maximum(max_overlap_seen, overlap[best])
+
+    duplicates = int((available & (max_overlap_seen >= max_overlap)).sum())
+    print(f'🔍 Selected {len(picked)}/{len(matches)} chunks, {duplicates} near-duplicates dropped')
+    return [matches[i] for i in picked]
@@ -1,4 +1,9 @@
-from config import model
+import json
+from concurrent.futures import ThreadPoolExecutor
+from config import model, LLM_CLASSIFY_TOKEN_BUDGET, LLM_CLASSIFY_MAX_BATCH
+from utils.token_util import batch_by_tokens
+
+VALID_SECTIONS = {'Background', 'Methods', 'Results', 'Discussion', 'Conclusion'}
 
 def classify_chunk_with_llm(chunk_text):
     '''Classifies a text chunk into Background, Methods, Results, Discussion, or Conclusion using LLM.'''
@@ -23,11 +28,97 @@ def classify_chunk_with_llm(chunk_text):
 
     try:
         response = model.invoke(prompt).content.strip()
-        valid_sections = {'Background', 'Methods', 'Results', 'Discussion', 'Conclusion'}
         
-        classification = response if response in valid_sections else 'Background'
+        classification = response if response in VALID_SECTIONS else 'Background'
         # print(f'✅ LLM classified chunk as "{classification}"')
         return classification
     except Exception as e:
         print(f'⚠️ LLM classification failed: {e}. Defaulting to "Background".')
-        return 'Background'
\ No newline at end of file
+        return 'Background'
+
+def make_classification_batches(chunks, token_budget=None, max_batch_size=None):
+    '''Groups chunk indices into batches whose combined token count fits the token budget.'''
+    return batch_by_tokens(
+        chunks,
+        token_budget or LLM_CLASSIFY_TOKEN_BUDGET,
+        max_batch_size or LLM_CLASSIFY_MAX_BATCH
+    )
+
+def _parse_batch_labels(response, expected_count):
+    '''Parses a JSON reply into a list of section names, or returns None if it does not match the batch.'''
+    start, end = response.find('{'), response.rfind('}')
+    if start == -1 or end == -1:
+        start, end = response.find('['), response.rfind(']')
+    if start == -1 or end == -1:
+        return None
+
+    try:
+        parsed = json.loads(response[start:end + 1])
+    except ValueError:
+        return None
+    labels = parsed.get('sections') if isinstance(parsed, dict) else parsed
+
+    if not isinstance(labels, list) or len(labels) != expected_count:
+        return None
+    return [label.strip() if isinstance(label, str) and label.strip() in VALID_SECTIONS else 'Background'
+            for label in labels]
+
+def classify_chunk_batch_with_llm(chunks):
+    '''
+    Classifies several chunks with a single LLM request that returns a JSON list of sections.
+    If the reply cannot be parsed, the batch is split in half and each half retried;
+    a single chunk falls back to `classify_chunk_with_llm`. If the request itself fails,
+    smaller requests would fail the same way, so the batch defaults to "Background".
+    '''
+    if not chunks:
+        return []
+    if len(chunks) == 1:
+        return [classify_chunk_with_llm(chunks[0])]
+
+    excerpts = '\n\n'.join(f'---CHUNK {i + 1}---\n{chunk}' for i, chunk in enumerate(chunks))
+    prompt = f'''
+    You are an AI assistant classifying research paper sections.
+    Below are {len(chunks)} numbered excerpts from scientific papers.
+    For each excerpt, determine whether it belongs to one of these sections:
+    - Background
+    - Methods
+    - Results
+    - Discussion
+    - Conclusion
+
+    If uncertain, choose the most relevant section.
+
+    {excerpts}
+    ------------------
+
+    Output only a JSON object of the form {{"sections": ["<section for chunk 1>", "<section for chunk 2>", ...]}}
+    with exactly {len(chunks)} section names, in the same order as the excerpts.
+    '''
+
+    try:
+        response = model.invoke(prompt, response_format={'type': 'json_object'}).content
+    except Exception as e:
+        print(f'⚠️ Batch LLM classification failed: {e}. Defaulting {len(chunks)} chunks to "Background".')
+        return ['Background'] * len(chunks)
+
+    labels = _parse_batch_labels(response, len(chunks))
+    if labels is not None:
+        return labels
+
+    print(f'⚠️ Could not parse labels for a batch of {len(chunks)} chunks. Splitting and retrying.')
+    middle = len(chunks) // 2
+    return classify_chunk_batch_with_llm(chunks[:middle]) + classify_chunk_batch_with_llm(chunks[middle:])
+
+def classify_chunks_with_llm(chunks):
+    '''Classifies chunks with as few LLM requests as the token budget allows, sending batches in parallel.'''
+    batches = make_classification_batches(chunks)
+    labels = [None] * len(chunks)
+
+    with ThreadPoolExecutor() as executor:
+        batch_labels = executor.map(classify_chunk_batch_with_llm, [[chunks[i] for i in batch] for batch in batches])
+        for batch, sections in zip(batches, batch_labels):
+            for i, section in zip(batch, sections):
+                labels[i] = section
+
+    print(f'🔍 LLM classified {len(chunks)} chunks in {len(batches)} batch requests')
+    return labels
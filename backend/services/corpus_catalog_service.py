@@ -0,0 +1,148 @@
+import os
+import uuid
+import threading
+import time
+from config import CORPUS_CATALOG_TTL, CORPUS_CATALOG_STATS_LAG, CORPUS_CATALOG_STAMP_PATH
+from services.index_provider_service import get_index
+
+# In-process catalog of namespace -> vector count for the default index. Our own
+# upserts and deletes keep it current; `describe_index_stats` scans every namespace,
+# so the remote stats are only read on first use and then reconciled in the
+# background once the catalog is older than CORPUS_CATALOG_TTL. Writes by other processes
+# are announced through the stamp file, which makes every other process reload its catalog.
+_namespaces = {}
+_loaded_at = None
+_changed_at = {}  # namespace -> when this process last changed it; stats may not show that change yet
+_refresh_thread = None
+_stamp_seen = None
+_lock = threading.Lock()
+
+def _apply(namespace, delta):
+    _changed_at[namespace] = time.monotonic()
+    count = _namespaces.get(namespace, 0) + delta
+    if count > 0:
+        _namespaces[namespace] = count
+    else:
+        _namespaces.pop(namespace, None)
+
+def record_upserts(namespace, ids):
+    '''Counts vectors written by this process; re-written IDs are corrected by the next reconcile.'''
+    with _lock:
+        _apply(namespace, len(ids))
+
+def record_deletes(namespace, ids):
+    with _lock:
+        _apply(namespace, -len(ids))
+
+def _reconcile(index):
+    '''Reads the index stats, keeping the local count of namespaces changed too recently for them.'''
+    global _namespaces, _loaded_at
+    try:
+        started = time.monotonic()
+        with _lock:
+            loaded = _loaded_at is not None
+            before = dict(_namespaces)
+        stats = (index or get_index()).describe_index_stats()
+        with _lock:
+            namespaces = {
+                namespace: summary.get('vector_count', 0)
+                for namespace, summary in stats.get('namespaces', {}).items()
+            }
+            # Stats lag recent writes: namespaces this process changed shortly before the
+            # snapshot keep their local count, which already includes changes made since
+            for namespace, changed_at in list(_changed_at.items()):
+                if changed_at < started - CORPUS_CATALOG_STATS_LAG:
+                    del _changed_at[namespace]
+                    continue
+                if loaded:
+                    count = _namespaces.get(namespace, 0)
+                elif changed_at >= started:
+                    # Before the first load only the changes made while the stats were read are known
+                    count = namespaces.get(namespace, 0) + _namespaces.get(namespace, 0) - before.get(namespace, 0)
+                else:
+                    continue
+                if count > 0:
+                    namespaces[namespace] = count
+                else:
+                    namespaces.pop(namespace, None)
+            _namespaces = namespaces
+            _loaded_at = time.monotonic()
+    except Exception as e:
+        print(f'⚠️ Failed to reconcile the corpus catalog: {e}')
+        with _lock:
+            if _loaded_at is not None:
+                _loaded_at = time.monotonic()  # Keep serving the catalog; retry after another TTL
+
+def refresh_catalog(index=None):
+    '''Replaces the catalog with the index's stats, keeping changes they may not show yet.'''
+    _reconcile(index)
+
+def _refresh_in_background(index):
+    global _refresh_thread
+    try:
+        _reconcile(index)
+    finally:
+        _refresh_thread = None
+
+def _read_stamp():
+    try:
+        with open(CORPUS_CATALOG_STAMP_PATH, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def invalidate_catalog():
+    '''
+    Tells every other process that the stored corpus changed, e.g. once a job finished storing
+    papers; each reloads its catalog from the index stats on its next read. This process's
+    catalog already counts its own writes and is kept.
+    '''
+    global _stamp_seen
+    stamp = uuid.uuid4().hex
+    tmp_path = f'{CORPUS_CATALOG_STAMP_PATH}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(CORPUS_CATALOG_STAMP_PATH), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(stamp)
+        os.replace(tmp_path, CORPUS_CATALOG_STAMP_PATH)
+        _stamp_seen = stamp
+    except OSError as e:
+        print(f'⚠️ Failed to invalidate the corpus catalog of other processes: {e}')
+
+def _ensure_fresh(index):
+    global _refresh_thread, _stamp_seen
+    stamp = _read_stamp()
+    if stamp != _stamp_seen:
+        # Another process stored papers since this catalog was loaded
+        _stamp_seen = stamp
+        reset_catalog()
+    if _loaded_at is None:
+        refresh_catalog(index)
+    elif time.monotonic() - _loaded_at > CORPUS_CATALOG_TTL:
+        with _lock:
+            if _refresh_thread is None:
+                _refresh_thread = threading.Thread(target=_refresh_in_background, args=(index,), daemon=True)
+                _refresh_thread.start()
+
+def catalog_namespaces(index=None):
+    '''
+    Returns {namespace: vector count}. Only the first call waits for the index stats;
+    after the TTL, stale reads return the catalog at once and reconcile in a background thread.
+    '''
+    _ensure_fresh(index)
+    with _lock:
+        return dict(_namespaces)
+
+def namespace_count(namespace, index=None):
+    '''Vector count of one namespace, 0 if it is empty or unknown.'''
+    _ensure_fresh(index)
+    with _lock:
+        return _namespaces.get(namespace, 0)
+
+def reset_catalog():
+    '''Forgets the catalog so the next read loads the index stats again, e.g. after the index is recreated.'''
+    global _namespaces, _loaded_at
+    with _lock:
+        _namespaces = {}
+        _changed_at.clear()
+        _loaded_at = None
@@ -1,6 +1,8 @@
 import textwrap
 from sentence_transformers import util
-from config import model, bert_model, SECTION_LENGTH_LIMITS
+from config import model, bert_model, SECTION_LENGTH_LIMITS, LLM_MODEL_NAME
+from utils.token_util import count_tokens
+from utils.context_packer import max_output_tokens, context_token_budget, pack_context
 
 def generate_section(results, query, section_title, section_prompt, 
                      previous_sections=None, chunk_size=30, similarity_threshold=0.8):
@@ -9,7 +11,8 @@ def generate_section(results, query, section_title, section_prompt,
     - **Context awareness** (previously generated sections as input)
     - **De-duplication** (removes redundant content using BERT-based similarity checking)
     - **Smooth transitions** (AI is explicitly instructed to generate transition sentences)
-    - **Flexible length control** (section-specific length limits)
+    - **Flexible length control** (section-specific length limits, enforced as max output tokens)
+    - **Token-budgeted context** (earlier sections and ranked chunks packed to fit the context window)
     
     Parameters:
     - results: Research data in chunks
@@ -18,7 +21,7 @@ def generate_section(results, query, section_title, section_prompt,
     - section_title: The title of the section being generated
     - section_prompt: Writing instructions for the section
     - previous_sections: Previously generated sections (to enhance continuity)
-    - chunk_size: Number of data chunks to use for context
+    - chunk_size: Most data chunks to use for context, in ranked order
     - similarity_threshold: Sentence similarity threshold for de-duplication
     '''
 
@@ -31,17 +34,8 @@ def generate_section(results, query, section_title, section_prompt,
     # Retrieve the max length for this section
     max_length = SECTION_LENGTH_LIMITS.get(section_title, 1500)  # Default to 1500 words if unspecified
 
-    # 1️⃣ **Context Expansion** (Use both research data and previously generated sections)
-    context_data = '\n\n'.join(results[:chunk_size]) if results else ''
-
-    # 🔥 Prevent `join()` from throwing errors by ensuring previous_sections is a list and does not contain non-string elements
-    previous_content = '\n\n'.join(str(s) for s in previous_sections) if previous_sections else ''
-
-    if previous_content:
-        context_data = previous_content + '\n\n' + context_data  # Append previous sections for better flow
-
-    # 2️⃣ **Construct the Prompt**
-    prompt = textwrap.dedent(f'''
+    # 1️⃣ **Construct the Prompt** (context filled in below)
+    prompt_template = textwrap.dedent(f'''
     # 📚 **Systematic Review Writing Task: {section_title}**
 
     You are an expert researcher conducting a **Systematic Review** following **PRISMA guidelines**. 
@@ -63,7 +57,7 @@ def generate_section(results, query, section_title, section_prompt,
     ```
 
     ```
-    {context_data}
+    {{context_data}}
     ```
 
     ## 🛠 **Instructions for Writing This Section**
@@ -75,15 +69,29 @@ def generate_section(results, query, section_title, section_prompt,
     ## 🎯 **Output Constraints**
 
     - **Format:** Use markdown headings and subheadings where ## will be the main heading and subheadings should be ###. 
-    - **Word Limit:** Aim for **{max_length} words**, prioritizing essential details.
+    - **Word Limit:** Write at most **{max_length} words**, prioritizing essential details, and finish the section within that limit.
     - **Clarity & Coherence:** Ensure smooth readability and logical consistency.
     - **MUST NOT:** Do not include in-text citations.
 
     ## 📝 **Now, generate the full {section_title} section:**
     ''')
 
+    # 2️⃣ **Context Packing** (query and instructions first, then earlier sections, then ranked research data)
+    output_tokens = max_output_tokens(max_length)
+    fixed_tokens = count_tokens(prompt_template.replace('{context_data}', ''), LLM_MODEL_NAME)
+    previous_content, research_data, context_tokens = pack_context(
+        context_token_budget(fixed_tokens, output_tokens),
+        previous_sections,
+        results[:chunk_size] if results else []
+    )
+    context_data = '\n\n'.join(part for part in (previous_content, research_data) if part)
+    prompt = prompt_template.replace('{context_data}', context_data)
+    print(f'🧮 {section_title} prompt: {fixed_tokens + context_tokens} tokens, up to {output_tokens} output tokens')
+
     try:
-        response = model.invoke(prompt).content if model else None
+        # ✅ The word limit caps generation itself instead of trimming text that was already paid for
+        llm = model.bind(max_tokens=output_tokens) if hasattr(model, 'bind') else model
+        response = llm.invoke(prompt).content if llm else None
 
         # 🔥 **Check if response is None**
         if response is None or not isinstance(response, str):
@@ -95,9 +103,6 @@ def generate_section(results, query, section_title, section_prompt,
         if not response:
             raise ValueError(f'Generated response is empty for {section_title}')
 
-        # Limit the text length based on the predefined constraints
-        response = response[:max_length * 6]  # Approximate conversion: 1 word ≈ 6 characters
-        
         # 4️⃣ **Deduplication Logic**
         generated_sentences = response.split('\n')
         unique_sentences = []
@@ -0,0 +1,53 @@
+import os
+import threading
+from config import (
+    pinecone,
+    PINECONE_INDEX_NAME,
+    VECTOR_STORE_BACKEND,
+    LOCAL_VECTOR_STORE_DIR,
+    PINECONE_LOCAL_MIRROR,
+    RETRIEVAL_CONCURRENCY,
+    UPSERT_CONCURRENCY
+)
+from services.vector_store_service import PineconeVectorStore, LocalVectorStore
+
+# One store per index name for the whole process. A Pinecone handle owns a keep-alive
+# HTTP connection pool, so reusing it avoids a connection setup (and a host lookup)
+# for every query and upsert.
+_indexes = {}
+_lock = threading.Lock()
+
+def _create_store(name):
+    directory = os.path.join(LOCAL_VECTOR_STORE_DIR, name)
+    if VECTOR_STORE_BACKEND == 'local':
+        return LocalVectorStore(directory=directory)
+    if VECTOR_STORE_BACKEND != 'pinecone':
+        raise ValueError(f'Unknown vector store backend: {VECTOR_STORE_BACKEND}')
+    # Sized for the widest fan-out: a retrieval session's queries or an ingest's upsert batches
+    index = pinecone.Index(name, pool_threads=max(RETRIEVAL_CONCURRENCY, UPSERT_CONCURRENCY))
+    if not PINECONE_LOCAL_MIRROR:
+        return PineconeVectorStore(index)
+    mirror = LocalVectorStore(directory=os.path.join(directory, 'mirror'))
+    # The corpus catalog counts the default index; other indexes keep their mirror for writes only
+    remote_count = None
+    if name == PINECONE_INDEX_NAME:
+        from services.corpus_catalog_service import namespace_count  # The catalog reads this module's index
+        remote_count = namespace_count
+    return PineconeVectorStore(index, mirror=mirror, remote_count=remote_count)
+
+def get_index(name=None):
+    '''Returns the shared VectorStore for an index, creating it on first use.'''
+    name = name or PINECONE_INDEX_NAME
+    index = _indexes.get(name)
+    if index is None:
+        with _lock:
+            index = _indexes.get(name)
+            if index is None:
+                index = _create_store(name)
+                _indexes[name] = index
+    return index
+
+def reset_index_pool():
+    '''Drops every shared store so the next `get_index` reconnects, e.g. after the index is recreated.'''
+    with _lock:
+        _indexes.clear()
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+from config import JOB_DB_PATH
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+
+def _connect():
+    os.makedirs(os.path.dirname(JOB_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(JOB_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS jobs ('
+        ' id TEXT PRIMARY KEY,'
+        ' kind TEXT NOT NULL,'
+        ' payload TEXT NOT NULL,'
+        ' status TEXT NOT NULL,'
+        ' stage TEXT,'
+        ' progress REAL NOT NULL DEFAULT 0,'
+        ' result TEXT,'
+        ' error TEXT,'
+        ' worker_pid INTEGER,'
+        ' created_at REAL NOT NULL,'
+        ' updated_at REAL NOT NULL)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)')
+    return conn
+
+def _to_dict(row):
+    return {
+        'id': row['id'],
+        'kind': row['kind'],
+        'payload': json.loads(row['payload']),
+        'status': row['status'],
+        'stage': row['stage'],
+        'progress': row['progress'],
+        'result': json.loads(row['result']) if row['result'] else None,
+        'error': row['error'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at']
+    }
+
+def enqueue_job(kind, payload):
+    '''Adds a job to the queue and returns its ID.'''
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT INTO jobs (id, kind, payload, status, stage, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, kind, json.dumps(payload), 'queued', 'queued', now, now)
+        )
+    finally:
+        conn.close()
+    print(f'📦 Queued {kind} job {job_id}')
+    return job_id
+
+def claim_next_job(worker_pid=None):
+    '''Atomically marks the oldest queued job as running and returns it, or None if the queue is empty.'''
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute('COMMIT')
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', stage = 'starting', worker_pid = ?, updated_at = ? WHERE id = ?",
+            (worker_pid or os.getpid(), time.time(), row['id'])
+        )
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    return get_job(row['id'])
+
+def _update(job_id, **fields):
+    fields['updated_at'] = time.time()
+    assignments = ', '.join(f'{name} = ?' for name in fields)
+    conn = _connect()
+    try:
+        conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+    finally:
+        conn.close()
+
+def update_job_progress(job_id, stage, progress):
+    _update(job_id, stage=stage, progress=max(0.0, min(1.0, float(progress))))
+
+def complete_job(job_id, result):
+    _update(job_id, status='succeeded', stage='done', progress=1.0, result=json.dumps(result))
+
+def fail_job(job_id, error):
+    _update(job_id, status='failed', stage='failed', error=str(error))
+
+def get_job(job_id):
+    '''Returns the job as a dict, or None if it does not exist.'''
+    conn = _connect()
+    try:
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _to_dict(row) if row else None
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        return True
+    return True
+
+def requeue_orphaned_jobs():
+    '''Puts running jobs whose worker process has died back in the queue. Returns how many were requeued.'''
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+        orphaned = [row['id'] for row in rows if not _pid_alive(row['worker_pid'])]
+        for job_id in orphaned:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'queued', progress = 0, worker_pid = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (time.time(), job_id)
+            )
+    finally:
+        conn.close()
+    if orphaned:
+        print(f'⚠️ Requeued {len(orphaned)} jobs left running by stopped workers')
+    return len(orphaned)
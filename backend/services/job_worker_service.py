@@ -0,0 +1,126 @@
+import os
+import time
+import signal
+import atexit
+import multiprocessing
+from config import JOB_WORKERS, JOB_POLL_INTERVAL, JOB_SHUTDOWN_TIMEOUT
+from services.job_queue_service import (
+    claim_next_job,
+    update_job_progress,
+    complete_job,
+    fail_job,
+    requeue_orphaned_jobs
+)
+from services.pinecone_service import initialise_pinecone
+from services.index_provider_service import get_index
+from services.write_overlay_service import wait_for_writes
+from services.corpus_catalog_service import invalidate_catalog
+from services.pdf_processing_service import process_and_store_all_pdfs
+from services.review_service import generate_systematic_review
+from services.quality_check_service import run_quality_check
+
+def _run_upsert(payload, progress):
+    initialise_pinecone()
+    text_chunks_count, files = process_and_store_all_pdfs(payload['id'], progress=progress)
+    # Other processes cannot see this worker's overlay, so the job is only done once the index serves the writes
+    progress('confirming writes', 1.0)
+    unconfirmed = wait_for_writes(get_index())
+    # Web and worker processes keep their own namespace catalog; make them pick up the new papers
+    invalidate_catalog()
+    return {
+        'message': 'PDFs have been upserted into Pinecone successfully',
+        'chunks': text_chunks_count,
+        'files': len(files),
+        'unconfirmed': unconfirmed
+    }
+
+def _run_generate(payload, progress):
+    return {'systematic_review': generate_systematic_review(query=payload['prompt'], id=payload['id'], progress=progress)}
+
+def _run_quality_check(payload, progress):
+    pdf_path = run_quality_check(payload['id'], progress=progress)
+    return {'message': 'Quality check report generated successfully', 'path': pdf_path}
+
+# Job kind -> handler(payload, progress) returning a JSON-serialisable result
+JOB_HANDLERS = {
+    'upsert': _run_upsert,
+    'generate': _run_generate,
+    'quality_check': _run_quality_check
+}
+
+def run_job(job):
+    '''Runs one claimed job and records its result or error.'''
+    handler = JOB_HANDLERS.get(job['kind'])
+    if handler is None:
+        fail_job(job['id'], f'Unknown job kind: {job["kind"]}')
+        return
+
+    def progress(stage, fraction):
+        update_job_progress(job['id'], stage, fraction)
+
+    print(f'🚀 Worker {os.getpid()} running {job["kind"]} job {job["id"]}')
+    try:
+        result = handler(job['payload'], progress)
+    except Exception as e:
+        print(f'⚠️ {job["kind"]} job {job["id"]} failed: {e}')
+        fail_job(job['id'], e)
+        return
+    complete_job(job['id'], result)
+    print(f'✅ {job["kind"]} job {job["id"]} finished')
+
+def run_worker(poll_interval=None, max_jobs=None, stop_event=None):
+    '''Claims and runs queued jobs until `max_jobs` have run or `stop_event` is set (forever if neither).'''
+    poll_interval = JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    completed = 0
+    while (max_jobs is None or completed < max_jobs) and not (stop_event and stop_event.is_set()):
+        job = claim_next_job()
+        if job is None:
+            if max_jobs is not None:
+                return completed
+            if stop_event:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        run_job(job)
+        completed += 1
+    return completed
+
+def _worker_main(stop_event):
+    # Ctrl+C reaches the whole process group; workers finish their job and stop when the server asks
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(stop_event=stop_event)
+
+def start_job_workers(count=None):
+    '''
+    Starts worker processes that serve the job queue alongside the web server.
+    Workers are not daemonic, since an upsert job extracts PDFs in a process pool of its own;
+    they are stopped and joined when the server exits.
+    '''
+    requeue_orphaned_jobs()
+    # Spawned rather than forked so workers do not inherit the server's open clients and threads
+    context = multiprocessing.get_context('spawn')
+    stop_event = context.Event()
+    workers = []
+    for _ in range(count or JOB_WORKERS):
+        worker = context.Process(target=_worker_main, args=(stop_event,))
+        worker.start()
+        workers.append(worker)
+    atexit.register(stop_job_workers, workers, stop_event)
+    print(f'✅ Started {len(workers)} job workers')
+    return workers, stop_event
+
+def stop_job_workers(workers, stop_event, timeout=None):
+    '''Asks workers to stop after their current job and joins them, terminating any still busy after `timeout`.'''
+    timeout = JOB_SHUTDOWN_TIMEOUT if timeout is None else timeout
+    stop_event.set()
+    deadline = time.monotonic() + timeout
+    for worker in workers:
+        worker.join(max(deadline - time.monotonic(), 0))
+    busy = [worker for worker in workers if worker.is_alive()]
+    for worker in busy:
+        worker.terminate()
+        worker.join()
+    if busy:
+        print(f'⚠️ Terminated {len(busy)} busy job workers; their jobs are requeued on the next start')
+    print(f'✅ Stopped {len(workers)} job workers')
@@ -1,37 +1,160 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
-from utils.pdf_util import pdf_to_text
-from utils.text_splitter import split_text_into_chunks
-from services.upsert_pinecone_service import upsert_all_chunks
+from utils.pdf_util import parse_pdf, iter_pdf_pages
+from utils.text_splitter import split_text_into_chunks, iter_text_chunks
+from utils.section_segmenter import label_chunks, iter_labelled_chunks
+from services.upsert_pinecone_service import upsert_all_chunks, upsert_chunk_stream
 from utils.get_files import get_files
-from flask import jsonify
+from utils.pdf_cache import file_digest
+from utils.ingest_manifest import load_manifest, is_file_ingested, mark_file_ingested, clear_manifests
+from utils.vector_layout import layout_tenant, storage_namespace, tenant_namespace
+from services.index_provider_service import get_index
+from services.corpus_catalog_service import catalog_namespaces
+from config import PDF_WORKERS, PDF_STREAMING_MIN_BYTES, PDF_STREAMING_BATCH
 
-def process_and_store_all_pdfs(id):
-    '''Processes user-uploaded PDFs and stores embeddings in Pinecone.'''
+def extract_and_split(file, path):
+    '''
+    Extracts and chunks a single PDF, labelling each chunk with the section heading it falls under
+    (None where the layout does not tell). Runs inside a worker process.
+    '''
+    document = parse_pdf(path)
+    text_chunks = split_text_into_chunks(document.text)
+    return file, text_chunks, label_chunks(text_chunks, document.headings)
+
+def iter_streamed_chunks(path):
+    '''
+    Yields (chunk, section) of a PDF page by page, bypassing the document cache, so only
+    a couple of pages' worth of text is held however large the document is.
+    '''
+    headings = []
+    yield from iter_labelled_chunks(iter_text_chunks(iter_pdf_pages(path, headings=headings)), headings)
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _digest_or_none(path):
+    try:
+        return file_digest(path)
+    except OSError:
+        return None
+
+def _is_stored(file, manifest, namespaces, tenant_id=None):
+    '''
+    True if the index still holds the chunks the paper's manifest records. Each per-paper
+    namespace must hold at least as many vectors as recorded there; a tenant namespace is
+    shared by all of a user's papers, so the paper's own IDs are fetched from it instead.
+    '''
+    if tenant_id is not None:
+        ids = list(manifest['chunks'])
+        try:
+            found = get_index().fetch(ids=ids, namespace=tenant_namespace(tenant_id))['vectors'] if ids else {}
+        except Exception as e:
+            print(f'⚠️ Failed to check the stored chunks of {file}: {e}')
+            return False
+        return bool(ids) and len(found) == len(ids)
+
+    expected = {}
+    for section in manifest['chunks'].values():
+        namespace = storage_namespace(file, section, tenant_id)
+        expected[namespace] = expected.get(namespace, 0) + 1
+    return bool(expected) and all(namespaces.get(namespace, 0) >= count for namespace, count in expected.items())
+
+def iter_extracted_chunks(files, max_workers=None):
+    '''Yields (paper_id, text_chunks, sections) for each file in completion order, extracting in parallel.'''
+    workers = min(max_workers or PDF_WORKERS, len(files))
+
+    # A single file is not worth the cost of starting a process pool
+    if workers <= 1:
+        for file, path in files.items():
+            yield extract_and_split(file, path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(extract_and_split, file, path) for file, path in files.items()]
+        for future in as_completed(futures):
+            yield future.result()
+
+def process_and_store_all_pdfs(id, progress=None):
+    '''
+    Processes user-uploaded PDFs and stores embeddings in Pinecone.
+    `progress(stage, fraction)` is called as each file is stored.
+    '''
     text_chunks_count = 0
+    failed_batches = []
 
     try:
       files = get_files(id)
       print(f'Files: {files}')
     except Exception as e:
         print(f'error: {str(e)}')
-        return jsonify({'error': str(e)}), 500
+        raise
 
     if not files:
         print('⚠️ No user-uploaded PDFs found in "../files/".')
         return
 
-    for file in tqdm(files, desc='Processing User Papers'): 
-        path = files[file]
-        print(f'File {file}')
-        print(f'Path {path}')
+    # ✅ PDFs whose content was already fully ingested are skipped without extracting them again
+    tenant_id = layout_tenant(id)
+    digests = {file: _digest_or_none(path) for file, path in files.items()}
+    changed_files = {}
+    for file, path in files.items():
+        if is_file_ingested(file, digests[file], tenant_id):
+            # The manifest is local, so it is only trusted while the index still holds the paper's vectors
+            manifest = load_manifest(file, tenant_id)
+            if _is_stored(file, manifest, catalog_namespaces(), tenant_id):
+                print(f'⚠️ Skipping {file} (unchanged since last ingest).')
+                text_chunks_count += len(manifest['chunks'])
+                continue
+            print(f'⚠️ {file} is missing from the index; storing it again.')
+            clear_manifests([file], tenant_id)
+        changed_files[file] = path
+
+    # ✅ Large PDFs are streamed through labelling, embedding and upserting here a batch at a time,
+    # instead of being extracted whole in a worker and sent back
+    streamed = {file: path for file, path in changed_files.items() if _file_size(path) >= PDF_STREAMING_MIN_BYTES}
+    pooled = {file: path for file, path in changed_files.items() if file not in streamed}
+    done = 0
 
-        print(f'📄 Extracting text from {file}...')
-        text = pdf_to_text(path)
-        text_chunks = split_text_into_chunks(text)  # Now returns classified sections
-        text_chunks_count += len(text_chunks)
+    def finish(file, results, chunk_count):
+        nonlocal done
+        failed = [result for result in results if not result['ok']]
+        failed_batches.extend(failed)
+        if not failed and chunk_count and digests[file]:
+            mark_file_ingested(file, digests[file], tenant_id)
+        done += 1
+        if progress:
+            progress(f'stored {file}', done / len(changed_files))
+
+    # Extraction and splitting run in a process pool; upserts happen here as each file completes
+    extracted = tqdm(iter_extracted_chunks(pooled), total=len(pooled), desc='Processing User Papers')
+    for file, text_chunks, sections in extracted:
+        labelled = sum(1 for section in sections if section)
+        print(f'📄 Extracted {len(text_chunks)} chunks from {file} ({files[file]}), {labelled} labelled from headings')
+        # Identical chunks share a content-addressed ID and are stored once
+        chunk_count = len({chunk for chunk in text_chunks if isinstance(chunk, str)})
+        text_chunks_count += chunk_count
 
         print(f'📦 Storing {len(text_chunks)} chunks in Pinecone under {file} ...')
-        upsert_all_chunks(text_chunks=text_chunks, paper_id=file)
-    
+        results = upsert_all_chunks(text_chunks=text_chunks, paper_id=file, sections=sections, tenant_id=id) or []
+        finish(file, results, chunk_count)
+
+    for file, path in streamed.items():
+        print(f'📦 Streaming {file} ({path}) into Pinecone, {PDF_STREAMING_BATCH} chunks at a time ...')
+        results, chunk_count = upsert_chunk_stream(iter_streamed_chunks(path), paper_id=file, tenant_id=id)
+        text_chunks_count += chunk_count
+        finish(file, results, chunk_count)
+
+    # Surface partial failures once every file has been attempted
+    if failed_batches:
+        failed_vectors = sum(len(result['ids']) for result in failed_batches)
+        raise RuntimeError(
+            f'{len(failed_batches)} Pinecone upsert batches ({failed_vectors} chunks) failed: '
+            f'{failed_batches[0]["error"]}'
+        )
+
     # Return the total number of text chunks and files for vector count checking
     return text_chunks_count, files
\ No newline at end of file
@@ -1,17 +1,34 @@
+import math
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pinecone import ServerlessSpec
 from config import (
   pinecone, 
-  embeddings,
   PINECONE_INDEX_NAME, 
+  VECTOR_STORE_BACKEND,
+  RETRIEVAL_CONCURRENCY,
+  HYBRID_SEARCH,
+  RETRIEVAL_PAPER_QUOTA_FACTOR,
+  RETRIEVAL_MIN_PER_PAPER,
+  TENANT_QUERY_MAX_TOP_K,
   VECTOR_DIMENSION, 
   SEARCH_METRIC, 
   SPEC_CLOUD, 
   SPEC_REGION
 ) 
+from utils.embedding_util import get_text_embedding
+from utils.ingest_manifest import clear_manifests, stored_paper_ids
+from services.index_provider_service import get_index, reset_index_pool
+from services.corpus_catalog_service import catalog_namespaces, reset_catalog
+from utils.lexical_index import search_lexical, fuse_rankings
+from utils.retrieval_merge import merge_ranked_matches
+from utils.vector_layout import PAPER_NAMESPACE_PREFIX, paper_namespace, tenant_namespace, lexical_namespace, uses_tenant_layout, section_filter
+from services.write_overlay_service import confirm_writes, query_overlay, merge_matches, pending_namespaces
 
 def initialise_pinecone():
     ''' Initializes Pinecone and creates an index if it doesn't exist. '''
+    if VECTOR_STORE_BACKEND == 'local':
+        print('Using the local vector store, no Pinecone index needed.')
+        return
     
     # Check if index exists, if not create it
     if PINECONE_INDEX_NAME not in pinecone.list_indexes().names():
@@ -26,71 +43,204 @@ def initialise_pinecone():
             )
         )
         print(f'Index "{PINECONE_INDEX_NAME}" created successfully!')
+        reset_index_pool()  # Handles opened before the index existed point nowhere
+        reset_catalog()
+        clear_manifests()  # Nothing recorded as stored is in the new index
     else:
         print(f'Index "{PINECONE_INDEX_NAME}" already exists.')
 
-def get_all_paper_ids():
-    '''Get all stored paper IDs from Pinecone'''
-    index = pinecone.Index(PINECONE_INDEX_NAME)
-    index_stats = index.describe_index_stats()
+def get_all_paper_ids(tenant_id=None):
+    '''
+    Get all stored paper IDs from the corpus catalog, without a stats call to Pinecone.
+    In the tenant layout the papers in `tenant_id`'s namespace are read from its ingestion manifests.
+    '''
     paper_ids = set()
 
-    for namespace in index_stats['namespaces']:
-        if namespace.startswith('systematic_review/'):
+    # ✅ Include papers whose vectors were just written but are not confirmed by the index yet
+    namespaces = list(catalog_namespaces()) + pending_namespaces()
+    for namespace in namespaces:
+        if namespace.startswith(PAPER_NAMESPACE_PREFIX):
             parts = namespace.split('/')
             if len(parts) > 1:
                 paper_ids.add(parts[1])
 
+    # A tenant namespace holds every paper of one user, so its name does not tell which
+    if uses_tenant_layout(tenant_id) and tenant_namespace(tenant_id) in namespaces:
+        paper_ids.update(stored_paper_ids(tenant_id))
+
     return list(paper_ids)
 
-def query_with_namespace(paper_id, section, query_vector, top_k, index):
-    index = pinecone.Index(PINECONE_INDEX_NAME)
-    namespace = f'systematic_review/{paper_id}/{section}'
+def query_with_namespace(paper_id, section, query_vector, top_k, index=None, query_text=None, include_values=False):
+    '''
+    Dense search of one paper's section. With `query_text`, BM25 hits from the lexical
+    index are fused in so exact terms (drug names, gene symbols, acronyms) rank highly
+    even when their embeddings are not the closest. With `include_values`, dense matches
+    carry their vectors; keyword-only hits have none.
+    '''
+    index = index or get_index()
+    namespace = paper_namespace(paper_id, section)
     print(f'🔍 Querying Pinecone in namespace: "{namespace}"')
 
-    results = index.query(vector=query_vector, top_k=top_k, namespace=namespace, include_metadata=True)
+    # ✅ Drop recent writes the index now serves, then merge the rest in so new papers are searchable immediately
+    confirm_writes(index, namespace)
+    results = index.query(vector=query_vector, top_k=top_k, namespace=namespace, include_metadata=True, include_values=include_values)
+    matches = merge_matches(results['matches'], query_overlay(namespace, query_vector, top_k, include_values=include_values), top_k)
+
+    if query_text and HYBRID_SEARCH:
+        try:
+            matches = fuse_rankings(matches, search_lexical(namespace, query_text, top_k), top_k)
+        except Exception as e:
+            print(f'⚠️ Lexical search failed in {namespace}, using dense results only: {e}')
 
-    if results['matches']:
-        print(f'✅ Found {len(results["matches"])} results in {namespace}')
-        # for match in results['matches']:
+    if matches:
+        print(f'✅ Found {len(matches)} results in {namespace}')
+        # for match in matches:
         #     print(f'📄 Fragment content: {match['metadata']['text'][:100]}...')
-        # all_results.extend([match['metadata']['text'] for match in results['matches']])
-        return results
     else:
         print(f'⚠️ No relevant results found in {namespace}')
-
-def search_pinecone(query, paper_ids=None, section='Results', top_k=10):
-    '''Search for relevant text fragments in Pinecone based on Paper_ID and Section'''
-    index = pinecone.Index(PINECONE_INDEX_NAME)
-
-    query_vector = embeddings.embed_query(query)
-    print(f'🔍 Query vector (first 10 dimensions): {query_vector[:10]}')  # Print only the first 10 dimensions for debugging
-
-    result = []
-
-    if paper_ids is None:
-        paper_ids = get_all_paper_ids()  # ✅ Automatically get all `Paper_ID`s
-
-    if not paper_ids:
-        print('⚠️ No stored papers found, unable to query.')
-        return []
-
-    print(f'📄 Found {len(paper_ids)} stored papers: {paper_ids}')
-
-    with ThreadPoolExecutor() as executor:
-        future_to_queries = {
-            executor.submit(query_with_namespace, paper_id, section, query_vector, top_k, index): 
-            paper_id for paper_id in paper_ids
+    return {'matches': matches}
+
+def query_section(tenant_id, paper_ids, section, query_vector, top_k, index=None, query_text=None, include_values=False):
+    '''
+    One filtered query for a section of several papers in the tenant layout, where all
+    of a user's papers share one namespace and carry `source` and `section` metadata.
+    With `query_text`, BM25 hits of each paper's section are fused in.
+    '''
+    index = index or get_index()
+    namespace = tenant_namespace(tenant_id)
+    metadata_filter = section_filter(paper_ids, section)
+    print(f'🔍 Querying Pinecone in namespace: "{namespace}" for {section} of {len(paper_ids)} papers')
+
+    confirm_writes(index, namespace)
+    results = index.query(
+        vector=query_vector, top_k=top_k, namespace=namespace, include_metadata=True,
+        filter=metadata_filter, include_values=include_values
+    )
+    matches = merge_matches(results['matches'], query_overlay(namespace, query_vector, top_k, metadata_filter, include_values), top_k)
+
+    if query_text and HYBRID_SEARCH:
+        try:
+            lexical = [
+                match for paper_id in paper_ids
+                for match in search_lexical(lexical_namespace(paper_id, section, tenant_id), query_text, top_k)
+            ]
+            matches = fuse_rankings(matches, lexical, top_k)
+        except Exception as e:
+            print(f'⚠️ Lexical search failed for {section} in {namespace}, using dense results only: {e}')
+
+    print(f'✅ Found {len(matches)} results in {namespace}' if matches else f'⚠️ No relevant results found in {namespace}')
+    return {'matches': matches}
+
+class RetrievalSession:
+    '''
+    Retrieval state shared by every section lookup of one request: the prompt is
+    embedded once, and the index handle and query thread pool are reused.
+    `prefetch` queues every (paper, section) query up front so later sections are
+    already retrieved while earlier ones are being generated. With a `tenant_id` and
+    the tenant layout, each section is one filtered query instead of one per paper.
+    With `include_values`, matches carry their vectors for candidate selection.
+    '''
+
+    def __init__(self, query, paper_ids=None, tenant_id=None, include_values=False):
+        self.query = query
+        self.tenant_id = tenant_id
+        self.include_values = include_values
+        self.index = get_index()
+
+        self.query_vector = get_text_embedding(query)  # ✅ Repeated prompts are served from the embedding cache
+        print(f'🔍 Query vector (first 10 dimensions): {self.query_vector[:10]}')  # Print only the first 10 dimensions for debugging
+
+        if paper_ids is None:
+            paper_ids = get_all_paper_ids(tenant_id)  # ✅ Automatically get all `Paper_ID`s
+        self.paper_ids = list(paper_ids)
+        self._executor = ThreadPoolExecutor(max_workers=RETRIEVAL_CONCURRENCY)
+        self._pending = {}  # (section, top_k) -> {future: paper_id}
+
+    def per_paper_limit(self, top_k):
+        '''Matches queried from, and kept of, each paper for a section of `top_k` chunks.'''
+        share = math.ceil(RETRIEVAL_PAPER_QUOTA_FACTOR * top_k / max(len(self.paper_ids), 1))
+        return min(top_k, max(share, RETRIEVAL_MIN_PER_PAPER))
+
+    def _submit(self, section, per_paper_top_k):
+        '''Returns {future: paper_id}, where a paper_id of None marks a query covering every paper.'''
+        if uses_tenant_layout(self.tenant_id):
+            top_k = min(per_paper_top_k * len(self.paper_ids), TENANT_QUERY_MAX_TOP_K)
+            future = self._executor.submit(
+                query_section, self.tenant_id, self.paper_ids, section, self.query_vector, top_k,
+                self.index, self.query, self.include_values
+            )
+            return {future: None}
+        return {
+            self._executor.submit(
+                query_with_namespace, paper_id, section, self.query_vector, per_paper_top_k,
+                self.index, self.query, self.include_values
+            ): paper_id
+            for paper_id in self.paper_ids
         }
 
+    def prefetch(self, sections, top_k=10, per_paper_limit=None):
+        '''Queues the queries of every paper in every section; `search` then only waits for its own section.'''
+        per_paper_limit = per_paper_limit or self.per_paper_limit(top_k)
+        for section in sections:
+            if (section, per_paper_limit) not in self._pending:
+                self._pending[(section, per_paper_limit)] = self._submit(section, per_paper_limit)
+        queries_per_section = 1 if uses_tenant_layout(self.tenant_id) else len(self.paper_ids)
+        print(f'🔍 Prefetching {len(sections) * queries_per_section} queries across {len(sections)} sections')
+
+    def search_matches(self, section='Results', top_k=10, per_paper_limit=None):
+        '''
+        The `top_k` best matches of the session's papers in one section, ordered by score,
+        with no paper contributing more than `per_paper_limit` of them.
+        '''
+        if not self.paper_ids:
+            print('⚠️ No stored papers found, unable to query.')
+            return []
+
+        print(f'📄 Found {len(self.paper_ids)} stored papers: {self.paper_ids}')
+
+        per_paper_limit = per_paper_limit or self.per_paper_limit(top_k)
+        future_to_queries = self._pending.pop((section, per_paper_limit), None) or self._submit(section, per_paper_limit)
+
+        matches_by_paper = {}
         for future in as_completed(future_to_queries):
+            paper_id = future_to_queries[future]
             try:
-                response = future.result()
-                result.extend([match['metadata']['text'] for match in response['matches']])
+                matches = future.result()['matches']
             except Exception as e:
-                print(f'Error querying namespace {future_to_queries[future]}: {e}')
+                print(f'Error querying namespace {paper_id or tenant_namespace(self.tenant_id)}: {e}')
+                continue
+            if paper_id is not None:
+                matches_by_paper[paper_id] = matches
+            else:
+                for match in matches:
+                    matches_by_paper.setdefault(match['metadata'].get('source'), []).append(match)
+
+        # ✅ Rank across papers by score instead of keeping whichever papers answered first
+        matches = merge_ranked_matches(matches_by_paper, top_k, per_paper_limit)
+        if not matches:
+            print('⚠️ Still no relevant results found, please check if Pinecone data storage is correct')
+
+        return matches
+
+    def search(self, section='Results', top_k=10, per_paper_limit=None):
+        '''Search for relevant text fragments of the session's papers in one section'''
+        return [match['text'] for match in self.search_matches(section, top_k, per_paper_limit)]
+
+    def close(self):
+        # Prefetched sections that were never searched are not worth waiting for
+        for future_to_queries in self._pending.values():
+            for future in future_to_queries:
+                future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-    if not result:
-        print('⚠️ Still no relevant results found, please check if Pinecone data storage is correct')
-
-    return result
\ No newline at end of file
+def search_pinecone(query, paper_ids=None, section='Results', top_k=10):
+    '''Search for relevant text fragments in Pinecone based on Paper_ID and Section'''
+    with RetrievalSession(query, paper_ids=paper_ids) as session:
+        return session.search(section=section, top_k=top_k)
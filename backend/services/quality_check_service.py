@@ -0,0 +1,150 @@
+import os
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import seaborn as sns
+from matplotlib.backends.backend_pdf import PdfPages
+from quality_check.cosine_similarity import CosineSimilarityChecker
+from quality_check.TF_IDF import TFIDF
+from quality_check.BLEU import BLEUScorer
+from quality_check.author_num import process_documents, save_and_plot_results
+from quality_check.themetic_area import load_documents, extract_thematic_area, generate_wordcloud
+from utils.pdf_util import parse_pdf, parse_pdfs
+
+def add_image_to_pdf(image_path, pdf):
+    try:
+        img = plt.imread(image_path)
+        plt.figure(figsize=(10, 6))
+        plt.imshow(img)
+        plt.axis('off')
+        pdf.savefig()
+        plt.close()
+    except Exception as e:
+        print(f'Error adding {image_path} to PDF: {str(e)}')
+
+def create_cosine_plot(pdf, reference_files, scores):
+    if scores:
+        df = pd.DataFrame({
+            'Document': [os.path.basename(f) for f in reference_files],
+            'Score': [s * 100 for s in scores]
+        })
+        plt.figure(figsize=(10, 6))
+        sns.barplot(
+            x='Document',
+            y='Score',
+            hue='Document',
+            data=df,
+            palette='coolwarm',
+            legend=False
+        )
+        plt.title('Cosine Similarity Scores (%)')
+        plt.xticks(rotation=45)
+        pdf.savefig()
+        plt.close()
+
+def create_bleu_plot(pdf, reference_files, scores):
+    if scores:
+        df = pd.DataFrame({
+            'Document': [os.path.basename(f) for f in reference_files],
+            'Score': [s * 100 for s in scores]
+        })
+        plt.figure(figsize=(10, 6))
+        sns.barplot(
+            x='Document',
+            y='Score',
+            hue='Document',
+            data=df,
+            palette='coolwarm',
+            legend=False
+        )
+        plt.title('BLEU Scores (%)')
+        plt.xticks(rotation=45)
+        pdf.savefig()
+        plt.close()
+
+def create_tfidf_heatmap(pdf, tfidf_results):
+    if not tfidf_results.empty:
+        top_words = tfidf_results.mean().nlargest(50).index
+        plt.figure(figsize=(16, 10))
+        sns.heatmap(tfidf_results[top_words], cmap='viridis')
+        plt.title('TF-IDF Heatmap (Top 50 Terms)')
+        pdf.savefig()
+        plt.close()
+
+def run_quality_check(id, progress=None):
+    '''
+    Scores the user's generated review against their uploaded papers and writes
+    the plots to a PDF report. Returns the report path.
+    `progress(stage, fraction)` is called as each stage starts.
+    '''
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    input_path = os.path.join(base_dir, 'frontend', 'public', 'files', str(id))
+    output_dir = os.path.join(base_dir, 'frontend', 'public', 'output', str(id))
+    report = progress or (lambda stage, fraction: None)
+
+    os.makedirs(input_path, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    report('loading documents', 0.0)
+    try:
+        # Parse each PDF once and share it across all metrics
+        documents = parse_pdfs(input_path)
+        reference_files = [doc.path for doc in documents]
+        reference_docs = [doc.text for doc in documents]
+        hypothesis_doc = parse_pdf(os.path.join(output_dir, 'systematic_review.pdf')).text
+    except Exception as e:
+        raise RuntimeError(f'Document loading failed: {str(e)}') from e
+
+    report('computing metrics', 0.2)
+    try:
+        similarity_checker = CosineSimilarityChecker(reference_docs, hypothesis_doc)
+        similarity_scores, _ = similarity_checker.calculate_similarity()
+
+        tfidf = TFIDF(reference_docs + [hypothesis_doc])
+        tfidf_results = tfidf.calculate_tfidf()
+
+        bleu_scorer = BLEUScorer(reference_docs, hypothesis_doc)
+        bleu_scores = bleu_scorer.calculate_bleu()
+
+        report('counting authors', 0.5)
+        author_counts = process_documents(documents)
+        author_counts_image = os.path.join(output_dir, 'author_counts.png')
+        save_and_plot_results(author_counts=author_counts, output_image=author_counts_image, id=id)
+
+        report('extracting thematic areas', 0.7)
+        docs = load_documents(input_path, parsed_documents=documents)
+        doc_areas = [extract_thematic_area(doc) for doc in docs]
+        all_areas = [a.strip() for area_str in doc_areas for a in area_str.replace('\n', ' ').split(',') if a.strip()]
+        wordcloud_image = os.path.join(output_dir, 'thematic_wordcloud.png')
+        generate_wordcloud(areas=all_areas, output_file=wordcloud_image, id=id)
+
+    except Exception as e:
+        raise RuntimeError(f'Metric processing failed: {str(e)}') from e
+
+    # Generate PDF report
+    report('writing report', 0.9)
+    pdf_path = os.path.join(output_dir, 'quality_check_report.pdf')
+    try:
+        with PdfPages(pdf_path) as pdf:
+            # Add author counts plot
+            if os.path.exists(author_counts_image):
+                add_image_to_pdf(author_counts_image, pdf)
+            
+            # Add word cloud
+            if os.path.exists(wordcloud_image):
+                add_image_to_pdf(wordcloud_image, pdf)
+
+            # Cosine Similarity plot
+            create_cosine_plot(pdf, reference_files, similarity_scores)
+
+            # TF-IDF heatmap
+            create_tfidf_heatmap(pdf, tfidf_results)
+
+            # BLEU score plot
+            create_bleu_plot(pdf, reference_files, bleu_scores)
+    except Exception as e:
+        raise RuntimeError(f'PDF generation failed: {str(e)}') from e
+
+    print(f'PDF report saved to {pdf_path}')
+    return pdf_path
@@ -0,0 +1,59 @@
+from services.pinecone_service import RetrievalSession
+from services.candidate_selection_service import select_diverse_matches
+from utils.get_files import get_files
+from utils.store_as_pdf import store_pdf
+from services.section_prompts_service import (
+  generate_background_section,
+  generate_methods_section,
+  generate_results_section,
+  generate_discussion_section,
+  generate_conclusion_section
+)
+from config import SECTION_RETRIEVAL_TOP_K, SECTION_CONTEXT_CHUNKS
+
+def generate_systematic_review(query, id, progress=None):
+    '''
+    Generates each section of a Systematic Review in turn from the user's papers,
+    stores the combined review as a PDF and returns its text.
+    `progress(stage, fraction)` is called as each section starts.
+    '''
+    paper_ids = [paper for paper in get_files(id)]
+
+    section_generators = [
+        ('Background', generate_background_section),
+        ('Methods', generate_methods_section),
+        ('Results', generate_results_section),
+        ('Discussion', generate_discussion_section),
+        ('Conclusion', generate_conclusion_section)
+    ]
+
+    systematic_review = {}  # Dictionary to store all generated sections
+
+    # ✅ One session per review: the prompt is embedded once and all five sections are
+    # retrieved in one batch up front, so retrieval overlaps with generating earlier sections
+    with RetrievalSession(query, paper_ids=paper_ids, tenant_id=id, include_values=True) as session:
+        session.prefetch([section for section, _ in section_generators], top_k=SECTION_RETRIEVAL_TOP_K)
+        for i, (section, generate_section) in enumerate(section_generators):
+            print(f'🔍 Generating {section} section...')
+            if progress:
+                progress(f'generating {section}', i / len(section_generators))
+
+            # ✅ Diverse, non-repeating chunks give the same coverage with fewer prompt tokens
+            matches = session.search_matches(section=section, top_k=SECTION_RETRIEVAL_TOP_K)
+            results = [match['text'] for match in select_diverse_matches(matches, SECTION_CONTEXT_CHUNKS)]
+            systematic_review[section] = generate_section(
+                results=results,
+                query=query,
+                chunk_size=SECTION_CONTEXT_CHUNKS,
+                previous_sections=list(systematic_review.values())  # Trimmed to the prompt's token budget by the packer
+            )
+
+    # Join all sections into one, removing the last '\n'
+    combined_sections = ''.join(systematic_review[section] + '\n' for section in systematic_review).replace('---', '')[:-1]
+
+    if progress:
+        progress('storing PDF', 1.0)
+    store_pdf(text=combined_sections, id=id)
+    print(f'Systematic Review: {combined_sections}')
+
+    return combined_sections
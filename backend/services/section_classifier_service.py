@@ -0,0 +1,172 @@
+import os
+import json
+import threading
+from collections import deque
+import numpy as np
+from config import bert_model, SECTION_LABEL_CACHE_PATH, SECTION_LABEL_CACHE_MAX_BYTES, LOCAL_CLASSIFIER_MIN_CONFIDENCE
+from services.classify_chunk_service import classify_chunks_with_llm
+
+SECTIONS = ['Background', 'Methods', 'Results', 'Discussion', 'Conclusion']
+
+# Short descriptions of what each section of a paper typically says
+SECTION_PROTOTYPES = {
+    'Background': [
+        'Introduction and background of the research topic and its significance.',
+        'Previous studies have reported, however little is known about this problem.',
+        'The aim of this study was to investigate the research question.',
+    ],
+    'Methods': [
+        'Methods: study design, participants, inclusion and exclusion criteria.',
+        'Samples were collected and analysed using statistical tests and software.',
+        'We searched databases and extracted data following the study protocol.',
+    ],
+    'Results': [
+        'Results: a total of patients were included, with significant differences observed.',
+        'The outcome was significantly higher in the treatment group (p < 0.05).',
+        'Table and figure show the measured values, rates and confidence intervals.',
+    ],
+    'Discussion': [
+        'Discussion of the findings, their interpretation and comparison with previous studies.',
+        'These results suggest a possible mechanism, although the study has limitations.',
+        'Our findings are consistent with earlier reports and may explain the differences.',
+    ],
+    'Conclusion': [
+        'In conclusion, this study demonstrates the main finding and its implications.',
+        'Future research should address these questions; recommendations for practice.',
+        'Overall, the evidence supports the conclusion and clinical relevance.',
+    ],
+}
+
+# Softmax temperature applied to cosine similarities when turning them into confidences
+SIMILARITY_TEMPERATURE = 0.03
+# Number of cached LLM labels at which a section centroid is weighted equally with its prototypes
+LABEL_PRIOR_WEIGHT = 20
+MAX_CACHED_LABELS = 5000
+
+_centroids = None
+_centroids_mtime = None
+_lock = threading.Lock()
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+def _encode(texts):
+    vectors = bert_model.encode(texts, convert_to_numpy=True)
+    return _normalise(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+
+def _load_cached_labels():
+    '''Returns the most recent cached (section, vector) pairs labelled by the LLM.'''
+    try:
+        with open(SECTION_LABEL_CACHE_PATH, 'r', encoding='utf-8') as f:
+            lines = deque(f, maxlen=MAX_CACHED_LABELS)
+    except OSError:
+        return []
+
+    labels = []
+    for line in lines:
+        try:
+            entry = json.loads(line)
+            if entry['section'] in SECTIONS:
+                labels.append((entry['section'], np.asarray(entry['vector'], dtype=np.float32)))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return labels
+
+def _label_cache_mtime():
+    try:
+        return os.path.getmtime(SECTION_LABEL_CACHE_PATH)
+    except OSError:
+        return None
+
+def get_section_centroids():
+    '''
+    Returns a (sections x dim) matrix of unit vectors, one per section.
+    Each centroid starts from the section's prototype sentences and moves towards
+    the mean of chunks the LLM has labelled with that section as labels accumulate.
+    Recomputed only when the label cache changes.
+    '''
+    global _centroids, _centroids_mtime
+    mtime = _label_cache_mtime()
+    with _lock:
+        if _centroids is not None and mtime == _centroids_mtime:
+            return _centroids
+
+        prototypes = _encode([text for section in SECTIONS for text in SECTION_PROTOTYPES[section]])
+        per_section = len(prototypes) // len(SECTIONS)
+        centroids = _normalise(prototypes.reshape(len(SECTIONS), per_section, -1).mean(axis=1))
+
+        labels = _load_cached_labels()
+        for i, section in enumerate(SECTIONS):
+            vectors = [vector for label, vector in labels if label == section and vector.shape == centroids[i].shape]
+            if vectors:
+                weight = len(vectors) / (len(vectors) + LABEL_PRIOR_WEIGHT)
+                centroids[i] = (1 - weight) * centroids[i] + weight * _normalise(np.mean(vectors, axis=0))
+
+        _centroids = _normalise(centroids)
+        _centroids_mtime = mtime
+        return _centroids
+
+def classify_chunks_locally(chunks):
+    '''
+    Scores every chunk against the section centroids in one vectorised pass.
+    Returns (sections, confidences, vectors) where confidence is the softmax
+    probability of the chosen section.
+    '''
+    if not chunks:
+        return [], np.zeros(0, dtype=np.float32), np.zeros((0, 0), dtype=np.float32)
+
+    vectors = _encode(chunks)
+    scores = vectors @ get_section_centroids().T / SIMILARITY_TEMPERATURE
+    scores -= scores.max(axis=1, keepdims=True)
+    probabilities = np.exp(scores)
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+    best = probabilities.argmax(axis=1)
+    return [SECTIONS[i] for i in best], probabilities[np.arange(len(chunks)), best], vectors
+
+def record_llm_labels(labelled_vectors):
+    '''Appends (section, vector) pairs labelled by the LLM to the on-disk label cache.'''
+    if not labelled_vectors:
+        return
+    try:
+        os.makedirs(os.path.dirname(SECTION_LABEL_CACHE_PATH), exist_ok=True)
+        with open(SECTION_LABEL_CACHE_PATH, 'a', encoding='utf-8') as f:
+            for section, vector in labelled_vectors:
+                f.write(json.dumps({'section': section, 'vector': [round(float(x), 5) for x in vector]}) + '\n')
+        if os.path.getsize(SECTION_LABEL_CACHE_PATH) > SECTION_LABEL_CACHE_MAX_BYTES:
+            _compact_label_cache()
+    except OSError as e:
+        print(f'⚠️ Failed to cache LLM section labels: {e}')
+
+def _compact_label_cache():
+    '''Rewrites the label cache with only the labels that are still used.'''
+    with open(SECTION_LABEL_CACHE_PATH, 'r', encoding='utf-8') as f:
+        lines = deque(f, maxlen=MAX_CACHED_LABELS)
+    temp_path = f'{SECTION_LABEL_CACHE_PATH}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    os.replace(temp_path, SECTION_LABEL_CACHE_PATH)
+    print(f'📦 Compacted the section label cache to {len(lines)} labels')
+
+def classify_chunks(chunks, min_confidence=None):
+    '''
+    Classifies chunks into review sections. All chunks are scored locally with the
+    BERT model; only those below `min_confidence` are sent to the LLM, and the LLM's
+    answers are cached to refine the local centroids.
+    '''
+    min_confidence = LOCAL_CLASSIFIER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    sections, confidences, vectors = classify_chunks_locally(chunks)
+
+    uncertain = [i for i, confidence in enumerate(confidences) if confidence < min_confidence]
+    print(f'🧠 Classified {len(chunks) - len(uncertain)}/{len(chunks)} chunks locally, '
+          f'{len(uncertain)} sent to the LLM')
+
+    if uncertain:
+        llm_sections = classify_chunks_with_llm([chunks[i] for i in uncertain])
+        for i, section in zip(uncertain, llm_sections):
+            sections[i] = section
+        record_llm_labels([(sections[i], vectors[i]) for i in uncertain])
+
+    return sections
@@ -1,54 +1,183 @@
-from concurrent.futures import ThreadPoolExecutor
-from config import PINECONE_INDEX_NAME, pinecone
-from utils.embedding_util import get_text_embedding
-from services.classify_chunk_service import classify_chunk_with_llm
-
-def upsert_all_chunks(text_chunks, paper_id):
-    '''Stores document chunks in Pinecone DB under Systematic Review namespaces.'''
-    index = pinecone.Index(PINECONE_INDEX_NAME)
-
-    # ✅ Get existing namespaces to avoid re-storing sections
-    index_stats = index.describe_index_stats()
-    existing_namespaces = index_stats.get('namespaces', {})
-
-    # ✅ Instead of skipping the whole paper, only skip already stored sections
-    stored_sections = {ns.split('/')[-1] for ns in existing_namespaces if ns.startswith(f'systematic_review/{paper_id}')}
-
-    with ThreadPoolExecutor() as executor:
-        for i, chunk in enumerate(text_chunks):
-            executor.submit(upsert_chunk, i, chunk, paper_id, stored_sections, index)
-    
-    print(f'✅ Successfully stored {len(text_chunks)} chunks in Pinecone under "{paper_id}"!')
-
-def upsert_chunk(i, chunk, paper_id, stored_sections, index):
-    if not isinstance(chunk, str):
-        print(f'⚠️ Skipping invalid chunk {i} for "{paper_id}".')
-        return
-
-    # ✅ Call LLM for classification and ensure it's printed
-    section = classify_chunk_with_llm(chunk)
-    print(f'🔍 Chunk {i} classified as: {section}')  # ✅ Ensure we see LLM classification
-
-    namespace = f'systematic_review/{paper_id}/{section}'
-
-    # ✅ Skip storing chunks for sections that already exist
-    if section in stored_sections:
-        print(f'⚠️ Skipping chunk {i} (already stored in {namespace}).')
-        return
-
-    vector = get_text_embedding(chunk)
-
-    # ✅ Explicitly store under correct namespace
-    index.upsert([
-        (
-            f'{paper_id}-chunk-{i}',
+from utils.embedding_util import get_text_embeddings
+from utils.ingest_manifest import chunk_id, load_manifest, save_manifest
+from utils.lexical_index import index_documents, delete_documents
+from utils.vector_layout import layout_tenant, lexical_namespace, storage_namespace, paper_namespace
+from services.index_provider_service import get_index
+from services.section_classifier_service import classify_chunks
+from services.vector_writer_service import upsert_vectors_in_batches
+from services.write_overlay_service import forget_writes
+from services.corpus_catalog_service import record_deletes, catalog_namespaces
+from config import PDF_STREAMING_BATCH
+
+LEGACY_CHUNK_ID_INFIX = '-chunk-'  # Chunks used to be stored as `{paper_id}-chunk-{i}`
+
+def upsert_all_chunks(text_chunks, paper_id, sections=None, tenant_id=None):
+    '''
+    Stores document chunks in Pinecone DB under Systematic Review namespaces, or in the
+    namespace of `tenant_id` when the tenant layout is configured.
+    `sections` optionally gives the section of each chunk found from the paper's headings;
+    chunks without one are classified locally, with the LLM only for low-confidence chunks.
+    Chunks already recorded in the paper's ingestion manifest are skipped before any
+    classification or embedding, and vectors of chunks no longer in the paper are deleted.
+    Returns one result per upsert batch so callers can see which vectors failed to store.
+    '''
+    sections = list(sections or [None] * len(text_chunks))
+    results, _ = upsert_chunk_stream(zip(text_chunks, sections), paper_id, tenant_id, batch_size=max(len(text_chunks), 1))
+    return results
+
+def upsert_chunk_stream(chunks, paper_id, tenant_id=None, batch_size=None):
+    '''
+    Like `upsert_all_chunks` for an iterable of (chunk, section or None) in document order,
+    e.g. a PDF streamed page by page. Chunks are classified, embedded and stored
+    `batch_size` at a time as they arrive, so only their IDs are kept for the whole paper.
+    Returns (upsert batch results, number of distinct chunks).
+    '''
+    tenant_id = layout_tenant(tenant_id)
+    batch_size = batch_size or PDF_STREAMING_BATCH
+    manifest = load_manifest(paper_id, tenant_id)
+    stored_chunks = manifest['chunks']
+    index = None
+    if not stored_chunks and tenant_id is None:
+        index = get_index()
+        # Vectors stored under positional IDs are replaced like stale chunks once the new ones are stored
+        stored_chunks.update(_legacy_chunks(index, paper_id))
+    results = []
+    seen = set()
+    batch = []
+    to_store = 0
+
+    for i, (chunk, section) in enumerate(chunks):
+        if not isinstance(chunk, str):
+            print(f'⚠️ Skipping invalid chunk {i} for "{paper_id}".')
+            continue
+        # ✅ Content-addressed IDs: unchanged chunks keep their ID and are skipped for free
+        vector_id = chunk_id(paper_id, chunk, tenant_id)
+        if vector_id in seen:
+            continue
+        seen.add(vector_id)
+        if vector_id in stored_chunks:
+            continue
+        batch.append((vector_id, chunk, section))
+        if len(batch) >= batch_size:
+            index = index or get_index()
+            results.extend(_store_batch(index, paper_id, batch, stored_chunks, tenant_id))
+            to_store += len(batch)
+            batch = []
+
+    stale = {vector_id: section for vector_id, section in stored_chunks.items() if vector_id not in seen}
+    to_store += len(batch)
+    print(f'🔍 {len(seen) - to_store} chunks of "{paper_id}" unchanged, {to_store} to store, {len(stale)} to remove')
+    if not to_store and not stale:
+        return [], len(seen)
+
+    index = index or get_index()
+    if batch:
+        results.extend(_store_batch(index, paper_id, batch, stored_chunks, tenant_id))
+    _delete_stale_chunks(index, paper_id, stale, stored_chunks, tenant_id)
+
+    # ✅ The paper's content changed, so the file is only marked ingested again once it fully succeeds
+    manifest['file_digest'] = None
+    save_manifest(paper_id, manifest, tenant_id)
+
+    failed = [result for result in results if not result['ok']]
+    stored = sum(len(result['ids']) for result in results if result['ok'])
+    if failed:
+        print(f'⚠️ {len(failed)} upsert batches failed for "{paper_id}": '
+              f'{", ".join(sorted({result["namespace"] for result in failed}))}')
+    print(f'✅ Stored {stored}/{to_store} chunks in Pinecone under "{paper_id}"!')
+    return results, len(seen)
+
+def _legacy_chunks(index, paper_id):
+    '''
+    {ID: section} of the `{paper_id}-chunk-{i}` vectors stored before chunk IDs were content
+    addressed, which no manifest records. Only papers without a manifest can have them.
+    '''
+    prefix = paper_namespace(paper_id, '')
+    legacy = {}
+    try:
+        for namespace in catalog_namespaces():
+            if namespace.startswith(prefix):
+                for vector_id in index.list_ids(namespace, prefix=f'{paper_id}{LEGACY_CHUNK_ID_INFIX}'):
+                    legacy[vector_id] = namespace[len(prefix):]
+    except Exception as e:
+        print(f'⚠️ Failed to list legacy chunk IDs of "{paper_id}", they may be left beside the new ones: {e}')
+    if legacy:
+        print(f'🔍 Found {len(legacy)} chunks of "{paper_id}" stored under legacy IDs; they will be replaced')
+    return legacy
+
+def _store_batch(index, paper_id, batch, stored_chunks, tenant_id=None):
+    '''Classifies, embeds and upserts (ID, chunk, section) triples, recording the stored ones in `stored_chunks`.'''
+    sections = [section for _, _, section in batch]
+    unresolved = [i for i, section in enumerate(sections) if not section]
+    if unresolved:
+        for i, section in zip(unresolved, classify_chunks([batch[i][1] for i in unresolved])):
+            sections[i] = section
+
+    # ✅ Embed every chunk of the batch in a few batched requests instead of one per chunk
+    embeddings = get_text_embeddings([chunk for _, chunk, _ in batch])
+
+    # ✅ Group vectors by namespace so each upsert request targets a single namespace
+    vectors_by_namespace = {}
+    for (vector_id, chunk, _), section, vector in zip(batch, sections, embeddings):
+        namespace = storage_namespace(paper_id, section, tenant_id)
+        vectors_by_namespace.setdefault(namespace, []).append((
+            vector_id,
             vector,
             {
                 'text': chunk,
                 'source': paper_id,
                 'section': section
             }
-        )
-    ], namespace=namespace)
+        ))
+
+    results = upsert_vectors_in_batches(index, vectors_by_namespace)
+
+    ids_to_section = {vector_id: section for (vector_id, _, _), section in zip(batch, sections)}
+    for result in results:
+        if result['ok']:
+            stored_chunks.update({vector_id: ids_to_section[vector_id] for vector_id in result['ids']})
+    _index_stored_text(vectors_by_namespace, results, tenant_id)
+    return results
+
+def _delete_stale_chunks(index, paper_id, stale, stored_chunks, tenant_id=None):
+    '''Deletes vectors of chunks that were edited out of the paper and drops them from the manifest.'''
+    by_section = {}
+    for vector_id, section in stale.items():
+        by_section.setdefault(section, []).append(vector_id)
+
+    for section, ids in by_section.items():
+        namespace = storage_namespace(paper_id, section, tenant_id)
+        try:
+            index.delete(ids=ids, namespace=namespace)
+        except Exception as e:
+            # Kept in the manifest so the delete is retried on the next ingest
+            print(f'⚠️ Failed to delete {len(ids)} stale chunks from "{namespace}": {e}')
+            continue
+        forget_writes(namespace, ids)
+        record_deletes(namespace, ids)
+        try:
+            delete_documents(lexical_namespace(paper_id, section, tenant_id), ids)
+        except Exception as e:
+            print(f'⚠️ Failed to drop {len(ids)} stale chunks from the lexical index of "{namespace}": {e}')
+        for vector_id in ids:
+            stored_chunks.pop(vector_id, None)
+
+def _index_stored_text(vectors_by_namespace, results, tenant_id=None):
+    '''Adds the text of successfully stored chunks to the BM25 index of their paper's section.'''
+    documents_by_section = {}
+    for result in results:
+        if not result['ok']:
+            continue
+        ids = set(result['ids'])
+        for vector_id, _, metadata in vectors_by_namespace[result['namespace']]:
+            if vector_id in ids:
+                documents_by_section.setdefault(lexical_namespace(metadata['source'], metadata['section'], tenant_id), []).append(
+                    (vector_id, metadata['text'], metadata)
+                )
 
-    print(f'✅ Stored chunk {i} in Pinecone under "{namespace}"!')
\ No newline at end of file
+    for namespace, documents in documents_by_section.items():
+        try:
+            index_documents(namespace, documents)
+        except Exception as e:
+            # Dense retrieval still finds these chunks; only the keyword boost is missing
+            print(f'⚠️ Failed to update the lexical index of "{namespace}": {e}')
@@ -0,0 +1,90 @@
+import argparse
+from utils.get_files import get_files
+from utils.ingest_manifest import load_manifest, save_manifest
+from utils.lexical_index import move_documents
+from utils.vector_layout import paper_namespace, tenant_namespace, lexical_namespace
+from services.index_provider_service import get_index
+from services.vector_writer_service import upsert_vectors_in_batches
+from services.write_overlay_service import forget_writes
+from services.corpus_catalog_service import record_deletes
+
+MIGRATION_FETCH_BATCH = 100  # IDs per fetch request; Pinecone accepts up to 1000
+
+def migrate_to_tenant_layout(tenant_id, paper_ids=None, index=None, delete_source=True, batch_size=None):
+    '''
+    Copies the vectors of a user's papers from their per-paper section namespaces into
+    the user's tenant namespace, tagging each with `source` and `section` metadata.
+    Every ID in the source namespaces is moved, including ones no local manifest records
+    (legacy IDs, or papers ingested on another node). Moved chunks keep their IDs and are
+    recorded in the paper's manifest for the tenant, along with their lexical index entries.
+    A section's source vectors are deleted only once all of them are in the tenant
+    namespace, so an interrupted run can simply be repeated.
+    Returns {'papers', 'moved', 'failed'} counts.
+    '''
+    index = index or get_index()
+    paper_ids = list(get_files(tenant_id)) if paper_ids is None else list(paper_ids)
+    batch_size = batch_size or MIGRATION_FETCH_BATCH
+    destination = tenant_namespace(tenant_id)
+    namespaces = index.list_namespaces()
+    moved = failed = 0
+
+    for paper_id in paper_ids:
+        source_manifest = load_manifest(paper_id)
+        tenant_manifest = load_manifest(paper_id, tenant_id)
+        prefix = paper_namespace(paper_id, '')
+        complete = True
+
+        for source in sorted(namespace for namespace in namespaces if namespace.startswith(prefix)):
+            section = source[len(prefix):]
+            ids = list(index.list_ids(source))
+            copied = []
+            for start in range(0, len(ids), batch_size):
+                batch_ids = ids[start:start + batch_size]
+                vectors = index.fetch(ids=batch_ids, namespace=source)['vectors']
+                batch = [
+                    (vector_id, vector['values'], {**vector['metadata'], 'source': paper_id, 'section': section})
+                    for vector_id, vector in vectors.items()
+                ]
+                if batch:
+                    results = upsert_vectors_in_batches(index, {destination: batch})
+                    copied.extend(vector_id for result in results if result['ok'] for vector_id in result['ids'])
+
+                # IDs gone from the source since they were listed were moved by a concurrent run
+                absent = [vector_id for vector_id in batch_ids if vector_id not in vectors]
+                if absent:
+                    copied.extend(index.fetch(ids=absent, namespace=destination)['vectors'])
+
+            missing = len(ids) - len(copied)
+            moved += len(copied)
+            failed += missing
+            tenant_manifest['chunks'].update({vector_id: section for vector_id in copied})
+            if missing:
+                complete = False
+                print(f'⚠️ {missing}/{len(ids)} vectors of "{source}" were not copied; keeping the source namespace')
+            else:
+                try:
+                    move_documents(source, lexical_namespace(paper_id, section, tenant_id), ids, keep_source=not delete_source)
+                except Exception as e:
+                    print(f'⚠️ Failed to move the lexical index of "{source}"; run the migration again to move it: {e}')
+                if delete_source:
+                    index.delete(ids=ids, namespace=source)
+                    forget_writes(source, ids)
+                    record_deletes(source, ids)
+            print(f'📦 {len(copied)} vectors moved from "{source}" to "{destination}"')
+
+        # A partly moved paper is stored again by its next ingest
+        tenant_manifest['file_digest'] = source_manifest['file_digest'] if complete else None
+        save_manifest(paper_id, tenant_manifest, tenant_id)
+
+    print(f'✅ Migrated {moved} vectors of {len(paper_ids)} papers to "{destination}", {failed} failed')
+    return {'papers': len(paper_ids), 'moved': moved, 'failed': failed}
+
+if __name__ == '__main__':
+    # python -m services.vector_layout_service <user id> [--papers P1 P2] [--keep-source]
+    parser = argparse.ArgumentParser(description='Move a user\'s vectors from per-paper namespaces to the tenant layout.')
+    parser.add_argument('tenant_id', help='User ID whose uploaded papers are migrated')
+    parser.add_argument('--papers', nargs='+', help='Only migrate these paper IDs')
+    parser.add_argument('--keep-source', action='store_true', help='Leave the per-paper namespaces in place')
+    args = parser.parse_args()
+    summary = migrate_to_tenant_layout(args.tenant_id, paper_ids=args.papers, delete_source=not args.keep_source)
+    raise SystemExit(1 if summary['failed'] else 0)
@@ -0,0 +1,303 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from utils.vector_segments import SegmentedNamespace, namespace_directory, list_segment_namespaces
+from utils.vector_layout import matches_filter
+from config import VECTOR_DIMENSION, LOCAL_SEGMENT_MAX_ROWS, FETCH_BATCH_SIZE
+
+def _get(obj, key, default=None):
+    '''Reads a field from a Pinecone response whether it is a dict or a model object.'''
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    try:
+        return obj[key]
+    except (KeyError, TypeError, AttributeError):
+        return getattr(obj, key, default)
+
+class VectorStore(ABC):
+    '''
+    Storage used by ingestion and retrieval. Vectors are (id, values, metadata) tuples
+    grouped in namespaces; query results use Pinecone's shape:
+    {'matches': [{'id', 'score', 'metadata'}, ...]} with higher scores more similar,
+    plus each match's 'values' when queried with `include_values`.
+    Queries take an optional metadata `filter` in Pinecone's filter language.
+    '''
+
+    @abstractmethod
+    def upsert(self, vectors, namespace):
+        pass
+
+    @abstractmethod
+    def query(self, vector, top_k, namespace, include_metadata=True, filter=None, include_values=False):
+        pass
+
+    @abstractmethod
+    def fetch(self, ids, namespace):
+        '''Returns {'vectors': {id: {'id', 'values', 'metadata'}}} for the IDs that exist.'''
+
+    @abstractmethod
+    def delete(self, ids, namespace):
+        pass
+
+    @abstractmethod
+    def describe_index_stats(self):
+        '''Returns {'namespaces': {namespace: {'vector_count': n}}}.'''
+
+    @abstractmethod
+    def list_ids(self, namespace, prefix=''):
+        '''Yields the IDs stored in a namespace that start with `prefix`.'''
+
+    def list_namespaces(self):
+        return list(self.describe_index_stats().get('namespaces', {}))
+
+class PineconeVectorStore(VectorStore):
+    '''
+    VectorStore backed by a Pinecone index handle. An optional local `mirror` store
+    receives every write as well and answers queries for the namespaces it holds in
+    full, saving the network round trip. `remote_count(namespace)` gives the index's
+    vector count for a namespace; the mirror only serves a namespace holding at least
+    as many vectors, so one that missed writes (made before it was enabled, or by a
+    process without it) is queried remotely instead of returning a subset.
+    '''
+
+    def __init__(self, index, mirror=None, remote_count=None):
+        self.index = index
+        self.mirror = mirror
+        self.remote_count = remote_count
+
+    def upsert(self, vectors, namespace):
+        response = self.index.upsert(vectors, namespace=namespace)
+        if self.mirror is not None:
+            self.mirror.upsert(vectors, namespace=namespace)
+        return response
+
+    def mirror_is_complete(self, namespace):
+        if self.mirror is None or self.remote_count is None:
+            return False
+        mirrored = self.mirror.vector_count(namespace)
+        return mirrored > 0 and mirrored >= self.remote_count(namespace)
+
+    def query(self, vector, top_k, namespace, include_metadata=True, filter=None, include_values=False):
+        if self.mirror_is_complete(namespace):
+            return self.mirror.query(
+                vector=vector, top_k=top_k, namespace=namespace, include_metadata=include_metadata,
+                filter=filter, include_values=include_values
+            )
+        kwargs = {'filter': filter} if filter else {}
+        if include_values:
+            kwargs['include_values'] = True
+        response = self.index.query(vector=vector, top_k=top_k, namespace=namespace, include_metadata=include_metadata, **kwargs)
+        matches = []
+        for match in _get(response, 'matches') or []:
+            matches.append({'id': _get(match, 'id'), 'score': _get(match, 'score'), 'metadata': _get(match, 'metadata') or {}})
+            if include_values:
+                matches[-1]['values'] = list(_get(match, 'values') or [])
+        return {'matches': matches}
+
+    def fetch(self, ids, namespace):
+        ids = list(ids)
+        vectors = {}
+        for start in range(0, len(ids), FETCH_BATCH_SIZE):
+            response = self.index.fetch(ids=ids[start:start + FETCH_BATCH_SIZE], namespace=namespace)
+            for vector_id, vector in (_get(response, 'vectors') or {}).items():
+                vectors[vector_id] = {'id': vector_id, 'values': list(_get(vector, 'values') or []), 'metadata': _get(vector, 'metadata') or {}}
+        return {'vectors': vectors}
+
+    def delete(self, ids, namespace):
+        response = self.index.delete(ids=ids, namespace=namespace)
+        if self.mirror is not None:
+            self.mirror.delete(ids=ids, namespace=namespace)
+        return response
+
+    def list_ids(self, namespace, prefix=''):
+        # Pages hold plain IDs in older clients and {'id'} items in newer ones
+        for page in self.index.list(prefix=prefix or None, namespace=namespace):
+            for item in page:
+                yield item if isinstance(item, str) else _get(item, 'id')
+
+    def describe_index_stats(self):
+        stats = self.index.describe_index_stats()
+        return {'namespaces': {
+            namespace: {'vector_count': _get(summary, 'vector_count', 0)}
+            for namespace, summary in (_get(stats, 'namespaces') or {}).items()
+        }}
+
+class _LocalNamespace:
+    '''Unit vectors of one namespace in a dense matrix, searched exactly.'''
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.ids = []        # row -> ID (None once deleted)
+        self.metadata = []   # row -> metadata
+        self.rows = {}       # ID -> row
+
+    def __len__(self):
+        return len(self.rows)
+
+    def upsert(self, vectors):
+        new_rows = []
+        for vector_id, values, metadata in vectors:
+            vector = np.asarray(values, dtype=np.float32).reshape(-1)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm else vector
+            row = self.rows.get(vector_id)
+            if row is None:
+                row = len(self.ids) + len(new_rows)
+                new_rows.append((vector_id, vector, metadata or {}))
+                self.rows[vector_id] = row
+            else:
+                self.vectors[row] = vector
+                self.metadata[row] = metadata or {}
+
+        if new_rows:
+            self.vectors = np.vstack([self.vectors] + [vector[None, :] for _, vector, _ in new_rows])
+            self.ids.extend(vector_id for vector_id, _, _ in new_rows)
+            self.metadata.extend(metadata for _, _, metadata in new_rows)
+
+    def delete(self, ids):
+        for vector_id in ids:
+            row = self.rows.pop(vector_id, None)
+            if row is None:
+                continue
+            self.ids[row] = None
+            self.metadata[row] = None
+
+        # Compact once most rows are dead
+        if len(self.ids) > 2 * max(len(self.rows), 1):
+            live = [row for row, vector_id in enumerate(self.ids) if vector_id is not None]
+            self.vectors = self.vectors[live]
+            self.ids = [self.ids[row] for row in live]
+            self.metadata = [self.metadata[row] for row in live]
+            self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+
+    def fetch(self, ids):
+        return {
+            vector_id: {
+                'id': vector_id,
+                'values': self.vectors[self.rows[vector_id]].tolist(),
+                'metadata': dict(self.metadata[self.rows[vector_id]])
+            }
+            for vector_id in ids if vector_id in self.rows
+        }
+
+    def list_ids(self):
+        return list(self.rows)
+
+    def search(self, vector, top_k, filter=None):
+        '''Returns [(ID, cosine score, metadata)] of the top_k most similar live vectors matching `filter`.'''
+        rows, scores = self._search_rows(vector, top_k, filter)
+        return [(self.ids[row], float(score), dict(self.metadata[row])) for row, score in zip(rows, scores)]
+
+    def _search_rows(self, vector, top_k, filter=None):
+        top_k = min(top_k, len(self.rows))
+        if top_k <= 0:
+            return [], []
+        query = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+
+        # Filtered queries scan the matching rows exactly
+        if filter:
+            allowed = [row for row in self.rows.values() if matches_filter(self.metadata[row], filter)]
+            if not allowed:
+                return [], []
+            scores = self.vectors[allowed] @ query
+            best = np.argsort(-scores)[:top_k]
+            return [allowed[i] for i in best], scores[best].tolist()
+
+        scores = self.vectors @ query
+        if len(self.rows) < len(self.ids):
+            dead = [row for row, vector_id in enumerate(self.ids) if vector_id is None]
+            scores[dead] = -np.inf
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return best.tolist(), scores[best].tolist()
+
+class LocalVectorStore(VectorStore):
+    '''
+    In-process VectorStore for offline use, CI and small per-user corpora.
+    Scores are cosine similarities, matching the Pinecone index metric.
+    With a `directory`, namespaces are kept in memory-mapped float16 segment files
+    shared by every process using the same directory; without one they live in memory.
+    '''
+
+    def __init__(self, dimension=VECTOR_DIMENSION, directory=None):
+        self.dimension = dimension
+        self.directory = directory
+        self._namespaces = {}
+        self._lock = threading.RLock()
+
+    def _namespace(self, namespace, create=False):
+        entries = self._namespaces.get(namespace)
+        if entries is None:
+            if self.directory is None:
+                if not create:
+                    return None
+                entries = _LocalNamespace(self.dimension)
+            else:
+                path = namespace_directory(self.directory, namespace)
+                if not create and not os.path.isdir(path):
+                    return None
+                entries = SegmentedNamespace(path, self.dimension, max_rows=LOCAL_SEGMENT_MAX_ROWS)
+            self._namespaces[namespace] = entries
+        return entries
+
+    def has_namespace(self, namespace):
+        return self.vector_count(namespace) > 0
+
+    def vector_count(self, namespace):
+        with self._lock:
+            entries = self._namespace(namespace)
+            return len(entries) if entries is not None else 0
+
+    def upsert(self, vectors, namespace):
+        with self._lock:
+            self._namespace(namespace, create=True).upsert(vectors)
+        return {'upserted_count': len(vectors)}
+
+    def query(self, vector, top_k, namespace, include_metadata=True, filter=None, include_values=False):
+        with self._lock:
+            entries = self._namespace(namespace)
+            if entries is None:
+                return {'matches': []}
+            matches = [
+                {'id': vector_id, 'score': score, 'metadata': metadata if include_metadata else {}}
+                for vector_id, score, metadata in entries.search(vector, top_k, filter=filter)
+            ]
+            if include_values:
+                stored = entries.fetch([match['id'] for match in matches])
+                for match in matches:
+                    match['values'] = stored[match['id']]['values']
+            return {'matches': matches}
+
+    def fetch(self, ids, namespace):
+        with self._lock:
+            entries = self._namespace(namespace)
+            return {'vectors': entries.fetch(ids) if entries is not None else {}}
+
+    def list_ids(self, namespace, prefix=''):
+        with self._lock:
+            entries = self._namespace(namespace)
+            ids = entries.list_ids() if entries is not None else []
+        return [vector_id for vector_id in ids if vector_id.startswith(prefix)]
+
+    def delete(self, ids, namespace):
+        with self._lock:
+            entries = self._namespace(namespace)
+            if entries is None:
+                return
+            entries.delete(ids)
+            if not len(entries) and self.directory is None:
+                del self._namespaces[namespace]
+
+    def describe_index_stats(self):
+        with self._lock:
+            namespaces = set(self._namespaces)
+            if self.directory is not None:
+                namespaces.update(list_segment_namespaces(self.directory))
+            counts = {namespace: len(self._namespace(namespace)) for namespace in namespaces}
+            return {'namespaces': {
+                namespace: {'vector_count': count} for namespace, count in counts.items() if count
+            }}
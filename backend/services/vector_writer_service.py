@@ -0,0 +1,75 @@
+from time import sleep
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from services.write_overlay_service import record_writes
+from services.corpus_catalog_service import record_upserts
+from config import (
+    UPSERT_BATCH_SIZE,
+    UPSERT_MAX_REQUEST_BYTES,
+    UPSERT_CONCURRENCY,
+    UPSERT_MAX_IN_FLIGHT,
+    UPSERT_RETRIES
+)
+
+def _estimate_bytes(vector):
+    '''Rough request size of one (id, values, metadata) vector.'''
+    vector_id, values, metadata = vector
+    return len(vector_id) + len(values) * 4 + sum(len(str(v)) for v in (metadata or {}).values())
+
+def make_upsert_batches(vectors_by_namespace, batch_size=None, max_bytes=None):
+    '''Splits each namespace's vectors into batches bounded by count and estimated request size.'''
+    batch_size = batch_size or UPSERT_BATCH_SIZE
+    max_bytes = max_bytes or UPSERT_MAX_REQUEST_BYTES
+
+    batches = []
+    for namespace, vectors in vectors_by_namespace.items():
+        batch, batch_bytes = [], 0
+        for vector in vectors:
+            size = _estimate_bytes(vector)
+            if batch and (len(batch) >= batch_size or batch_bytes + size > max_bytes):
+                batches.append((namespace, batch))
+                batch, batch_bytes = [], 0
+            batch.append(vector)
+            batch_bytes += size
+        if batch:
+            batches.append((namespace, batch))
+    return batches
+
+def _upsert_batch(index, namespace, batch, retries, retry_delay):
+    error = None
+    for attempt in range(1, retries + 1):
+        try:
+            index.upsert(batch, namespace=namespace)
+            record_writes(namespace, batch)
+            record_upserts(namespace, [vector_id for vector_id, _, _ in batch])
+            return {'namespace': namespace, 'ids': [v[0] for v in batch], 'ok': True, 'attempts': attempt, 'error': None}
+        except Exception as e:
+            error = e
+            print(f'⚠️ Upsert of {len(batch)} vectors to "{namespace}" failed (attempt {attempt}/{retries}): {e}')
+            if attempt < retries:
+                sleep(retry_delay * 2 ** (attempt - 1))
+    return {'namespace': namespace, 'ids': [v[0] for v in batch], 'ok': False, 'attempts': retries, 'error': str(error)}
+
+def upsert_vectors_in_batches(index, vectors_by_namespace, retries=None, retry_delay=1,
+                              max_workers=None, max_in_flight=None):
+    '''
+    Upserts {namespace: [(id, values, metadata), ...]} with one request per batch.
+    Batches are sent in parallel; at most `max_in_flight` are queued at a time so a large
+    ingest cannot pile up unbounded work. Failed batches are retried with exponential backoff.
+    Returns one result per batch: {'namespace', 'ids', 'ok', 'attempts', 'error'}.
+    '''
+    retries = retries or UPSERT_RETRIES
+    max_in_flight = max_in_flight or UPSERT_MAX_IN_FLIGHT
+    results = []
+
+    with ThreadPoolExecutor(max_workers=max_workers or UPSERT_CONCURRENCY) as executor:
+        pending = set()
+        for namespace, batch in make_upsert_batches(vectors_by_namespace):
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+            pending.add(executor.submit(_upsert_batch, index, namespace, batch, retries, retry_delay))
+
+        done, _ = wait(pending)
+        results.extend(future.result() for future in done)
+
+    return results
@@ -0,0 +1,134 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.vector_layout import matches_filter
+from config import WRITE_OVERLAY_MAX_VECTORS, WRITE_CONFIRM_TIMEOUT, WRITE_CONFIRM_INTERVAL, FETCH_BATCH_SIZE
+
+# namespace -> {vector ID: (unit vector, metadata)} for vectors written but not yet
+# confirmed by the remote index. Pinecone is eventually consistent, so a freshly
+# upserted vector may be missing from queries for a while after the write succeeds.
+_overlay = OrderedDict()
+_size = 0
+_lock = threading.Lock()
+
+def _unit(values):
+    vector = np.asarray(values, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def record_writes(namespace, vectors):
+    '''Holds acknowledged (id, values, metadata) writes until the index confirms them.'''
+    global _size
+    with _lock:
+        entries = _overlay.setdefault(namespace, {})
+        for vector_id, values, metadata in vectors:
+            if vector_id not in entries:
+                _size += 1
+            entries[vector_id] = (_unit(values), metadata or {})
+        _overlay.move_to_end(namespace)
+
+        # Oldest namespaces are dropped first; their reads fall back to the remote index alone
+        while _size > WRITE_OVERLAY_MAX_VECTORS and len(_overlay) > 1:
+            _, dropped = _overlay.popitem(last=False)
+            _size -= len(dropped)
+
+def forget_writes(namespace, ids):
+    '''Removes IDs from the overlay, e.g. once confirmed by the index or deleted.'''
+    global _size
+    with _lock:
+        entries = _overlay.get(namespace)
+        if not entries:
+            return
+        for vector_id in ids:
+            if entries.pop(vector_id, None) is not None:
+                _size -= 1
+        if not entries:
+            del _overlay[namespace]
+
+def pending_ids(namespace):
+    with _lock:
+        return list(_overlay.get(namespace, {}))
+
+def pending_namespaces():
+    with _lock:
+        return list(_overlay)
+
+def confirm_writes(index, namespace):
+    '''Fetches the namespace's pending IDs and drops those the index now serves.'''
+    ids = pending_ids(namespace)
+    if not ids:
+        return
+    confirmed = []
+    for start in range(0, len(ids), FETCH_BATCH_SIZE):
+        batch = ids[start:start + FETCH_BATCH_SIZE]
+        try:
+            response = index.fetch(ids=batch, namespace=namespace)
+        except Exception as e:
+            print(f'⚠️ Failed to confirm writes in {namespace}: {e}')
+            break
+        vectors = getattr(response, 'vectors', None)
+        if vectors is None and isinstance(response, dict):
+            vectors = response.get('vectors')
+        confirmed.extend(vector_id for vector_id in batch if vector_id in (vectors or {}))
+    if confirmed:
+        forget_writes(namespace, confirmed)
+        print(f'✅ {len(confirmed)}/{len(ids)} pending writes confirmed in {namespace}')
+
+def wait_for_writes(index, timeout=None, poll_interval=None):
+    '''
+    Confirms pending writes until the index serves all of them or `timeout` seconds pass.
+    The overlay only lives in the writing process, so a writer that hands off to other
+    processes (an upsert job) waits here before reporting its writes as done.
+    Returns the number of writes still unconfirmed.
+    '''
+    timeout = WRITE_CONFIRM_TIMEOUT if timeout is None else timeout
+    poll_interval = WRITE_CONFIRM_INTERVAL if poll_interval is None else poll_interval
+    deadline = time.monotonic() + timeout
+    while True:
+        for namespace in pending_namespaces():
+            confirm_writes(index, namespace)
+        with _lock:
+            remaining = _size
+        if not remaining or time.monotonic() >= deadline:
+            break
+        time.sleep(poll_interval)
+    if remaining:
+        print(f'⚠️ {remaining} writes not yet served by the index after {timeout}s')
+    return remaining
+
+def query_overlay(namespace, query_vector, top_k, filter=None, include_values=False):
+    '''Scores the namespace's pending vectors matching `filter` by cosine similarity, in the shape of Pinecone matches.'''
+    with _lock:
+        entries = [
+            (vector_id, entry) for vector_id, entry in _overlay.get(namespace, {}).items()
+            if matches_filter(entry[1], filter)
+        ]
+    if not entries:
+        return []
+
+    vectors = np.stack([vector for _, (vector, _) in entries])
+    scores = vectors @ _unit(query_vector)
+    best = np.argsort(-scores)[:top_k]
+    matches = [
+        {'id': entries[i][0], 'score': float(scores[i]), 'metadata': entries[i][1][1]}
+        for i in best
+    ]
+    if include_values:
+        for match, i in zip(matches, best):
+            match['values'] = vectors[i].tolist()  # Unit length, which is all a cosine comparison needs
+    return matches
+
+def merge_matches(remote_matches, overlay_matches, top_k):
+    '''Merges remote and overlay matches by score, keeping one match per ID.'''
+    merged = {}
+    for match in list(remote_matches or []) + list(overlay_matches or []):
+        if match['id'] not in merged or match['score'] > merged[match['id']]['score']:
+            merged[match['id']] = match
+    return sorted(merged.values(), key=lambda match: match['score'], reverse=True)[:top_k]
+
+def clear_overlay():
+    global _size
+    with _lock:
+        _overlay.clear()
+        _size = 0
@@ -0,0 +1,33 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+
+from services.index_provider_service import reset_index_pool
+from services.corpus_catalog_service import reset_catalog
+
+@pytest.fixture(autouse=True)
+def fresh_index_pool():
+    """Index handles and the namespace catalog are shared per process; drop them so each test sees its own patched Pinecone client."""
+    reset_index_pool()
+    reset_catalog()
+    yield
+    reset_index_pool()
+    reset_catalog()
+
+@pytest.fixture(autouse=True)
+def isolated_lexical_index(tmp_path, monkeypatch):
+    """Keep the BM25 index written during ingestion tests out of the real cache directory."""
+    monkeypatch.setattr("utils.lexical_index.LEXICAL_INDEX_PATH", str(tmp_path / "lexical_index.sqlite3"))
+
+@pytest.fixture(autouse=True)
+def isolated_catalog_stamp(tmp_path, monkeypatch):
+    """Keep the stamp that announces stored papers to other processes out of the real cache directory."""
+    monkeypatch.setattr("services.corpus_catalog_service.CORPUS_CATALOG_STAMP_PATH", str(tmp_path / "corpus_catalog.stamp"))
+
+@pytest.fixture(autouse=True)
+def isolated_parse_caches(tmp_path, monkeypatch):
+    """Keep the PDF text and embedding caches written while parsing and embedding out of the real cache directory."""
+    monkeypatch.setattr("utils.pdf_cache.PDF_CACHE_DIR", str(tmp_path / "pdf_text"))
+    monkeypatch.setattr("utils.embedding_cache.EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite3"))
@@ -34,17 +34,18 @@ def test_gen_quality_check(client, monkeypatch):
     monkeypatch.setattr("matplotlib.backends.backend_pdf.PdfPages", DummyPdfPages)
 
 
-    monkeypatch.setattr("routes.gen_quality_check.read_pdfs", lambda input_path: (["ref1.pdf"], ["doc1"]))
-    monkeypatch.setattr("routes.gen_quality_check.pdf_to_text", lambda output_path: "hypothesis")
-    monkeypatch.setattr("routes.gen_quality_check.CosineSimilarityChecker.calculate_similarity",
+    from utils.parsed_document import ParsedDocument
+    monkeypatch.setattr("services.quality_check_service.parse_pdfs", lambda input_path: [ParsedDocument("ref1.pdf", ["doc1"])])
+    monkeypatch.setattr("services.quality_check_service.parse_pdf", lambda output_path: ParsedDocument(output_path, ["hypothesis"]))
+    monkeypatch.setattr("services.quality_check_service.CosineSimilarityChecker.calculate_similarity",
                         lambda self: ([0.8], 0.8))
-    monkeypatch.setattr("routes.gen_quality_check.TFIDF.calculate_tfidf",
+    monkeypatch.setattr("services.quality_check_service.TFIDF.calculate_tfidf",
                         lambda self: __import__('pandas').DataFrame({"testword": [0.5]}))
-    monkeypatch.setattr("routes.gen_quality_check.BLEUScorer.calculate_bleu", lambda self: [0.6])
+    monkeypatch.setattr("services.quality_check_service.BLEUScorer.calculate_bleu", lambda self: [0.6])
     monkeypatch.setattr("utils.store_as_pdf.store_pdf", lambda text, id: None)
-    monkeypatch.setattr("routes.gen_quality_check.generate_wordcloud", lambda areas, output_file, id: None)
-    monkeypatch.setattr("quality_check.author_num.process_pdfs", lambda folder: {})
-    monkeypatch.setattr("quality_check.themetic_area.load_documents", lambda folder: [])
+    monkeypatch.setattr("services.quality_check_service.generate_wordcloud", lambda areas, output_file, id: None)
+    monkeypatch.setattr("services.quality_check_service.process_documents", lambda documents: {})
+    monkeypatch.setattr("services.quality_check_service.load_documents", lambda folder, parsed_documents: [])
     monkeypatch.setattr("quality_check.author_num.os.listdir", lambda path: [])
 
 
@@ -23,47 +23,50 @@ def client():
 
 def test_generate_full_systematic_review(client, monkeypatch):
     monkeypatch.setattr(
-        "routes.gen_systematic_review.get_files",
+        "services.review_service.get_files",
         lambda id: {"paperA": "dummy_path1", "paperB": "dummy_path2"}
     )
 
-    monkeypatch.setattr(
-        "routes.gen_systematic_review.search_pinecone",
-        lambda query, paper_ids, section, top_k: [f"{section}-dummy-result"]
-    )
+    class DummySession:
+        def __init__(self, query, paper_ids, tenant_id=None, include_values=False):
+            pass
+        def prefetch(self, sections, top_k):
+            pass
+        def search_matches(self, section, top_k):
+            return [{"id": section, "score": 0.9, "paper_id": "paperA", "text": f"{section}-dummy-result", "metadata": {}}]
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            pass
+
+    monkeypatch.setattr("services.review_service.RetrievalSession", DummySession)
 
     monkeypatch.setattr(
-        "routes.gen_systematic_review.store_pdf",
+        "services.review_service.store_pdf",
         lambda text, id: print(f"store_pdf called with text: {text[:30]}..., id: {id}")
     )
 
     monkeypatch.setattr(
-        "routes.gen_systematic_review.generate_background_section",
+        "services.review_service.generate_background_section",
         lambda results, query, chunk_size, previous_sections: "Background---"
     )
     monkeypatch.setattr(
-        "routes.gen_systematic_review.generate_methods_section",
+        "services.review_service.generate_methods_section",
         lambda results, query, chunk_size, previous_sections: "Methods---"
     )
     monkeypatch.setattr(
-        "routes.gen_systematic_review.generate_results_section",
+        "services.review_service.generate_results_section",
         lambda results, query, chunk_size, previous_sections: "Results---"
     )
     monkeypatch.setattr(
-        "routes.gen_systematic_review.generate_discussion_section",
+        "services.review_service.generate_discussion_section",
         lambda results, query, chunk_size, previous_sections: "Discussion---"
     )
     monkeypatch.setattr(
-        "routes.gen_systematic_review.generate_conclusion_section",
+        "services.review_service.generate_conclusion_section",
         lambda results, query, chunk_size, previous_sections: "Conclusion---"
     )
 
-    # 5) mock _get_fixed_limit_previous_sections
-    monkeypatch.setattr(
-        "routes.gen_systematic_review._get_fixed_limit_previous_sections",
-        lambda sr, limit: ["TRUNCATED"]
-    )
-
     payload = {"prompt": "Test query", "id": "dummy_id"}
     response = client.post("/api/generate", json=payload)
 
@@ -77,6 +80,20 @@ def test_generate_full_systematic_review(client, monkeypatch):
 
     print("\n✅ test_generate_systematic_review passed successfully!")
 
+def test_generate_full_systematic_review_async(client, monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        "routes.gen_systematic_review.enqueue_job",
+        lambda kind, payload: queued.append((kind, payload)) or "job123"
+    )
+
+    payload = {"prompt": "Test query", "id": "dummy_id", "async": True}
+    response = client.post("/api/generate", json=payload)
+
+    assert response.status_code == 202
+    assert response.get_json() == {"job_id": "job123", "status_url": "/api/jobs/job123"}
+    assert queued == [("generate", {"prompt": "Test query", "id": "dummy_id"})]
+
 if __name__ == '__main__':
     client_instance = app.test_client()
     test_generate_full_systematic_review(client_instance, monkeypatch=pytest.MonkeyPatch())
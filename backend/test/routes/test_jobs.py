@@ -0,0 +1,35 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+import pytest
+from flask import Flask
+
+import __main__
+app = Flask(__name__)
+app.testing = True
+__main__.app = app
+
+from routes.jobs import get_job_status
+app.add_url_rule('/api/jobs/<job_id>', view_func=get_job_status, methods=['GET'])
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+def test_get_job_status(client, monkeypatch):
+    job = {"id": "job123", "kind": "generate", "payload": {"id": "1"}, "status": "running",
+           "stage": "generating Methods", "progress": 0.2, "result": None, "error": None}
+    monkeypatch.setattr("routes.jobs.get_job", lambda job_id: job if job_id == "job123" else None)
+
+    response = client.get("/api/jobs/job123")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["status"] == "running"
+    assert data["stage"] == "generating Methods"
+    assert data["progress"] == 0.2
+    assert "payload" not in data
+
+def test_get_job_status_not_found(client, monkeypatch):
+    monkeypatch.setattr("routes.jobs.get_job", lambda job_id: None)
+    response = client.get("/api/jobs/missing")
+    assert response.status_code == 404
@@ -19,13 +19,19 @@ def client():
 def test_upsert_vectors(client, monkeypatch):
     monkeypatch.setattr("routes.upsert_vectors.initialise_pinecone", lambda: None)
     monkeypatch.setattr("routes.upsert_vectors.process_and_store_all_pdfs", lambda id: (5, {"paper1": "dummy_path"}))
-    monkeypatch.setattr("routes.upsert_vectors.check_all_upserted_chunks", lambda files, chunks_count: None)
     payload = {"id": "dummy_id"}
     response = client.post("/api/upsert", json=payload)
     data = response.get_json()
     assert response.status_code == 200
     assert "upserted" in data.get("message", "").lower()
 
+def test_upsert_vectors_async(client, monkeypatch):
+    monkeypatch.setattr("routes.upsert_vectors.enqueue_job", lambda kind, payload: "job123")
+    monkeypatch.setattr("routes.upsert_vectors.process_and_store_all_pdfs", lambda id: pytest.fail("should not run inline"))
+    response = client.post("/api/upsert", json={"id": "dummy_id", "async": True})
+    assert response.status_code == 202
+    assert response.get_json()["job_id"] == "job123"
+
 if __name__ == '__main__':
     client_instance = app.test_client()
     test_upsert_vectors(client_instance, monkeypatch=pytest.MonkeyPatch())
@@ -0,0 +1,61 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from services.candidate_selection_service import select_diverse_matches, shingle_overlap
+
+VECTORS = {
+    "tocilizumab lowered mortality in severe covid patients": [1.0, 0.0, 0.0],
+    "tocilizumab reduced mortality among severe covid patients": [0.99, 0.1, 0.0],
+    "adverse events were rare and mostly mild infections": [0.0, 1.0, 0.0],
+    "trial sites were located in europe and asia": [0.0, 0.0, 1.0],
+}
+
+def _match(text, score):
+    return {"id": text, "score": score, "paper_id": "paperA", "text": text, "metadata": {"text": text},
+            "values": VECTORS.get(text, [0.5, 0.5, 0.5])}
+
+def test_shingle_overlap_detects_repeated_text():
+    base = "patients in the treatment group had a lower rate of readmission at thirty days"
+    overlap = shingle_overlap([base, "as reported, " + base, "the control group was enrolled at three sites in two countries"])
+    assert overlap[0, 0] == pytest.approx(1.0)
+    assert overlap[0, 1] == pytest.approx(1.0)
+    assert overlap[0, 2] == pytest.approx(0.0)
+
+def test_mmr_prefers_diverse_chunks():
+    matches = [
+        _match("tocilizumab lowered mortality in severe covid patients", 0.90),
+        _match("tocilizumab reduced mortality among severe covid patients", 0.89),
+        _match("adverse events were rare and mostly mild infections", 0.80),
+        _match("trial sites were located in europe and asia", 0.60),
+    ]
+    # 语义几乎相同的第二个片段被更有信息量的片段取代
+    selected = select_diverse_matches(matches, k=2, mmr_lambda=0.5)
+    assert [match["text"] for match in selected] == [matches[0]["text"], matches[2]["text"]]
+
+    # lambda = 1 时只按相关度排序
+    selected = select_diverse_matches(matches, k=2, mmr_lambda=1.0)
+    assert [match["text"] for match in selected] == [matches[0]["text"], matches[1]["text"]]
+
+def test_near_duplicates_are_never_selected():
+    text = "the pooled odds ratio for readmission was lower in the intervention arm across all included trials"
+    matches = [_match(text, 0.9), _match("in summary, " + text, 0.88), _match("unrelated follow-up details", 0.2)]
+    selected = select_diverse_matches(matches, k=3, mmr_lambda=1.0)
+    assert [match["text"] for match in selected] == [matches[0]["text"], matches[2]["text"]]
+
+def test_small_candidate_lists_are_returned_unchanged():
+    matches = [_match("only chunk", 0.5)]
+    assert select_diverse_matches(matches, k=5) == matches
+    assert select_diverse_matches([], k=5) == []
+
+def test_matches_without_vectors_are_ranked_by_relevance():
+    matches = [
+        _match("tocilizumab lowered mortality in severe covid patients", 0.90),
+        dict(_match("tocilizumab reduced mortality among severe covid patients", 0.89), values=None),
+        _match("adverse events were rare and mostly mild infections", 0.80),
+    ]
+    # 只有关键词命中的片段没有向量，不参与相似度惩罚
+    selected = select_diverse_matches(matches, k=2, mmr_lambda=0.5)
+    assert [match["text"] for match in selected] == [matches[0]["text"], matches[1]["text"]]
@@ -1,11 +1,17 @@
 import sys
 import os
+import json
 import pytest
 from unittest.mock import MagicMock
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-from services.classify_chunk_service import classify_chunk_with_llm
+from services.classify_chunk_service import (
+    classify_chunk_with_llm,
+    classify_chunk_batch_with_llm,
+    classify_chunks_with_llm,
+    make_classification_batches
+)
 
 # 修改 dummy_invoke_valid 使其接受 self 和 prompt 两个参数
 def dummy_invoke_valid(self, prompt):
@@ -40,3 +46,65 @@ def test_classify_chunk_exception(monkeypatch):
     monkeypatch.setattr("services.classify_chunk_service.model", DummyModel())
     result = classify_chunk_with_llm("Test text")
     assert result == "Background"
+
+def test_make_classification_batches_respects_token_budget(monkeypatch):
+    monkeypatch.setattr("utils.token_util.count_tokens", lambda text, model_name: len(text))
+    chunks = ["a" * 40, "b" * 40, "c" * 40, "d" * 90, "e" * 10]
+    # 每批最多 100 个 token，最多 2 个 chunk
+    assert make_classification_batches(chunks, token_budget=100, max_batch_size=2) == [[0, 1], [2], [3, 4]]
+    assert make_classification_batches([]) == []
+
+class BatchModel:
+    """按 prompt 中的 chunk 数量返回 JSON 结果；包含 "bad" 的批次返回无法解析的内容"""
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        count = prompt.count("---CHUNK ")
+        class DummyResponse:
+            pass
+        response = DummyResponse()
+        if count == 0:
+            response.content = "Results"
+        elif "bad" in prompt:
+            response.content = "Sorry, I cannot help with that."
+        else:
+            response.content = json.dumps({"sections": ["Methods"] * (count - 1) + ["NotASection"]})
+        return response
+
+def test_classify_chunk_batch_with_llm_single_request(monkeypatch):
+    batch_model = BatchModel()
+    monkeypatch.setattr("services.classify_chunk_service.model", batch_model)
+
+    result = classify_chunk_batch_with_llm(["one", "two", "three"])
+    # 无效的标签默认返回 "Background"
+    assert result == ["Methods", "Methods", "Background"]
+    assert len(batch_model.prompts) == 1
+
+def test_classify_chunk_batch_with_llm_splits_on_bad_reply(monkeypatch):
+    batch_model = BatchModel()
+    monkeypatch.setattr("services.classify_chunk_service.model", batch_model)
+
+    result = classify_chunk_batch_with_llm(["one", "two", "bad", "four"])
+    # 整批失败 -> 拆成两半；含 "bad" 的一半再拆成单个 chunk
+    assert result == ["Methods", "Background", "Results", "Results"]
+    assert len(batch_model.prompts) == 5
+
+def test_classify_chunks_with_llm_keeps_order(monkeypatch):
+    monkeypatch.setattr("services.classify_chunk_service.make_classification_batches",
+                        lambda chunks: [[0, 1], [2]])
+    monkeypatch.setattr("services.classify_chunk_service.classify_chunk_batch_with_llm",
+                        lambda chunks: [f"label-{chunk}" for chunk in chunks])
+
+    assert classify_chunks_with_llm(["a", "b", "c"]) == ["label-a", "label-b", "label-c"]
+
+def test_classify_chunk_batch_with_llm_does_not_split_on_request_error(monkeypatch):
+    failing_model = MagicMock()
+    failing_model.invoke.side_effect = Exception("connection reset")
+    monkeypatch.setattr("services.classify_chunk_service.model", failing_model)
+
+    result = classify_chunk_batch_with_llm(["one", "two", "three", "four"])
+    # 请求失败不会拆分重试，整批直接回退
+    assert result == ["Background"] * 4
+    assert failing_model.invoke.call_count == 1
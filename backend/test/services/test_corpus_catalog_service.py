@@ -0,0 +1,123 @@
+import sys
+import os
+import threading
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import services.corpus_catalog_service as catalog
+from services.corpus_catalog_service import catalog_namespaces, namespace_count, record_upserts, record_deletes, refresh_catalog
+
+class StatsIndex:
+    def __init__(self, namespaces):
+        self.namespaces = namespaces
+        self.calls = 0
+    def describe_index_stats(self):
+        self.calls += 1
+        return {"namespaces": {ns: {"vector_count": count} for ns, count in self.namespaces.items()}}
+
+def test_catalog_loads_stats_once_and_tracks_writes():
+    index = StatsIndex({"systematic_review/paper1/Methods": 2})
+    assert catalog_namespaces(index) == {"systematic_review/paper1/Methods": 2}
+
+    record_upserts("systematic_review/paper2/Results", ["a", "b"])
+    record_deletes("systematic_review/paper1/Methods", ["x", "y"])
+    # 自己的写入和删除直接更新目录，不再调用 describe_index_stats
+    assert catalog_namespaces(index) == {"systematic_review/paper2/Results": 2}
+    assert index.calls == 1
+    assert namespace_count("systematic_review/paper2/Results", index) == 2
+    assert namespace_count("systematic_review/paper1/Methods", index) == 0
+    assert index.calls == 1
+
+def test_stale_catalog_reconciles_in_background(monkeypatch):
+    index = StatsIndex({"ns1": 1})
+    catalog_namespaces(index)
+
+    release = threading.Event()
+    slow_stats = index.describe_index_stats
+    def blocking_stats():
+        release.wait(5)
+        return slow_stats()
+    index.describe_index_stats = blocking_stats
+    index.namespaces = {"ns1": 5, "ns2": 3}
+    monkeypatch.setattr("services.corpus_catalog_service.CORPUS_CATALOG_TTL", 0)
+
+    # 过期的目录立即返回，后台线程负责与索引对账
+    assert catalog_namespaces(index) == {"ns1": 1}
+    record_upserts("ns3", ["a"])
+    thread = catalog._refresh_thread
+    release.set()
+    thread.join(5)
+
+    # 对账期间的写入不会被对账结果覆盖
+    monkeypatch.setattr("services.corpus_catalog_service.CORPUS_CATALOG_TTL", 300)
+    assert catalog_namespaces(index) == {"ns1": 5, "ns2": 3, "ns3": 1}
+
+def test_reconcile_keeps_writes_the_stats_do_not_show_yet(monkeypatch):
+    index = StatsIndex({"ns1": 1, "ns2": 4})
+    catalog_namespaces(index)
+
+    # 对账开始前刚写入的向量还没有出现在索引统计中
+    record_upserts("ns1", ["a", "b"])
+    record_upserts("ns3", ["c"])
+    refresh_catalog(index)
+    assert catalog_namespaces(index) == {"ns1": 3, "ns2": 4, "ns3": 1}
+
+    # 超过统计延迟窗口后以索引统计为准
+    index.namespaces = {"ns1": 2, "ns2": 4}
+    monkeypatch.setattr("services.corpus_catalog_service.CORPUS_CATALOG_STATS_LAG", -1)
+    refresh_catalog(index)
+    assert catalog_namespaces(index) == {"ns1": 2, "ns2": 4}
+
+def test_failed_refresh_keeps_catalog():
+    index = StatsIndex({"ns1": 1})
+    catalog_namespaces(index)
+
+    class FailingIndex:
+        def describe_index_stats(self):
+            raise ConnectionError("pinecone unavailable")
+
+    refresh_catalog(FailingIndex())
+    assert catalog_namespaces(index) == {"ns1": 1}
+
+def test_get_all_paper_ids_reads_the_catalog(monkeypatch):
+    from services.pinecone_service import get_all_paper_ids
+    index = StatsIndex({"systematic_review/paper1/Methods": 2, "tenant/7": 4})
+    monkeypatch.setattr("services.corpus_catalog_service.get_index", lambda: index)
+
+    assert get_all_paper_ids() == ["paper1"]
+    record_upserts("systematic_review/paper2/Methods", ["a"])
+    assert sorted(get_all_paper_ids()) == ["paper1", "paper2"]
+    assert index.calls == 1
+
+def test_get_all_paper_ids_of_a_tenant(tmp_path, monkeypatch):
+    from services.pinecone_service import get_all_paper_ids
+    from utils.ingest_manifest import save_manifest
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(tmp_path / "manifest"))
+    monkeypatch.setattr("utils.vector_layout.VECTOR_LAYOUT", "tenant")
+    index = StatsIndex({"systematic_review/paper1/Methods": 2, "tenant/7": 4})
+    monkeypatch.setattr("services.corpus_catalog_service.get_index", lambda: index)
+    save_manifest("paper 2", {"file_digest": "a", "chunks": {"7/paper 2-x": "Methods"}}, tenant_id="7")
+    save_manifest("paper3", {"file_digest": None, "chunks": {}}, tenant_id="7")
+    save_manifest("paper4", {"file_digest": "b", "chunks": {"8/paper4-x": "Methods"}}, tenant_id="8")
+
+    # 租户 namespace 的名字不包含论文，论文 ID 来自该用户的 manifest
+    assert sorted(get_all_paper_ids("7")) == ["paper 2", "paper1"]
+    # 索引中没有该用户的向量时 manifest 不可信
+    assert get_all_paper_ids("8") == ["paper1"]
+
+def test_other_processes_reload_after_invalidate(monkeypatch):
+    index = StatsIndex({"ns1": 1})
+    catalog_namespaces(index)
+    record_upserts("ns2", ["a"])
+
+    # 本进程自己的写入已计入目录，不需要重新读取
+    catalog.invalidate_catalog()
+    assert catalog_namespaces(index) == {"ns1": 1, "ns2": 1}
+    assert index.calls == 1
+
+    # 模拟另一个进程完成上传：目录在下次读取时重新加载
+    monkeypatch.setattr(catalog, "_stamp_seen", "stamp of an older upsert")
+    index.namespaces = {"ns1": 1, "ns3": 5}
+    assert catalog_namespaces(index) == {"ns1": 1, "ns3": 5}
+    assert index.calls == 2
@@ -36,3 +36,40 @@ def test_generate_section(monkeypatch):
     # 断言生成的内容中包含我们预期的字符串
     assert "Generated section content." in result
 
+
+def test_generate_section_limits_output_tokens(monkeypatch):
+    bound = {}
+    prompts = []
+
+    class DummyModel:
+        def bind(self, **kwargs):
+            bound.update(kwargs)
+            return self
+        def invoke(self, prompt):
+            prompts.append(prompt)
+            class DummyResponse:
+                content = "Generated section content."
+            return DummyResponse()
+
+    class DummyEncoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+        def decode(self, tokens):
+            return " ".join(tokens)
+
+    monkeypatch.setattr("services.generate_section_service.model", DummyModel())
+    monkeypatch.setattr("utils.token_util._get_encoding", lambda model_name: DummyEncoding())
+    monkeypatch.setattr("utils.context_packer.SECTION_CONTEXT_TOKEN_BUDGET", 50)
+
+    result = generate_section(
+        results=["relevant chunk " * 10, "second chunk " * 10, "third chunk " * 10],
+        query="Test query",
+        section_title="Conclusion",
+        section_prompt="Section prompt",
+        previous_sections=[]
+    )
+    assert result == "Generated section content."
+    # 输出长度由 max_tokens 控制，上下文按 token 预算装填
+    assert bound["max_tokens"] > 600
+    assert prompts[0].count("relevant chunk") == 10
+    assert "third chunk" not in prompts[0]
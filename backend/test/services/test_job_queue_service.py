@@ -0,0 +1,152 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from services.job_queue_service import (
+    enqueue_job, claim_next_job, update_job_progress, complete_job, fail_job, get_job, requeue_orphaned_jobs
+)
+from services import job_worker_service
+from services.job_worker_service import run_worker
+
+@pytest.fixture(autouse=True)
+def job_db(tmp_path, monkeypatch):
+    # 每个测试使用独立的 SQLite 队列
+    monkeypatch.setattr("services.job_queue_service.JOB_DB_PATH", str(tmp_path / "jobs.sqlite3"))
+
+def test_jobs_are_claimed_in_order():
+    first = enqueue_job("upsert", {"id": "1"})
+    second = enqueue_job("generate", {"id": "1", "prompt": "q"})
+
+    claimed = claim_next_job()
+    assert claimed["id"] == first
+    assert claimed["status"] == "running"
+    assert claim_next_job()["id"] == second
+    assert claim_next_job() is None
+
+def test_job_progress_and_result():
+    job_id = enqueue_job("generate", {"id": "1"})
+    claim_next_job()
+    update_job_progress(job_id, "generating Methods", 0.4)
+    assert get_job(job_id)["stage"] == "generating Methods"
+    assert get_job(job_id)["progress"] == 0.4
+
+    complete_job(job_id, {"systematic_review": "text"})
+    job = get_job(job_id)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"systematic_review": "text"}
+
+def test_failed_job_records_error():
+    job_id = enqueue_job("upsert", {"id": "1"})
+    fail_job(job_id, ValueError("boom"))
+    assert get_job(job_id)["status"] == "failed"
+    assert get_job(job_id)["error"] == "boom"
+
+def test_get_missing_job():
+    assert get_job("missing") is None
+
+def test_requeue_orphaned_jobs():
+    job_id = enqueue_job("upsert", {"id": "1"})
+    # 一个不存在的 worker 进程
+    claim_next_job(worker_pid=2 ** 22 + 12345)
+    assert requeue_orphaned_jobs() == 1
+    assert get_job(job_id)["status"] == "queued"
+
+def test_run_worker_dispatches_handlers(monkeypatch):
+    def generate(payload, progress):
+        progress("generating Background", 0.5)
+        return {"systematic_review": f"review for {payload['prompt']}"}
+
+    def failing(payload, progress):
+        raise RuntimeError("Document loading failed")
+
+    monkeypatch.setitem(job_worker_service.JOB_HANDLERS, "generate", generate)
+    monkeypatch.setitem(job_worker_service.JOB_HANDLERS, "quality_check", failing)
+    ok = enqueue_job("generate", {"id": "1", "prompt": "q"})
+    bad = enqueue_job("quality_check", {"id": "1"})
+    unknown = enqueue_job("unknown", {})
+
+    assert run_worker(max_jobs=5) == 3
+    assert get_job(ok)["result"] == {"systematic_review": "review for q"}
+    assert get_job(bad)["error"] == "Document loading failed"
+    assert get_job(unknown)["status"] == "failed"
+
+def _upsert_worker(job_db_path, tmp_dir, papers):
+    # 在独立的 worker 进程中运行：替换掉 Pinecone 相关的部分，PDF 提取走真实的进程池
+    import json
+    from services import job_queue_service, pdf_processing_service
+    job_queue_service.JOB_DB_PATH = job_db_path
+    pdf_processing_service.get_files = lambda id: papers
+    pdf_processing_service.catalog_namespaces = lambda: {}
+    pdf_processing_service.PDF_WORKERS = 2
+    job_worker_service.initialise_pinecone = lambda: None
+    job_worker_service.wait_for_writes = lambda index: 0
+    job_worker_service.get_index = lambda: None
+
+    def recording_upsert(text_chunks, paper_id, sections=None, tenant_id=None):
+        with open(os.path.join(tmp_dir, f"{paper_id}.json"), "w") as f:
+            json.dump(len(text_chunks), f)
+        return []
+    pdf_processing_service.upsert_all_chunks = recording_upsert
+
+    import multiprocessing, utils.pdf_cache, utils.ingest_manifest, services.corpus_catalog_service
+    # spawn 出来的 worker 进程池会重新导入 config；改用 fork 让提取进程继承下面替换的缓存路径
+    multiprocessing.set_start_method("fork", force=True)
+    services.corpus_catalog_service.CORPUS_CATALOG_STAMP_PATH = os.path.join(tmp_dir, "corpus_catalog.stamp")
+    utils.pdf_cache.PDF_CACHE_DIR = os.path.join(tmp_dir, "pdf_cache")
+    utils.ingest_manifest.INGEST_MANIFEST_DIR = os.path.join(tmp_dir, "manifest")
+    run_worker(max_jobs=1)
+
+def test_upsert_job_extracts_files_in_a_worker_process(tmp_path):
+    import multiprocessing
+    from services.corpus_catalog_service import catalog_namespaces
+
+    class StatsIndex:
+        calls = 0
+        def describe_index_stats(self):
+            StatsIndex.calls += 1
+            return {"namespaces": {}}
+    catalog_namespaces(StatsIndex())
+    papers_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../papers/test_papers"))
+    papers = {name: os.path.join(papers_dir, f"{name}.pdf") for name in ["P1.1", "P1.2"]}
+    job_id = enqueue_job("upsert", {"id": "1"})
+
+    # 与 start_job_workers 一样使用 spawn 启动非守护进程，多文件提取会在其中再开进程池
+    context = multiprocessing.get_context("spawn")
+    worker = context.Process(target=_upsert_worker, args=(str(tmp_path / "jobs.sqlite3"), str(tmp_path), papers))
+    worker.start()
+    worker.join(120)
+
+    job = get_job(job_id)
+    assert job["status"] == "succeeded", job["error"]
+    assert job["result"]["files"] == 2
+    assert sorted(path.name for path in tmp_path.glob("P1.*.json")) == ["P1.1.json", "P1.2.json"]
+    # 本进程的目录在 worker 完成上传后重新读取索引统计
+    catalog_namespaces(StatsIndex())
+    assert StatsIndex.calls == 2
+
+def test_stop_job_workers_lets_workers_finish(monkeypatch):
+    from services.job_worker_service import stop_job_workers
+
+    class DummyWorker:
+        def __init__(self):
+            self.alive = True
+            self.terminated = False
+        def join(self, timeout=None):
+            self.alive = False
+        def is_alive(self):
+            return self.alive
+        def terminate(self):
+            self.terminated = True
+
+    class DummyEvent:
+        def __init__(self):
+            self.flag = False
+        def set(self):
+            self.flag = True
+
+    workers, event = [DummyWorker(), DummyWorker()], DummyEvent()
+    stop_job_workers(workers, event, timeout=1)
+    assert event.flag
+    assert not any(worker.alive or worker.terminated for worker in workers)
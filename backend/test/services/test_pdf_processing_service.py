@@ -5,25 +5,26 @@ import pytest
 # 添加上级目录到 sys.path，以便导入 backend 模块
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
-from services.pdf_processing_service import process_and_store_all_pdfs
+from services.pdf_processing_service import process_and_store_all_pdfs, iter_extracted_chunks, extract_and_split
+from utils.parsed_document import ParsedDocument
 
 # Dummy functions for testing
 def dummy_get_files(id):
     return {"paper1": "dummy_path"}
 
-def dummy_pdf_to_text(path):
-    return "dummy pdf text"
+def dummy_parse_pdf(path):
+    return ParsedDocument(path, ["dummy pdf text"])
 
 def dummy_split_text_into_chunks(text, chunk_size=1500, overlap=300):
     return ["chunk1", "chunk2"]
 
-def dummy_upsert_all_chunks(text_chunks, paper_id):
+def dummy_upsert_all_chunks(text_chunks, paper_id, sections=None, tenant_id=None):
     # For testing, do nothing
     return
 
 def dummy_pinecone():
     class DummyPineconeClass:
-        def Index(self, name):
+        def Index(self, name, **kwargs):
             class DummyIndex:
                 def describe_index_stats(self):
                     return {"namespaces": {}}
@@ -33,13 +34,187 @@ def dummy_pinecone():
 def test_process_and_store_all_pdfs(monkeypatch):
     # Override functions in pdf_processing_service
     monkeypatch.setattr("services.pdf_processing_service.get_files", dummy_get_files)
-    monkeypatch.setattr("services.pdf_processing_service.pdf_to_text", dummy_pdf_to_text)
+    monkeypatch.setattr("services.pdf_processing_service.parse_pdf", dummy_parse_pdf)
     monkeypatch.setattr("services.pdf_processing_service.split_text_into_chunks", dummy_split_text_into_chunks)
     monkeypatch.setattr("services.pdf_processing_service.upsert_all_chunks", dummy_upsert_all_chunks)
-    # IMPORTANT: 覆盖 upsert_pinecone_service 中的 pinecone 对象
-    monkeypatch.setattr("services.upsert_pinecone_service.pinecone", dummy_pinecone())
+    # IMPORTANT: 覆盖 index_provider_service 中的 pinecone 对象
+    monkeypatch.setattr("services.index_provider_service.pinecone", dummy_pinecone())
     
     result = process_and_store_all_pdfs("test_id")
     # 预期返回 2 chunks 和 get_files 返回的字典
     assert result == (2, {"paper1": "dummy_path"})
 
+def test_process_and_store_all_pdfs_raises_on_failed_upserts(monkeypatch):
+    monkeypatch.setattr("services.pdf_processing_service.get_files", lambda id: {"paper1": "a.pdf", "paper2": "b.pdf"})
+    monkeypatch.setattr("services.pdf_processing_service.parse_pdf", dummy_parse_pdf)
+    monkeypatch.setattr("services.pdf_processing_service.split_text_into_chunks", dummy_split_text_into_chunks)
+    monkeypatch.setattr("services.pdf_processing_service.PDF_WORKERS", 1)
+    stored = []
+
+    def failing_upsert(text_chunks, paper_id, sections=None, tenant_id=None):
+        stored.append(paper_id)
+        return [{"namespace": f"systematic_review/{paper_id}/Methods", "ids": ["x"], "ok": paper_id != "paper1",
+                 "attempts": 3, "error": None if paper_id != "paper1" else "timeout"}]
+    monkeypatch.setattr("services.pdf_processing_service.upsert_all_chunks", failing_upsert)
+
+    with pytest.raises(RuntimeError, match="1 Pinecone upsert batches"):
+        process_and_store_all_pdfs("test_id")
+    # 失败后仍然处理了所有文件
+    assert sorted(stored) == ["paper1", "paper2"]
+
+def test_iter_extracted_chunks_in_process_pool(tmp_path, monkeypatch):
+    # 使用真实 PDF 在进程池中并行提取
+    monkeypatch.setattr("utils.pdf_cache.PDF_CACHE_DIR", str(tmp_path))
+    papers_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../papers/test_papers"))
+    files = {name: os.path.join(papers_dir, f"{name}.pdf") for name in ["P1.1", "P1.2", "P1.3"]}
+
+    results = {file: chunks for file, chunks, _ in iter_extracted_chunks(files, max_workers=3)}
+    assert set(results) == set(files)
+    for name, chunks in results.items():
+        assert chunks, f"No chunks extracted from {name}"
+        assert all(len(chunk) <= 1500 for chunk in chunks)
+
+def test_iter_extracted_chunks_single_file_runs_inline(monkeypatch):
+    # 单个文件不启动进程池
+    monkeypatch.setattr("services.pdf_processing_service.parse_pdf", dummy_parse_pdf)
+    monkeypatch.setattr("services.pdf_processing_service.split_text_into_chunks", dummy_split_text_into_chunks)
+    monkeypatch.setattr("services.pdf_processing_service.ProcessPoolExecutor", None)
+
+    assert list(iter_extracted_chunks({"paper1": "dummy_path"})) == [("paper1", ["chunk1", "chunk2"], [None, None])]
+def test_large_files_are_streamed_in_batches(tmp_path, monkeypatch):
+    # 大文件在主进程中逐页流式处理：读完全部页面之前就已开始嵌入和写入，每批不超过固定大小
+    from services.vector_store_service import LocalVectorStore
+    pdf_path = tmp_path / "big.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 large")
+    pages_read = []
+    embedded_batches = []
+
+    def fake_pages(path, headings=None):
+        for page in range(20):
+            if page == 0:
+                headings.append(("Methods", "Methods"))
+            pages_read.append(page)
+            yield ("Methods\n" if page == 0 else "") + f"page {page} " + "word " * 300
+
+    def fake_embeddings(texts):
+        embedded_batches.append((len(texts), len(pages_read)))
+        return [[1.0, 0.0] for _ in texts]
+
+    store = LocalVectorStore(dimension=2)
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(tmp_path / "manifest"))
+    monkeypatch.setattr("services.pdf_processing_service.PDF_STREAMING_MIN_BYTES", 0)
+    monkeypatch.setattr("services.pdf_processing_service.get_files", lambda id: {"big": str(pdf_path)})
+    monkeypatch.setattr("services.pdf_processing_service.iter_pdf_pages", fake_pages)
+    monkeypatch.setattr("services.pdf_processing_service.iter_extracted_chunks", lambda files: pytest.fail("streamed files are not extracted whole") if files else iter(()))
+    monkeypatch.setattr("services.upsert_pinecone_service.PDF_STREAMING_BATCH", 2)
+    monkeypatch.setattr("services.upsert_pinecone_service.get_index", lambda: store)
+    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embeddings", fake_embeddings)
+    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunks", lambda chunks: pytest.fail("labelled from headings"))
+
+    count, files = process_and_store_all_pdfs("test_id")
+    assert count > 10 and files == {"big": str(pdf_path)}
+    assert all(size <= 2 for size, _ in embedded_batches)
+    # 第一批嵌入时只读了少量页面
+    assert embedded_batches[0][1] < 5
+    assert store.describe_index_stats() == {"namespaces": {"systematic_review/big/Methods": {"vector_count": count}}}
+
+def test_extract_and_split_labels_sections_from_headings(tmp_path, monkeypatch):
+    # 根据版面标题为 chunk 标注章节，无需调用 LLM
+    monkeypatch.setattr("utils.pdf_cache.PDF_CACHE_DIR", str(tmp_path))
+    pdf_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../papers/input_papers/P3/P3.1.pdf"))
+
+    _, chunks, sections = extract_and_split("P3.1", pdf_path)
+    labelled = [section for section in sections if section]
+    assert len(labelled) > len(chunks) // 2
+    assert {"Background", "Methods", "Results", "Discussion"} <= set(labelled)
+    # 标签按文档顺序出现
+    order = ["Background", "Methods", "Results", "Discussion", "Conclusion"]
+    positions = [order.index(section) for section in labelled]
+    assert positions == sorted(positions)
+
+def test_process_and_store_all_pdfs_skips_unchanged_files(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(tmp_path / "manifest"))
+    pdf_path = tmp_path / "paper1.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 content")
+    monkeypatch.setattr("services.pdf_processing_service.get_files", lambda id: {"paper1": str(pdf_path)})
+    monkeypatch.setattr("services.pdf_processing_service.parse_pdf", dummy_parse_pdf)
+    monkeypatch.setattr("services.pdf_processing_service.split_text_into_chunks", dummy_split_text_into_chunks)
+    extracted = []
+
+    def recording_upsert(text_chunks, paper_id, sections=None, tenant_id=None):
+        from utils.ingest_manifest import chunk_id, load_manifest, save_manifest
+        extracted.append(paper_id)
+        manifest = load_manifest(paper_id)
+        manifest["chunks"] = {chunk_id(paper_id, chunk): "Methods" for chunk in text_chunks}
+        save_manifest(paper_id, manifest)
+        return []
+    monkeypatch.setattr("services.pdf_processing_service.upsert_all_chunks", recording_upsert)
+    monkeypatch.setattr("services.pdf_processing_service.catalog_namespaces",
+                        lambda: {"systematic_review/paper1/Methods": 2})
+
+    assert process_and_store_all_pdfs("test_id") == (2, {"paper1": str(pdf_path)})
+    # 第二次：文件未变，不再提取，chunk 数来自 manifest
+    assert process_and_store_all_pdfs("test_id") == (2, {"paper1": str(pdf_path)})
+    assert extracted == ["paper1"]
+
+    # 文件内容变化后重新处理
+    pdf_path.write_bytes(b"%PDF-1.4 edited")
+    process_and_store_all_pdfs("test_id")
+    assert extracted == ["paper1", "paper1"]
+
+def test_process_and_store_all_pdfs_reingests_files_missing_from_index(tmp_path, monkeypatch):
+    from utils.ingest_manifest import chunk_id, save_manifest, load_manifest
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(tmp_path / "manifest"))
+    pdf_path = tmp_path / "paper1.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 content")
+    from utils.pdf_cache import file_digest
+    save_manifest("paper1", {"file_digest": file_digest(str(pdf_path)),
+                             "chunks": {chunk_id("paper1", "chunk1"): "Methods", chunk_id("paper1", "chunk2"): "Methods"}})
+    monkeypatch.setattr("services.pdf_processing_service.get_files", lambda id: {"paper1": str(pdf_path)})
+    monkeypatch.setattr("services.pdf_processing_service.parse_pdf", dummy_parse_pdf)
+    monkeypatch.setattr("services.pdf_processing_service.split_text_into_chunks", dummy_split_text_into_chunks)
+    # 索引被重建：manifest 里记录的向量在索引中只剩一个
+    monkeypatch.setattr("services.pdf_processing_service.catalog_namespaces",
+                        lambda: {"systematic_review/paper1/Methods": 1})
+    stored = []
+
+    def recording_upsert(text_chunks, paper_id, sections=None, tenant_id=None):
+        # 过期的 manifest 已被清除，所有 chunk 都会重新写入
+        stored.append(load_manifest(paper_id)["chunks"])
+        return []
+    monkeypatch.setattr("services.pdf_processing_service.upsert_all_chunks", recording_upsert)
+
+    process_and_store_all_pdfs("test_id")
+    assert stored == [{}]
+
+def test_tenant_layout_checks_the_papers_own_ids(tmp_path, monkeypatch):
+    # 租户 namespace 由该用户所有论文共享，向量数不能说明这篇论文是否还在索引中
+    from services.vector_store_service import LocalVectorStore
+    from utils.ingest_manifest import chunk_id, save_manifest
+    from utils.pdf_cache import file_digest
+    monkeypatch.setattr("utils.vector_layout.VECTOR_LAYOUT", "tenant")
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(tmp_path / "manifest"))
+    pdf_path = tmp_path / "paper1.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 content")
+    ids = [chunk_id("paper1", "chunk1", tenant_id="7"), chunk_id("paper1", "chunk2", tenant_id="7")]
+    save_manifest("paper1", {"file_digest": file_digest(str(pdf_path)), "chunks": {i: "Methods" for i in ids}}, tenant_id="7")
+
+    store = LocalVectorStore(dimension=2)
+    store.upsert([(f"other-{i}", [1, 0], {}) for i in range(5)], namespace="tenant/7")
+    monkeypatch.setattr("services.pdf_processing_service.get_index", lambda: store)
+    monkeypatch.setattr("services.pdf_processing_service.catalog_namespaces", lambda: {"tenant/7": 5})
+    monkeypatch.setattr("services.pdf_processing_service.get_files", lambda id: {"paper1": str(pdf_path)})
+    monkeypatch.setattr("services.pdf_processing_service.parse_pdf", dummy_parse_pdf)
+    monkeypatch.setattr("services.pdf_processing_service.split_text_into_chunks", dummy_split_text_into_chunks)
+    extracted = []
+    monkeypatch.setattr("services.pdf_processing_service.upsert_all_chunks",
+                        lambda text_chunks, paper_id, sections=None, tenant_id=None: extracted.append(paper_id) or [])
+
+    process_and_store_all_pdfs("7")
+    assert extracted == ["paper1"]
+
+    # 论文自己的向量都在时跳过
+    store.upsert([(i, [1, 0], {}) for i in ids], namespace="tenant/7")
+    save_manifest("paper1", {"file_digest": file_digest(str(pdf_path)), "chunks": {i: "Methods" for i in ids}}, tenant_id="7")
+    process_and_store_all_pdfs("7")
+    assert extracted == ["paper1"]
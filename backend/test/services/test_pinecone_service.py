@@ -6,7 +6,12 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"
 
 from services.pinecone_service import initialise_pinecone, get_all_paper_ids
 
-def test_initialise_pinecone(monkeypatch):
+def test_initialise_pinecone(tmp_path, monkeypatch):
+    manifest_dir = tmp_path / "manifest"
+    manifest_dir.mkdir()
+    (manifest_dir / "testpaper.json").write_text('{"file_digest": "abc", "chunks": {}}')
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(manifest_dir))
+
     class DummyPinecone:
         def __init__(self):
             self.created = False
@@ -26,11 +31,144 @@ def test_initialise_pinecone(monkeypatch):
     monkeypatch.setattr("services.pinecone_service.pinecone", dummy)
     initialise_pinecone()
     assert dummy.created is True
+    # 新建的索引是空的，本地 manifest 随之作废
+    assert not manifest_dir.exists()
 
 def test_get_all_paper_ids(monkeypatch):
     class DummyIndex:
         def describe_index_stats(self):
             return {"namespaces": {"systematic_review/testpaper/Background": {"vector_count": 2}}}
-    monkeypatch.setattr("services.pinecone_service.pinecone.Index", lambda name: DummyIndex())
+    monkeypatch.setattr("services.pinecone_service.pinecone.Index", lambda name, **kwargs: DummyIndex())
     paper_ids = get_all_paper_ids()
     assert "testpaper" in paper_ids
+
+def test_retrieval_session_embeds_query_once(monkeypatch):
+    from services.pinecone_service import RetrievalSession
+    embedded = []
+    indexes = []
+
+    class DummyIndex:
+        def fetch(self, ids, namespace):
+            return {"vectors": {}}
+        def query(self, vector, top_k, namespace, include_metadata, include_values=False):
+            return {"matches": [{"id": namespace, "score": 0.9, "metadata": {"text": f"text from {namespace}"}}]}
+
+    def make_index(name, **kwargs):
+        indexes.append(name)
+        return DummyIndex()
+
+    monkeypatch.setattr("services.pinecone_service.pinecone.Index", make_index)
+    monkeypatch.setattr("services.pinecone_service.get_text_embedding", lambda text: embedded.append(text) or [0.1, 0.2])
+
+    with RetrievalSession("query", paper_ids=["paperA", "paperB"]) as session:
+        background = session.search(section="Background", top_k=5)
+        methods = session.search(section="Methods", top_k=5)
+
+    # 多个 section 共用一次 embedding 和同一个 index
+    assert embedded == ["query"]
+    assert len(indexes) == 1
+    assert sorted(background) == ["text from systematic_review/paperA/Background", "text from systematic_review/paperB/Background"]
+    assert len(methods) == 2
+
+def test_retrieval_session_prefetches_all_sections(monkeypatch):
+    import threading
+    from services.pinecone_service import RetrievalSession
+    queried = []
+    release = threading.Event()
+
+    class SlowIndex:
+        def fetch(self, ids, namespace):
+            return {"vectors": {}}
+        def query(self, vector, top_k, namespace, include_metadata, include_values=False):
+            queried.append(namespace)
+            release.wait(5)
+            return {"matches": [{"id": namespace, "score": 0.5, "metadata": {"text": namespace}}]}
+
+    monkeypatch.setattr("services.pinecone_service.pinecone.Index", lambda name, **kwargs: SlowIndex())
+    monkeypatch.setattr("services.pinecone_service.get_text_embedding", lambda text: [0.1, 0.2])
+
+    with RetrievalSession("query", paper_ids=["paperA", "paperB"]) as session:
+        session.prefetch(["Background", "Methods"], top_k=5)
+        # 所有 (paper, section) 查询在生成第一个 section 之前就已发出
+        for _ in range(100):
+            if len(queried) == 4:
+                break
+            threading.Event().wait(0.01)
+        assert len(queried) == 4
+        release.set()
+
+        assert sorted(session.search(section="Methods", top_k=5)) == [
+            "systematic_review/paperA/Methods", "systematic_review/paperB/Methods"
+        ]
+        assert len(session.search(section="Background", top_k=5)) == 2
+    assert len(queried) == 4
+
+def test_index_handle_is_shared(monkeypatch):
+    from services.index_provider_service import get_index, reset_index_pool
+    created = []
+    monkeypatch.setattr("services.index_provider_service.pinecone.Index",
+                        lambda name, **kwargs: created.append(kwargs) or object())
+
+    assert get_index() is get_index()
+    assert len(created) == 1
+    assert created[0]["pool_threads"] >= 8
+
+    reset_index_pool()
+    get_index()
+    assert len(created) == 2
+
+def test_query_with_namespace_fuses_lexical_matches(monkeypatch):
+    from services.pinecone_service import query_with_namespace
+    from utils.lexical_index import index_documents
+    namespace = "systematic_review/paperA/Results"
+
+    class DummyIndex:
+        def fetch(self, ids, namespace):
+            return {"vectors": {}}
+        def query(self, vector, top_k, namespace, include_metadata, include_values=False):
+            return {"matches": [
+                {"id": "dense1", "score": 0.82, "metadata": {"text": "general outcomes"}},
+                {"id": "both", "score": 0.8, "metadata": {"text": "tocilizumab outcomes"}},
+            ]}
+
+    index_documents(namespace, [
+        ("both", "tocilizumab outcomes", {"text": "tocilizumab outcomes"}),
+        ("lexical1", "tocilizumab dosing", {"text": "tocilizumab dosing"}),
+    ] + [(f"other{i}", f"placebo arm {i}", {"text": f"placebo arm {i}"}) for i in range(6)])
+    monkeypatch.setattr("services.pinecone_service.pinecone.Index", lambda name, **kwargs: DummyIndex())
+
+    # 关键词命中的片段排在仅向量命中的片段之前
+    fused = query_with_namespace("paperA", "Results", [0.1, 0.2], top_k=3, query_text="tocilizumab")
+    assert [match["id"] for match in fused["matches"]] == ["both", "lexical1", "dense1"]
+    assert fused["matches"][1]["metadata"]["text"] == "tocilizumab dosing"
+
+    dense = query_with_namespace("paperA", "Results", [0.1, 0.2], top_k=2)
+    assert [match["id"] for match in dense["matches"]] == ["dense1", "both"]
+
+def test_retrieval_session_merges_papers_by_score(monkeypatch):
+    from services.pinecone_service import RetrievalSession
+    requested = []
+    scores = {"paperA": [0.9, 0.2, 0.1], "paperB": [0.8, 0.7, 0.6]}
+
+    class DummyIndex:
+        def fetch(self, ids, namespace):
+            return {"vectors": {}}
+        def query(self, vector, top_k, namespace, include_metadata, include_values=False):
+            paper_id = namespace.split("/")[1]
+            requested.append(top_k)
+            return {"matches": [
+                {"id": f"{paper_id}-{i}", "score": score, "metadata": {"text": f"{paper_id}-{i}"}}
+                for i, score in enumerate(scores[paper_id][:top_k])
+            ]}
+
+    monkeypatch.setattr("services.pinecone_service.pinecone.Index", lambda name, **kwargs: DummyIndex())
+    monkeypatch.setattr("services.pinecone_service.get_text_embedding", lambda text: [0.1, 0.2])
+
+    with RetrievalSession("query", paper_ids=["paperA", "paperB"]) as session:
+        matches = session.search_matches(section="Results", top_k=3, per_paper_limit=2)
+        texts = session.search(section="Results", top_k=4, per_paper_limit=3)
+
+    # 按分数全局排序，每篇论文最多贡献 per_paper_limit 个片段
+    assert [match["id"] for match in matches] == ["paperA-0", "paperB-0", "paperB-1"]
+    assert texts == ["paperA-0", "paperB-0", "paperB-1", "paperB-2"]
+    assert requested[:2] == [2, 2]
@@ -0,0 +1,103 @@
+import sys
+import os
+import json
+import pytest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import services.section_classifier_service as section_classifier_service
+from services.section_classifier_service import SECTIONS, classify_chunks, classify_chunks_locally, record_llm_labels, _load_cached_labels
+
+# 关键词 -> 维度，构造可控的向量
+KEYWORDS = {
+    "introduction": 0, "previous": 0, "aim": 0, "background": 0,
+    "methods": 1, "participants": 1, "collected": 1, "searched": 1, "design": 1,
+    "results": 2, "significantly": 2, "table": 2, "outcome": 2,
+    "discussion": 3, "suggest": 3, "consistent": 3, "findings": 3,
+    "conclusion": 4, "future": 4, "overall": 4, "recommendations": 4,
+}
+
+class DummyBert:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.calls += 1
+        vectors = np.zeros((len(texts), 6), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().replace(",", " ").replace(".", " ").replace(":", " ").split():
+                if word in KEYWORDS:
+                    vectors[row, KEYWORDS[word]] += 1.0
+            if not vectors[row].any():
+                # 没有关键词的文本落在独立的维度上
+                vectors[row, 5] = 1.0
+        return vectors
+
+@pytest.fixture
+def dummy_bert(tmp_path, monkeypatch):
+    bert = DummyBert()
+    monkeypatch.setattr("services.section_classifier_service.bert_model", bert)
+    monkeypatch.setattr("services.section_classifier_service.SECTION_LABEL_CACHE_PATH", str(tmp_path / "labels.jsonl"))
+    monkeypatch.setattr("services.section_classifier_service._centroids", None)
+    return bert
+
+def test_classify_chunks_locally_in_one_batch(dummy_bert):
+    chunks = [
+        "The participants were collected and searched.",
+        "The outcome was significantly higher, see table.",
+        "Overall, future recommendations follow.",
+    ]
+    sections, confidences, vectors = classify_chunks_locally(chunks)
+
+    assert sections == ["Methods", "Results", "Conclusion"]
+    assert all(confidence > 0.9 for confidence in confidences)
+    assert vectors.shape == (3, 6)
+    # 一次编码原型 + 一次编码全部 chunk
+    assert dummy_bert.calls == 2
+
+def test_low_confidence_chunks_go_to_llm(dummy_bert, monkeypatch):
+    llm_calls = []
+    def dummy_llm(chunks):
+        llm_calls.extend(chunks)
+        return ["Discussion"] * len(chunks)
+    monkeypatch.setattr("services.section_classifier_service.classify_chunks_with_llm", dummy_llm)
+
+    sections = classify_chunks(["The methods and design.", "Completely unrelated words here."])
+    assert sections == ["Methods", "Discussion"]
+    assert llm_calls == ["Completely unrelated words here."]
+
+    # LLM 的标签被缓存下来用于本地分类
+    with open(section_classifier_service.SECTION_LABEL_CACHE_PATH) as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry["section"] for entry in entries] == ["Discussion"]
+    assert len(entries[0]["vector"]) == 6
+
+def test_cached_llm_labels_move_centroids(dummy_bert, monkeypatch):
+    monkeypatch.setattr("services.section_classifier_service.classify_chunks_with_llm", lambda chunks: ["Results"] * len(chunks))
+    unknown = "Completely unrelated words here."
+
+    _, before, _ = classify_chunks_locally([unknown])
+    for _ in range(3):
+        classify_chunks([unknown] * 10)
+    sections, after, _ = classify_chunks_locally([unknown])
+
+    assert sections == ["Results"]
+    assert after[0] > before[0]
+
+def test_classify_chunks_empty(dummy_bert):
+    assert classify_chunks([]) == []
+    assert SECTIONS == ["Background", "Methods", "Results", "Discussion", "Conclusion"]
+
+def test_label_cache_is_compacted_past_its_size_limit(dummy_bert, monkeypatch, tmp_path):
+    monkeypatch.setattr("services.section_classifier_service.MAX_CACHED_LABELS", 3)
+    monkeypatch.setattr("services.section_classifier_service.SECTION_LABEL_CACHE_MAX_BYTES", 500)
+    vector = np.zeros(6, dtype=np.float32)
+
+    for _ in range(20):
+        record_llm_labels([("Results", vector)])
+
+    with open(tmp_path / "labels.jsonl", encoding="utf-8") as f:
+        lines = f.readlines()
+    assert 3 <= len(lines) < 20
+    assert len(_load_cached_labels()) == 3
@@ -5,6 +5,7 @@ import pytest
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
 from services.upsert_pinecone_service import upsert_all_chunks
+from utils.ingest_manifest import chunk_id, load_manifest
 
 def dummy_classify_chunk(chunk):
     # 固定返回 "Methods"
@@ -13,9 +14,14 @@ def dummy_classify_chunk(chunk):
 def dummy_get_text_embedding(text):
     return [0.1] * 1536
 
+@pytest.fixture(autouse=True)
+def manifest_dir(tmp_path, monkeypatch):
+    # 每个测试使用独立的 ingestion manifest 目录
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(tmp_path / "manifest"))
+
 def test_upsert_all_chunks(monkeypatch):
-    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunk_with_llm", lambda chunk: dummy_classify_chunk(chunk))
-    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embedding", lambda text: dummy_get_text_embedding(text))
+    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunks", lambda chunks: [dummy_classify_chunk(c) for c in chunks])
+    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embeddings", lambda texts: [dummy_get_text_embedding(t) for t in texts])
     
     # 定义 DummyIndex，必须实现 describe_index_stats 和 upsert 方法
     class DummyIndex:
@@ -24,8 +30,134 @@ def test_upsert_all_chunks(monkeypatch):
         def upsert(self, items, namespace):
             self.items = items
     dummy_index = DummyIndex()
-    monkeypatch.setattr("services.upsert_pinecone_service.pinecone.Index", lambda name: dummy_index)
+    monkeypatch.setattr("services.index_provider_service.pinecone.Index", lambda name, **kwargs: dummy_index)
     
-    upsert_all_chunks(["chunk1", "chunk2"], "paper1")
+    results = upsert_all_chunks(["chunk1", "chunk2"], "paper1")
     assert hasattr(dummy_index, "items")
     assert len(dummy_index.items) > 0
+    # 两个 chunk 同属一个 namespace，应合并为一次 upsert
+    assert len(results) == 1
+    assert results[0]["ok"]
+    assert results[0]["namespace"] == "systematic_review/paper1/Methods"
+    assert results[0]["ids"] == [chunk_id("paper1", "chunk1"), chunk_id("paper1", "chunk2")]
+
+def test_upsert_all_chunks_reports_failed_batches(monkeypatch):
+    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunks", lambda chunks: [dummy_classify_chunk(c) for c in chunks])
+    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embeddings", lambda texts: [dummy_get_text_embedding(t) for t in texts])
+    monkeypatch.setattr("services.vector_writer_service.sleep", lambda seconds: None)
+
+    class FailingIndex:
+        def describe_index_stats(self):
+            return {"namespaces": {}}
+        def upsert(self, items, namespace):
+            raise ConnectionError("pinecone unavailable")
+    monkeypatch.setattr("services.index_provider_service.pinecone.Index", lambda name, **kwargs: FailingIndex())
+
+    results = upsert_all_chunks(["chunk1"], "paper1")
+    assert len(results) == 1
+    assert not results[0]["ok"]
+    assert "pinecone unavailable" in results[0]["error"]
+
+
+class RecordingIndex:
+    def __init__(self):
+        self.upserted = []
+        self.deleted = []
+    def upsert(self, items, namespace):
+        self.upserted.extend(item[0] for item in items)
+    def delete(self, ids, namespace):
+        self.deleted.append((namespace, sorted(ids)))
+
+def test_upsert_all_chunks_skips_unchanged_chunks(monkeypatch):
+    classified = []
+    embedded = []
+
+    def classify(chunks):
+        classified.extend(chunks)
+        return ["Methods"] * len(chunks)
+
+    def embed(texts):
+        embedded.extend(texts)
+        return [dummy_get_text_embedding(t) for t in texts]
+
+    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunks", classify)
+    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embeddings", embed)
+    index = RecordingIndex()
+    monkeypatch.setattr("services.index_provider_service.pinecone.Index", lambda name, **kwargs: index)
+
+    upsert_all_chunks(["chunk1", "chunk2"], "paper1")
+    assert set(load_manifest("paper1")["chunks"]) == {chunk_id("paper1", "chunk1"), chunk_id("paper1", "chunk2")}
+
+    # 重复上传：不再分类或嵌入
+    classified.clear()
+    embedded.clear()
+    assert upsert_all_chunks(["chunk1", "chunk2"], "paper1") == []
+    assert classified == [] and embedded == []
+
+    # 修改一个 chunk：只处理新 chunk，并删除旧向量
+    upsert_all_chunks(["chunk1", "chunk2 edited"], "paper1")
+    assert classified == ["chunk2 edited"]
+    assert embedded == ["chunk2 edited"]
+    assert index.deleted == [("systematic_review/paper1/Methods", [chunk_id("paper1", "chunk2")])]
+    assert set(load_manifest("paper1")["chunks"]) == {chunk_id("paper1", "chunk1"), chunk_id("paper1", "chunk2 edited")}
+
+    # 关键词索引随向量一起更新
+    from utils.lexical_index import search_lexical
+    assert [match["id"] for match in search_lexical("systematic_review/paper1/Methods", "edited", top_k=5)] == [chunk_id("paper1", "chunk2 edited")]
+    assert [match["id"] for match in search_lexical("systematic_review/paper1/Methods", "chunk2", top_k=5)] == [chunk_id("paper1", "chunk2 edited")]
+
+def test_upsert_all_chunks_keeps_failed_chunks_out_of_manifest(monkeypatch):
+    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunks", lambda chunks: ["Methods"] * len(chunks))
+    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embeddings", lambda texts: [dummy_get_text_embedding(t) for t in texts])
+    monkeypatch.setattr("services.vector_writer_service.sleep", lambda seconds: None)
+
+    class FailingIndex:
+        def upsert(self, items, namespace):
+            raise ConnectionError("pinecone unavailable")
+    monkeypatch.setattr("services.index_provider_service.pinecone.Index", lambda name, **kwargs: FailingIndex())
+
+    upsert_all_chunks(["chunk1"], "paper1")
+    assert load_manifest("paper1")["chunks"] == {}
+    from utils.lexical_index import search_lexical
+    assert search_lexical("systematic_review/paper1/Methods", "chunk1", top_k=5) == []
+
+def test_tenant_layout_keeps_users_with_the_same_file_name_apart(monkeypatch):
+    from services.vector_store_service import LocalVectorStore
+    from utils.lexical_index import search_lexical
+
+    store = LocalVectorStore(dimension=2)
+    monkeypatch.setattr("utils.vector_layout.VECTOR_LAYOUT", "tenant")
+    monkeypatch.setattr("services.upsert_pinecone_service.get_index", lambda: store)
+    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunks", lambda chunks: ["Methods"] * len(chunks))
+    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embeddings", lambda texts: [[1.0, 0.0] for _ in texts])
+
+    upsert_all_chunks(["shared trial text"], "paper1", tenant_id="7")
+    # 另一个用户上传了同名文件：不能因为 manifest 相同而被跳过
+    assert upsert_all_chunks(["shared trial text"], "paper1", tenant_id="8") != []
+    upsert_all_chunks(["edited text"], "paper1", tenant_id="8")
+
+    # 用户 8 修改文件不会删除用户 7 的向量或关键词索引
+    assert set(load_manifest("paper1", tenant_id="7")["chunks"]) == {chunk_id("paper1", "shared trial text", tenant_id="7")}
+    assert set(load_manifest("paper1", tenant_id="8")["chunks"]) == {chunk_id("paper1", "edited text", tenant_id="8")}
+    assert store.describe_index_stats() == {"namespaces": {"tenant/7": {"vector_count": 1}, "tenant/8": {"vector_count": 1}}}
+    assert [m["id"] for m in search_lexical("tenant/7/paper1/Methods", "trial", top_k=5)] == [chunk_id("paper1", "shared trial text", tenant_id="7")]
+    assert search_lexical("tenant/8/paper1/Methods", "trial", top_k=5) == []
+
+def test_first_ingest_replaces_legacy_chunk_ids(monkeypatch):
+    from services.vector_store_service import LocalVectorStore
+    store = LocalVectorStore(dimension=2)
+    # 引入 manifest 之前存储的向量使用按位置编号的 ID
+    store.upsert([("paper1-chunk-0", [1, 0], {"text": "chunk1"}), ("paper1-chunk-1", [0, 1], {"text": "chunk2"})],
+                 namespace="systematic_review/paper1/Methods")
+    store.upsert([("paper1-chunk-2", [1, 1], {"text": "chunk3"})], namespace="systematic_review/paper1/Results")
+    store.upsert([("paper10-chunk-0", [1, 1], {"text": "other"})], namespace="systematic_review/paper10/Methods")
+    monkeypatch.setattr("services.upsert_pinecone_service.get_index", lambda: store)
+    monkeypatch.setattr("services.corpus_catalog_service.get_index", lambda: store)
+    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunks", lambda chunks: ["Methods"] * len(chunks))
+    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embeddings", lambda texts: [[1.0, 0.0] for _ in texts])
+
+    upsert_all_chunks(["chunk1", "chunk2"], "paper1")
+    assert sorted(store.list_ids("systematic_review/paper1/Methods")) == sorted([chunk_id("paper1", "chunk1"), chunk_id("paper1", "chunk2")])
+    assert store.list_ids("systematic_review/paper1/Results") == []
+    assert store.list_ids("systematic_review/paper10/Methods") == ["paper10-chunk-0"]
+    assert set(load_manifest("paper1")["chunks"]) == {chunk_id("paper1", "chunk1"), chunk_id("paper1", "chunk2")}
@@ -0,0 +1,78 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from services.vector_layout_service import migrate_to_tenant_layout
+from services.vector_store_service import LocalVectorStore
+from utils.ingest_manifest import save_manifest, load_manifest
+from utils.lexical_index import index_documents, search_lexical
+
+@pytest.fixture(autouse=True)
+def manifest_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(tmp_path / "manifest"))
+
+def _paper_layout_store():
+    store = LocalVectorStore(dimension=2)
+    store.upsert([("paper1-a", [1, 0], {"text": "A", "source": "paper1", "section": "Methods"})], namespace="systematic_review/paper1/Methods")
+    store.upsert([("paper1-b", [0, 1], {"text": "B", "source": "paper1", "section": "Results"})], namespace="systematic_review/paper1/Results")
+    store.upsert([("paper2-c", [1, 1], {"text": "C", "source": "paper2", "section": "Methods"})], namespace="systematic_review/paper2/Methods")
+    save_manifest("paper1", {"file_digest": "x", "chunks": {"paper1-a": "Methods", "paper1-b": "Results"}})
+    save_manifest("paper2", {"file_digest": "y", "chunks": {"paper2-c": "Methods"}})
+    return store
+
+def test_migrate_to_tenant_layout():
+    store = _paper_layout_store()
+
+    summary = migrate_to_tenant_layout("7", paper_ids=["paper1", "paper2"], index=store, batch_size=1)
+    assert summary == {"papers": 2, "moved": 3, "failed": 0}
+    # 旧的按论文划分的 namespace 被删除，所有向量都在租户 namespace 中
+    assert store.list_namespaces() == ["tenant/7"]
+    vectors = store.fetch(ids=["paper1-a", "paper1-b", "paper2-c"], namespace="tenant/7")["vectors"]
+    assert vectors["paper1-b"]["metadata"] == {"text": "B", "source": "paper1", "section": "Results"}
+
+    # 租户的 manifest 记录迁移过来的片段，之后的上传不会重复存储
+    assert load_manifest("paper1", tenant_id="7") == {"file_digest": "x", "chunks": {"paper1-a": "Methods", "paper1-b": "Results"}}
+
+    # 再次运行是安全的：源 namespace 已经没有要迁移的向量
+    assert migrate_to_tenant_layout("7", paper_ids=["paper1", "paper2"], index=store) == {"papers": 2, "moved": 0, "failed": 0}
+    assert store.list_namespaces() == ["tenant/7"]
+
+def test_migration_keeps_source_when_copy_fails(monkeypatch):
+    store = _paper_layout_store()
+    monkeypatch.setattr(
+        "services.vector_layout_service.upsert_vectors_in_batches",
+        lambda index, vectors_by_namespace: [{"namespace": ns, "ids": [v[0] for v in vectors], "ok": False, "attempts": 3, "error": "down"}
+                                             for ns, vectors in vectors_by_namespace.items()]
+    )
+    summary = migrate_to_tenant_layout("7", paper_ids=["paper1"], index=store)
+    assert summary == {"papers": 1, "moved": 0, "failed": 2}
+    assert "systematic_review/paper1/Methods" in store.list_namespaces()
+
+def test_migration_can_keep_source():
+    store = _paper_layout_store()
+    migrate_to_tenant_layout("7", paper_ids=["paper2"], index=store, delete_source=False)
+    assert sorted(store.list_namespaces()) == sorted([
+        "systematic_review/paper1/Methods", "systematic_review/paper1/Results",
+        "systematic_review/paper2/Methods", "tenant/7"
+    ])
+
+def test_migration_moves_lexical_index():
+    store = _paper_layout_store()
+    index_documents("systematic_review/paper1/Methods", [("paper1-a", "tocilizumab dosing", {"text": "tocilizumab dosing"})])
+
+    migrate_to_tenant_layout("7", paper_ids=["paper1"], index=store)
+    assert search_lexical("systematic_review/paper1/Methods", "tocilizumab", top_k=5) == []
+    assert [m["id"] for m in search_lexical("tenant/7/paper1/Methods", "tocilizumab", top_k=5)] == ["paper1-a"]
+
+def test_migration_moves_vectors_missing_from_manifests():
+    """Vectors no local manifest records (legacy IDs, other nodes) are moved as well."""
+    store = _paper_layout_store()
+    store.upsert([("paper1-chunk-0", [1, 0], {"text": "legacy"})], namespace="systematic_review/paper1/Methods")
+    store.upsert([("paper3-x", [1, 0], {"text": "X"})], namespace="systematic_review/paper3/Results")
+
+    summary = migrate_to_tenant_layout("7", paper_ids=["paper1", "paper3"], index=store)
+    assert summary == {"papers": 2, "moved": 4, "failed": 0}
+    assert sorted(store.list_ids("tenant/7")) == ["paper1-a", "paper1-b", "paper1-chunk-0", "paper3-x"]
+    assert load_manifest("paper3", tenant_id="7") == {"file_digest": None, "chunks": {"paper3-x": "Results"}}
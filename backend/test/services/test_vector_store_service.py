@@ -0,0 +1,220 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from services.vector_store_service import VectorStore, LocalVectorStore, PineconeVectorStore
+from services.index_provider_service import get_index
+
+def test_local_store_query_ranks_by_cosine():
+    store = LocalVectorStore(dimension=3)
+    store.upsert([("a", [1, 0, 0], {"text": "A"}), ("b", [0, 1, 0], {"text": "B"}), ("c", [1, 1, 0], {"text": "C"})], namespace="ns")
+
+    matches = store.query(vector=[1, 0.1, 0], top_k=2, namespace="ns")["matches"]
+    assert [m["id"] for m in matches] == ["a", "c"]
+    assert matches[0]["score"] == pytest.approx(0.995, abs=1e-3)
+    assert matches[0]["metadata"] == {"text": "A"}
+    assert store.query(vector=[1, 0, 0], top_k=2, namespace="other") == {"matches": []}
+
+def test_local_store_upsert_replaces_and_delete_removes():
+    store = LocalVectorStore(dimension=2)
+    store.upsert([("a", [1, 0], {"v": 1}), ("b", [0, 1], {"v": 2})], namespace="ns")
+    store.upsert([("a", [0, 1], {"v": 3})], namespace="ns")
+    assert store.fetch(ids=["a", "missing"], namespace="ns")["vectors"]["a"]["metadata"] == {"v": 3}
+    assert list(store.fetch(ids=["a", "missing"], namespace="ns")["vectors"]) == ["a"]
+
+    store.delete(ids=["b"], namespace="ns")
+    assert [m["id"] for m in store.query(vector=[0, 1], top_k=5, namespace="ns")["matches"]] == ["a"]
+    assert store.describe_index_stats() == {"namespaces": {"ns": {"vector_count": 1}}}
+
+    assert store.list_ids("ns", prefix="a") == ["a"]
+    store.delete(ids=["a"], namespace="ns")
+    assert store.list_namespaces() == []
+
+def test_vector_store_requires_every_operation():
+    class PartialStore(VectorStore):
+        def upsert(self, vectors, namespace):
+            return {}
+
+    with pytest.raises(TypeError):
+        PartialStore()
+
+def test_pinecone_store_normalises_responses():
+    class Match:
+        def __init__(self, id, score):
+            self.id, self.score, self.metadata = id, score, {"text": id}
+
+    class Response:
+        matches = [Match("a", 0.9)]
+
+    class DummyIndex:
+        def query(self, vector, top_k, namespace, include_metadata):
+            return Response()
+        def list(self, prefix, namespace):
+            # 新版客户端每页是 {"id"} 条目，旧版是字符串
+            return iter([[{"id": "a-1"}, {"id": "a-2"}], ["a-3"]])
+        def describe_index_stats(self):
+            class Summary:
+                vector_count = 3
+            return {"namespaces": {"ns": Summary()}}
+
+    store = PineconeVectorStore(DummyIndex())
+    assert store.query(vector=[1], top_k=1, namespace="ns") == {"matches": [{"id": "a", "score": 0.9, "metadata": {"text": "a"}}]}
+    assert list(store.list_ids("ns", prefix="a-")) == ["a-1", "a-2", "a-3"]
+    assert store.describe_index_stats() == {"namespaces": {"ns": {"vector_count": 3}}}
+
+def test_pinecone_store_fetches_in_batches():
+    class DummyIndex:
+        def __init__(self):
+            self.requests = []
+        def fetch(self, ids, namespace):
+            self.requests.append(len(ids))
+            return {"vectors": {vector_id: {"values": [1.0], "metadata": {}} for vector_id in ids}}
+
+    index = DummyIndex()
+    response = PineconeVectorStore(index).fetch([f"v{i}" for i in range(1001)], namespace="ns")
+    assert index.requests == [1000, 1]
+    assert len(response["vectors"]) == 1001
+
+def test_offline_ingest_and_retrieval(tmp_path, monkeypatch):
+    """Ingestion and retrieval run end to end against the local backend without Pinecone."""
+    from services.upsert_pinecone_service import upsert_all_chunks
+    from services.pinecone_service import RetrievalSession, initialise_pinecone
+    from services.write_overlay_service import clear_overlay
+
+    monkeypatch.setattr("services.index_provider_service.VECTOR_STORE_BACKEND", "local")
+    monkeypatch.setattr("services.pinecone_service.VECTOR_STORE_BACKEND", "local")
+    monkeypatch.setattr("services.index_provider_service.LocalVectorStore", lambda directory: LocalVectorStore(dimension=2, directory=directory))
+    monkeypatch.setattr("services.index_provider_service.LOCAL_VECTOR_STORE_DIR", str(tmp_path / "vectors"))
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(tmp_path / "manifest"))
+    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunks", lambda chunks: ["Methods"] * len(chunks))
+    fake_embedding = lambda text: [1.0, 0.0] if "trial" in text else [0.0, 1.0]
+    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embeddings", lambda texts: [fake_embedding(t) for t in texts])
+    monkeypatch.setattr("services.pinecone_service.get_text_embedding", fake_embedding)
+    clear_overlay()
+
+    initialise_pinecone()
+    upsert_all_chunks(["a randomised trial", "unrelated text"], "paper1")
+    clear_overlay()  # 只依赖本地 store 本身
+
+    with RetrievalSession("trial design", paper_ids=["paper1"]) as session:
+        assert session.search(section="Methods", top_k=1) == ["a randomised trial"]
+
+def test_local_store_persists_to_segments(tmp_path):
+    store = LocalVectorStore(dimension=2, directory=str(tmp_path))
+    store.upsert([("a", [1, 0], {"text": "A"})], namespace="systematic_review/paper1/Methods")
+
+    reopened = LocalVectorStore(dimension=2, directory=str(tmp_path))
+    assert reopened.describe_index_stats() == {"namespaces": {"systematic_review/paper1/Methods": {"vector_count": 1}}}
+    assert reopened.query(vector=[1, 0], top_k=1, namespace="systematic_review/paper1/Methods")["matches"][0]["id"] == "a"
+
+    reopened.delete(ids=["a"], namespace="systematic_review/paper1/Methods")
+    assert store.describe_index_stats() == {"namespaces": {}}
+
+def test_pinecone_store_mirror_serves_queries(tmp_path):
+    class RemoteIndex:
+        def __init__(self):
+            self.queries = 0
+        def upsert(self, vectors, namespace):
+            pass
+        def delete(self, ids, namespace):
+            pass
+        def query(self, vector, top_k, namespace, include_metadata):
+            self.queries += 1
+            return {"matches": []}
+
+    remote = RemoteIndex()
+    remote_counts = {"ns": 1, "partial": 2}
+    store = PineconeVectorStore(remote, mirror=LocalVectorStore(dimension=2, directory=str(tmp_path)),
+                                remote_count=lambda namespace: remote_counts.get(namespace, 0))
+    store.upsert([("a", [1, 0], {"text": "A"})], namespace="ns")
+
+    assert store.query(vector=[1, 0], top_k=1, namespace="ns")["matches"][0]["metadata"] == {"text": "A"}
+    assert remote.queries == 0
+    # 镜像中没有的 namespace 仍然查询远端
+    store.query(vector=[1, 0], top_k=1, namespace="other")
+    assert remote.queries == 1
+    # 镜像只收到部分写入（索引中有 2 个向量）时不能只返回子集
+    store.upsert([("b", [0, 1], {"text": "B"})], namespace="partial")
+    store.query(vector=[1, 0], top_k=1, namespace="partial")
+    assert remote.queries == 2
+    # 没有远端计数时镜像只接收写入
+    unchecked = PineconeVectorStore(remote, mirror=LocalVectorStore(dimension=2, directory=str(tmp_path)))
+    unchecked.query(vector=[1, 0], top_k=1, namespace="ns")
+    assert remote.queries == 3
+
+def test_local_store_filtered_query():
+    store = LocalVectorStore(dimension=2)
+    store.upsert([
+        ("a", [1, 0], {"source": "paper1", "section": "Methods"}),
+        ("b", [1, 0.2], {"source": "paper2", "section": "Methods"}),
+        ("c", [1, 0.1], {"source": "paper2", "section": "Results"}),
+    ], namespace="tenant/1")
+    matches = store.query(vector=[1, 0], top_k=5, namespace="tenant/1", filter={"section": {"$eq": "Methods"}})["matches"]
+    assert [m["id"] for m in matches] == ["a", "b"]
+
+def test_pinecone_store_passes_filter():
+    calls = []
+
+    class DummyIndex:
+        def query(self, vector, top_k, namespace, include_metadata, filter=None):
+            calls.append(filter)
+            return {"matches": []}
+
+    store = PineconeVectorStore(DummyIndex())
+    store.query(vector=[1], top_k=1, namespace="tenant/1", filter={"section": {"$eq": "Methods"}})
+    store.query(vector=[1], top_k=1, namespace="tenant/1")
+    assert calls == [{"section": {"$eq": "Methods"}}, None]
+
+def test_queries_return_values_on_request(tmp_path):
+    for store in (LocalVectorStore(dimension=2), LocalVectorStore(dimension=2, directory=str(tmp_path))):
+        store.upsert([("a", [3, 4], {"text": "A"})], namespace="ns")
+        assert "values" not in store.query(vector=[1, 0], top_k=1, namespace="ns")["matches"][0]
+        values = store.query(vector=[1, 0], top_k=1, namespace="ns", include_values=True)["matches"][0]["values"]
+        assert values == pytest.approx([0.6, 0.8], abs=1e-3)
+
+    class DummyIndex:
+        def query(self, vector, top_k, namespace, include_metadata, include_values=False):
+            match = {"id": "a", "score": 0.9, "metadata": {}}
+            return {"matches": [dict(match, values=[0.6, 0.8]) if include_values else match]}
+
+    store = PineconeVectorStore(DummyIndex())
+    assert store.query(vector=[1, 0], top_k=1, namespace="ns", include_values=True)["matches"][0]["values"] == [0.6, 0.8]
+    assert "values" not in store.query(vector=[1, 0], top_k=1, namespace="ns")["matches"][0]
+
+def test_tenant_layout_ingest_and_retrieval(tmp_path, monkeypatch):
+    """In the tenant layout all papers share one namespace and each section is a single filtered query."""
+    from services.upsert_pinecone_service import upsert_all_chunks
+    from services.pinecone_service import RetrievalSession
+    from services.write_overlay_service import clear_overlay
+
+    store = LocalVectorStore(dimension=2)
+    queries = []
+    original_query = store.query
+    store.query = lambda **kwargs: queries.append(kwargs) or original_query(**kwargs)
+
+    monkeypatch.setattr("utils.vector_layout.VECTOR_LAYOUT", "tenant")
+    monkeypatch.setattr("services.upsert_pinecone_service.get_index", lambda: store)
+    monkeypatch.setattr("services.pinecone_service.get_index", lambda: store)
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(tmp_path / "manifest"))
+    monkeypatch.setattr("services.upsert_pinecone_service.classify_chunks", lambda chunks: ["Methods"] * len(chunks))
+    fake_embedding = lambda text: [1.0, 0.0] if "trial" in text else [0.0, 1.0]
+    monkeypatch.setattr("services.upsert_pinecone_service.get_text_embeddings", lambda texts: [fake_embedding(t) for t in texts])
+    monkeypatch.setattr("services.pinecone_service.get_text_embedding", fake_embedding)
+    clear_overlay()
+
+    upsert_all_chunks(["a randomised trial", "unrelated text"], "paper1", tenant_id="7")
+    upsert_all_chunks(["another trial"], "paper2", tenant_id="7")
+    upsert_all_chunks(["trial of a third paper"], "paper3", tenant_id="7")
+    clear_overlay()
+    assert store.list_namespaces() == ["tenant/7"]
+
+    with RetrievalSession("trial design", paper_ids=["paper1", "paper2"], tenant_id="7") as session:
+        results = session.search(section="Methods", top_k=2)
+
+    # 一个 section 只发一次带过滤条件的查询，且不会返回其他论文的片段
+    assert sorted(results) == ["a randomised trial", "another trial"]
+    assert len(queries) == 1
+    assert queries[0]["filter"] == {"source": {"$in": ["paper1", "paper2"]}, "section": {"$eq": "Methods"}}
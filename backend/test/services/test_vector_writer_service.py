@@ -0,0 +1,62 @@
+import sys
+import os
+import threading
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from services.vector_writer_service import make_upsert_batches, upsert_vectors_in_batches
+
+def make_vectors(prefix, count, dim=4, text="chunk"):
+    return [(f"{prefix}-{i}", [0.1] * dim, {"text": text}) for i in range(count)]
+
+class RecordingIndex:
+    def __init__(self, fail_times=0):
+        self.calls = []
+        self.fail_times = fail_times
+        self.lock = threading.Lock()
+
+    def upsert(self, items, namespace):
+        with self.lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ConnectionError("temporary failure")
+            self.calls.append((namespace, [item[0] for item in items]))
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr("services.vector_writer_service.sleep", lambda seconds: None)
+
+def test_make_upsert_batches_groups_by_namespace_and_size():
+    batches = make_upsert_batches({"ns1": make_vectors("a", 5), "ns2": make_vectors("b", 2)}, batch_size=2)
+    assert [(ns, len(batch)) for ns, batch in batches] == [("ns1", 2), ("ns1", 2), ("ns1", 1), ("ns2", 2)]
+
+def test_make_upsert_batches_respects_request_bytes():
+    # 每个向量约 1000+ 字节，限制 2500 字节时每批最多 2 个
+    vectors = make_vectors("a", 3, dim=4, text="x" * 1000)
+    batches = make_upsert_batches({"ns": vectors}, batch_size=100, max_bytes=2500)
+    assert [len(batch) for _, batch in batches] == [2, 1]
+
+def test_upsert_vectors_in_batches_sends_every_vector():
+    index = RecordingIndex()
+    results = upsert_vectors_in_batches(index, {"ns1": make_vectors("a", 250), "ns2": make_vectors("b", 3)}, max_in_flight=2)
+
+    assert all(result["ok"] for result in results)
+    sent = sorted(vector_id for _, ids in index.calls for vector_id in ids)
+    assert len(sent) == 253
+    assert all(len(ids) <= 100 for _, ids in index.calls)
+
+def test_upsert_vectors_in_batches_retries_failed_batches():
+    index = RecordingIndex(fail_times=2)
+    results = upsert_vectors_in_batches(index, {"ns": make_vectors("a", 3)}, retries=3)
+
+    assert results[0]["ok"]
+    assert results[0]["attempts"] == 3
+    assert index.calls == [("ns", ["a-0", "a-1", "a-2"])]
+
+def test_upsert_vectors_in_batches_reports_exhausted_retries():
+    index = RecordingIndex(fail_times=5)
+    results = upsert_vectors_in_batches(index, {"ns": make_vectors("a", 3)}, retries=2)
+
+    assert results == [{"namespace": "ns", "ids": ["a-0", "a-1", "a-2"], "ok": False,
+                        "attempts": 2, "error": "temporary failure"}]
@@ -0,0 +1,110 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from services import write_overlay_service
+from services.write_overlay_service import (
+    record_writes, forget_writes, pending_ids, confirm_writes, query_overlay, merge_matches, clear_overlay,
+    wait_for_writes
+)
+from services.pinecone_service import query_with_namespace, get_all_paper_ids
+
+@pytest.fixture(autouse=True)
+def empty_overlay():
+    clear_overlay()
+    yield
+    clear_overlay()
+
+def test_query_overlay_ranks_pending_vectors():
+    record_writes("ns", [("a", [1, 0], {"text": "A"}), ("b", [0, 1], {"text": "B"})])
+    matches = query_overlay("ns", [0.9, 0.1], top_k=1)
+    assert [m["id"] for m in matches] == ["a"]
+    assert matches[0]["metadata"] == {"text": "A"}
+    assert query_overlay("other", [1, 0], top_k=5) == []
+
+def test_merge_matches_deduplicates_by_id():
+    remote = [{"id": "a", "score": 0.5, "metadata": {}}, {"id": "c", "score": 0.2, "metadata": {}}]
+    overlay = [{"id": "a", "score": 0.6, "metadata": {}}, {"id": "b", "score": 0.4, "metadata": {}}]
+    assert [m["id"] for m in merge_matches(remote, overlay, top_k=2)] == ["a", "b"]
+
+def test_confirm_writes_drops_fetched_ids():
+    record_writes("ns", [("a", [1, 0], {}), ("b", [0, 1], {})])
+
+    class DummyIndex:
+        def fetch(self, ids, namespace):
+            # 只有 a 已经在远端可见
+            return {"vectors": {"a": {}}}
+
+    confirm_writes(DummyIndex(), "ns")
+    assert pending_ids("ns") == ["b"]
+
+def test_confirm_writes_fetches_in_batches():
+    record_writes("ns", [(f"v{i}", [1, 0], {}) for i in range(2500)])
+
+    class DummyIndex:
+        def __init__(self):
+            self.requests = []
+        def fetch(self, ids, namespace):
+            self.requests.append(len(ids))
+            return {"vectors": {vector_id: {} for vector_id in ids}}
+
+    index = DummyIndex()
+    confirm_writes(index, "ns")
+    assert index.requests == [1000, 1000, 500]
+    assert pending_ids("ns") == []
+
+def test_overlay_evicts_oldest_namespace(monkeypatch):
+    monkeypatch.setattr(write_overlay_service, "WRITE_OVERLAY_MAX_VECTORS", 2)
+    record_writes("old", [("a", [1, 0], {}), ("b", [0, 1], {})])
+    record_writes("new", [("c", [1, 0], {})])
+    assert pending_ids("old") == []
+    assert pending_ids("new") == ["c"]
+
+def test_query_with_namespace_serves_unconfirmed_writes(monkeypatch):
+    record_writes("systematic_review/paper1/Methods", [("paper1-x", [1, 0], {"text": "fresh chunk"})])
+
+    class LaggingIndex:
+        def fetch(self, ids, namespace):
+            return {"vectors": {}}
+        def query(self, vector, top_k, namespace, include_metadata, include_values=False):
+            return {"matches": []}
+        def describe_index_stats(self):
+            return {"namespaces": {}}
+    monkeypatch.setattr("services.pinecone_service.pinecone.Index", lambda name, **kwargs: LaggingIndex())
+
+    response = query_with_namespace("paper1", "Methods", [1, 0], 5, None)
+    assert [m["metadata"]["text"] for m in response["matches"]] == ["fresh chunk"]
+    assert get_all_paper_ids() == ["paper1"]
+
+def test_forget_writes():
+    record_writes("ns", [("a", [1, 0], {})])
+    forget_writes("ns", ["a"])
+    assert pending_ids("ns") == []
+
+def test_wait_for_writes_until_index_serves_them():
+    record_writes("ns1", [("a", [1, 0], {})])
+    record_writes("ns2", [("b", [0, 1], {})])
+
+    class EventuallyConsistentIndex:
+        def __init__(self):
+            self.fetches = 0
+        def fetch(self, ids, namespace):
+            # 第三次请求起所有写入都可见
+            self.fetches += 1
+            return {"vectors": {vector_id: {} for vector_id in ids} if self.fetches > 2 else {}}
+
+    index = EventuallyConsistentIndex()
+    assert wait_for_writes(index, timeout=5, poll_interval=0) == 0
+    assert pending_ids("ns1") == [] and pending_ids("ns2") == []
+
+def test_wait_for_writes_gives_up_after_timeout():
+    record_writes("ns", [("a", [1, 0], {})])
+
+    class LaggingIndex:
+        def fetch(self, ids, namespace):
+            return {"vectors": {}}
+
+    assert wait_for_writes(LaggingIndex(), timeout=0, poll_interval=0) == 1
+    assert pending_ids("ns") == ["a"]
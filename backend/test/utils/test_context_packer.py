@@ -0,0 +1,52 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.context_packer import max_output_tokens, context_token_budget, pack_context
+
+@pytest.fixture(autouse=True)
+def word_tokenizer(monkeypatch):
+    """Count one token per word so budgets are easy to reason about."""
+    class DummyEncoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split() or ([text] if text else [])
+        def decode(self, tokens):
+            return " ".join(tokens)
+    monkeypatch.setattr("utils.token_util._get_encoding", lambda model_name: DummyEncoding())
+
+def test_max_output_tokens_follows_word_limit(monkeypatch):
+    monkeypatch.setattr("utils.context_packer.TOKENS_PER_WORD", 1.5)
+    monkeypatch.setattr("utils.context_packer.LLM_MAX_OUTPUT_TOKENS", 4096)
+    monkeypatch.setattr("utils.context_packer.OUTPUT_TOKEN_HEADROOM", 0.2)
+    # 600 words * 1.5 tokens, plus 20% headroom
+    assert max_output_tokens(600) == 1080
+    assert max_output_tokens(3000) == 4096
+
+def test_context_token_budget(monkeypatch):
+    monkeypatch.setattr("utils.context_packer.LLM_CONTEXT_WINDOW", 1000)
+    monkeypatch.setattr("utils.context_packer.SECTION_CONTEXT_TOKEN_BUDGET", 500)
+    assert context_token_budget(fixed_prompt_tokens=100, output_tokens=200) == 500
+    assert context_token_budget(fixed_prompt_tokens=100, output_tokens=600) == 300
+    assert context_token_budget(fixed_prompt_tokens=900, output_tokens=600) == 0
+
+def test_pack_context_fills_budget_in_ranked_order():
+    chunks = ["one two three", "a b c d e f g h i j", "four five"]
+    previous, research, used = pack_context(10, [], chunks)
+    # The long second chunk does not fit, the shorter third one still does
+    assert previous == ""
+    assert research == "one two three\n\nfour five"
+    assert used <= 10
+
+def test_pack_context_gives_earlier_sections_their_share_first():
+    sections = ["background " * 50, "methods " * 50]
+    previous, research, used = pack_context(40, sections, ["chunk " * 5] * 10, previous_share=0.5)
+    summaries = previous.split("\n\n")
+    assert len(summaries) == 2
+    assert all(len(summary.split()) <= 10 for summary in summaries)
+    assert summaries[0].startswith("background")
+    assert research.count("chunk") >= 5
+    assert used <= 40
+
+def test_pack_context_with_no_budget():
+    assert pack_context(0, ["earlier"], ["chunk"]) == ("", "", 0)
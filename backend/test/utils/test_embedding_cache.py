@@ -0,0 +1,76 @@
+import os
+import sys
+import itertools
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.embedding_cache import (
+    embedding_cache_key, get_cached_embeddings, store_embeddings, evict_embedding_cache, clear_memory_cache
+)
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    """Point the embedding cache at a temporary database."""
+    monkeypatch.setattr("utils.embedding_cache.EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite3"))
+    clear_memory_cache()
+    yield
+    clear_memory_cache()
+
+def test_cache_key_depends_on_model_dimension_and_text():
+    key = embedding_cache_key("model-a", 1536, "text")
+    assert key != embedding_cache_key("model-b", 1536, "text")
+    assert key != embedding_cache_key("model-a", 512, "text")
+    assert key != embedding_cache_key("model-a", 1536, "other")
+
+def test_store_and_load_from_disk():
+    store_embeddings("model-a", None, ["hello", "world"], [[0.25, 0.5], [1.0, -1.0]])
+    # ✅ Cleared memory forces a read from the SQLite file
+    clear_memory_cache()
+
+    assert get_cached_embeddings("model-a", None, ["world", "missing", "hello"]) == [[1.0, -1.0], None, [0.25, 0.5]]
+    assert get_cached_embeddings("model-b", None, ["hello"]) == [None]
+
+def test_vectors_are_stored_compactly(monkeypatch):
+    monkeypatch.setattr("utils.embedding_cache.EMBEDDING_CACHE_DTYPE", "float16")
+    store_embeddings("model-a", None, ["text"], [[0.1234567, 0.5]])
+    clear_memory_cache()
+
+    vector = get_cached_embeddings("model-a", None, ["text"])[0]
+    assert vector[0] == pytest.approx(0.1234567, abs=1e-3)
+    assert vector[1] == 0.5
+
+def test_evict_removes_least_recently_used(monkeypatch):
+    monkeypatch.setattr("utils.embedding_cache.EMBEDDING_CACHE_DTYPE", "float32")
+    clock = itertools.count(1)
+    monkeypatch.setattr("utils.embedding_cache.time.time", lambda: float(next(clock)))
+    for text in ["old", "middle", "new"]:
+        store_embeddings("model-a", None, [text], [[1.0, 2.0]])
+    # "old" was read most recently, so it survives eviction
+    clear_memory_cache()
+    get_cached_embeddings("model-a", None, ["old"])
+
+    evict_embedding_cache(max_bytes=16)  # room for two 8-byte vectors
+    clear_memory_cache()
+    assert get_cached_embeddings("model-a", None, ["old", "middle", "new"]) == [[1.0, 2.0], None, [1.0, 2.0]]
+
+def test_stored_size_is_tracked_across_replace_and_evict(monkeypatch, tmp_path):
+    import sqlite3
+    monkeypatch.setattr("utils.embedding_cache.EMBEDDING_CACHE_DTYPE", "float32")
+    store_embeddings("model-a", None, ["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+    # Re-storing a text replaces its vector instead of counting it twice
+    store_embeddings("model-a", None, ["a"], [[1.0, 2.0, 3.0]])
+    evict_embedding_cache(max_bytes=12)
+
+    conn = sqlite3.connect(str(tmp_path / "embeddings.sqlite3"))
+    tracked = conn.execute("SELECT total_bytes FROM embeddings_size").fetchone()[0]
+    actual = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+    conn.close()
+    assert tracked == actual == 12
+
+def test_store_returns_vectors_as_cached(monkeypatch):
+    monkeypatch.setattr("utils.embedding_cache.EMBEDDING_CACHE_DTYPE", "float16")
+    stored = store_embeddings("model-a", None, ["text"], [[0.1234567, 0.5]])
+    clear_memory_cache()
+
+    # A miss returns exactly what a later hit returns
+    assert stored == get_cached_embeddings("model-a", None, ["text"])
@@ -4,7 +4,7 @@ import re
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 from unittest.mock import MagicMock
-from utils.embedding_util import get_text_embedding
+from utils.embedding_util import get_text_embedding, get_text_embeddings, make_embedding_batches
 
 @pytest.fixture
 def mock_embeddings():
@@ -34,3 +34,72 @@ def test_get_text_embedding_invalid_input():
 
     with pytest.raises(TypeError):
         get_text_embedding(["text in a list"])
+
+def test_make_embedding_batches_respects_limits(monkeypatch):
+    """Batches should stay within both the token and the input-count limits."""
+    monkeypatch.setattr("utils.token_util.count_tokens", lambda text, model_name: len(text))
+    texts = ["a" * 50, "b" * 50, "c" * 50, "d" * 200, "e" * 10, "f" * 10, "g" * 10]
+
+    assert make_embedding_batches(texts, token_limit=120, max_inputs=2) == [[0, 1], [2], [3], [4, 5], [6]]
+
+def test_get_text_embeddings_batches_in_order(monkeypatch):
+    """Vectors should come back in input order with one request per batch."""
+    mock = MagicMock()
+    mock.embed_documents.side_effect = lambda texts: [[float(len(text))] for text in texts]
+    monkeypatch.setattr("utils.embedding_util.embeddings", mock)
+    monkeypatch.setattr("utils.embedding_util.make_embedding_batches", lambda texts: [[0, 2], [1], [3]])
+
+    result = get_text_embeddings(["a", "bb", "ccc", "dddd"])
+
+    assert result == [[1.0], [2.0], [3.0], [4.0]]
+    assert mock.embed_documents.call_count == 3
+    mock.embed_query.assert_not_called()
+
+def test_get_text_embeddings_invalid_input():
+    """Non-string inputs are rejected before any request is made."""
+    with pytest.raises(TypeError):
+        get_text_embeddings(["text", 123])
+
+@pytest.fixture
+def embedding_cache(tmp_path, monkeypatch):
+    """Point the embedding cache at a temporary database with an empty memory cache."""
+    from utils.embedding_cache import clear_memory_cache
+    monkeypatch.setattr("utils.embedding_cache.EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.sqlite3"))
+    clear_memory_cache()
+    yield
+    clear_memory_cache()
+
+class CountingEmbeddings:
+    """Embeddings client with a model name, so results are cached."""
+    model = "text-embedding-ada-002"
+
+    def __init__(self):
+        self.requested = []
+
+    def embed_query(self, text):
+        self.requested.append(text)
+        return [float(len(text)), 0.5]
+
+    def embed_documents(self, texts):
+        self.requested.extend(texts)
+        return [[float(len(text)), 0.5] for text in texts]
+
+def test_get_text_embedding_uses_cache(embedding_cache, monkeypatch):
+    """A repeated text should not be sent to the API again."""
+    client = CountingEmbeddings()
+    monkeypatch.setattr("utils.embedding_util.embeddings", client)
+
+    assert get_text_embedding("repeat me") == [9.0, 0.5]
+    assert get_text_embedding("repeat me") == [9.0, 0.5]
+    assert client.requested == ["repeat me"]
+
+def test_get_text_embeddings_only_embeds_misses(embedding_cache, monkeypatch):
+    """Cached and duplicate texts are skipped; results stay in input order."""
+    client = CountingEmbeddings()
+    monkeypatch.setattr("utils.embedding_util.embeddings", client)
+
+    get_text_embedding("cached")
+    result = get_text_embeddings(["new", "cached", "new", "other text"])
+
+    assert result == [[3.0, 0.5], [6.0, 0.5], [3.0, 0.5], [10.0, 0.5]]
+    assert client.requested == ["cached", "new", "other text"]
@@ -0,0 +1,67 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.ingest_manifest import chunk_id, load_manifest, save_manifest, is_file_ingested, mark_file_ingested, clear_manifests
+
+@pytest.fixture(autouse=True)
+def manifest_dir(tmp_path, monkeypatch):
+    """Point the ingestion manifest at a temporary directory."""
+    directory = tmp_path / "manifest"
+    monkeypatch.setattr("utils.ingest_manifest.INGEST_MANIFEST_DIR", str(directory))
+    return directory
+
+def test_chunk_id_is_content_addressed():
+    assert chunk_id("paper1", "some text") == chunk_id("paper1", "some text")
+    assert chunk_id("paper1", "some text") != chunk_id("paper1", "other text")
+    assert chunk_id("paper1", "some text") != chunk_id("paper2", "some text")
+    assert chunk_id("paper1", "some text").startswith("paper1-")
+
+def test_load_manifest_missing_paper():
+    assert load_manifest("unknown") == {"file_digest": None, "chunks": {}}
+
+def test_save_and_load_manifest(manifest_dir):
+    save_manifest("paper/1", {"file_digest": "abc", "chunks": {"paper/1-x": "Methods"}})
+    assert load_manifest("paper/1") == {"file_digest": "abc", "chunks": {"paper/1-x": "Methods"}}
+    # ✅ Paper IDs are sanitised into a single file name
+    assert os.listdir(manifest_dir) == ["paper_1.json"]
+
+def test_mark_file_ingested_keeps_chunks():
+    save_manifest("paper1", {"file_digest": None, "chunks": {"paper1-x": "Results"}})
+    assert not is_file_ingested("paper1", "digest")
+
+    mark_file_ingested("paper1", "digest")
+    assert is_file_ingested("paper1", "digest")
+    assert not is_file_ingested("paper1", "other")
+    assert not is_file_ingested("paper1", None)
+    assert load_manifest("paper1")["chunks"] == {"paper1-x": "Results"}
+
+def test_load_manifest_ignores_corrupt_file(manifest_dir):
+    manifest_dir.mkdir()
+    (manifest_dir / "paper1.json").write_text("{not json")
+    assert load_manifest("paper1") == {"file_digest": None, "chunks": {}}
+
+def test_clear_manifests():
+    save_manifest("paper1", {"file_digest": "a", "chunks": {"paper1-x": "Results"}})
+    save_manifest("paper2", {"file_digest": "b", "chunks": {"paper2-x": "Results"}})
+
+    clear_manifests(["paper1", "missing"])
+    assert load_manifest("paper1") == {"file_digest": None, "chunks": {}}
+    assert is_file_ingested("paper2", "b")
+
+    clear_manifests()
+    assert not is_file_ingested("paper2", "b")
+
+def test_tenant_manifests_are_kept_apart(manifest_dir):
+    save_manifest("paper1", {"file_digest": "a", "chunks": {}}, tenant_id="7")
+    assert not is_file_ingested("paper1", "a")
+    assert not is_file_ingested("paper1", "a", tenant_id="8")
+    assert is_file_ingested("paper1", "a", tenant_id="7")
+    assert chunk_id("paper1", "text", tenant_id="7").startswith("7/paper1-")
+    assert chunk_id("paper1", "text", tenant_id="7") != chunk_id("paper1", "text", tenant_id="8")
+
+    clear_manifests(["paper1"], tenant_id="8")
+    assert is_file_ingested("paper1", "a", tenant_id="7")
+    clear_manifests(["paper1"], tenant_id="7")
+    assert not is_file_ingested("paper1", "a", tenant_id="7")
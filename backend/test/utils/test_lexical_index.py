@@ -0,0 +1,79 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.lexical_index import tokenize, index_documents, delete_documents, search_lexical, fuse_rankings, move_documents
+
+NAMESPACE = "systematic_review/paper1/Results"
+
+def _doc(vector_id, text):
+    return (vector_id, text, {"text": text, "source": "paper1", "section": "Results"})
+
+def test_tokenize_keeps_compound_terms():
+    terms = tokenize("The IL-6 levels of COVID-19 patients were measured.")
+    assert "il-6" in terms and "il" in terms and "6" in terms
+    assert "covid-19" in terms
+    assert "the" not in terms and "were" not in terms
+    assert "measured" in terms
+
+def test_search_ranks_documents_by_bm25():
+    index_documents(NAMESPACE, [
+        _doc("a", "Tocilizumab reduced IL-6 levels in severe patients."),
+        _doc("b", "Patients received standard care and were followed for 28 days."),
+        _doc("c", "Tocilizumab tocilizumab was well tolerated."),
+    ])
+    matches = search_lexical(NAMESPACE, "tocilizumab IL-6", top_k=5)
+    assert [match["id"] for match in matches] == ["a", "c"]
+    assert matches[0]["metadata"]["text"].startswith("Tocilizumab reduced")
+    assert matches[0]["score"] > matches[1]["score"] > 0
+
+def test_search_is_per_namespace():
+    index_documents(NAMESPACE, [_doc("a", "aspirin dose")])
+    assert search_lexical("systematic_review/paper2/Results", "aspirin", top_k=5) == []
+    assert search_lexical(NAMESPACE, "the of", top_k=5) == []
+
+def test_reindex_and_delete_documents():
+    index_documents(NAMESPACE, [_doc("a", "aspirin dose"), _doc("b", "placebo arm")])
+    index_documents(NAMESPACE, [_doc("a", "metformin dose")])
+    assert search_lexical(NAMESPACE, "aspirin", top_k=5) == []
+    assert [match["id"] for match in search_lexical(NAMESPACE, "metformin", top_k=5)] == ["a"]
+
+    delete_documents(NAMESPACE, ["a"])
+    assert search_lexical(NAMESPACE, "metformin dose", top_k=5) == []
+    assert [match["id"] for match in search_lexical(NAMESPACE, "placebo", top_k=5)] == ["b"]
+
+def test_fuse_rankings_blends_scores():
+    dense = [{"id": "x", "score": 0.9, "metadata": {}}, {"id": "y", "score": 0.8, "metadata": {}}]
+    lexical = [{"id": "y", "score": 15.0, "metadata": {}}, {"id": "z", "score": 5.0, "metadata": {}}]
+    fused = fuse_rankings(dense, lexical, top_k=3, weight=0.3)
+    # Keyword hits outrank the top dense-only match; keyword-only hits get the lowest dense score
+    assert [match["id"] for match in fused] == ["y", "z", "x"]
+    assert fused[0]["score"] == pytest.approx(0.7 * 0.8 + 0.3 * 0.75)
+    assert fused[1]["score"] == pytest.approx(0.7 * 0.8 + 0.3 * 0.5)
+    assert fused[2]["score"] == pytest.approx(0.7 * 0.9)
+
+def test_fuse_rankings_without_lexical_hits_keeps_dense_order():
+    dense = [{"id": "x", "score": 0.9, "metadata": {}}, {"id": "y", "score": 0.8, "metadata": {}}]
+    assert [match["id"] for match in fuse_rankings(dense, [], top_k=2)] == ["x", "y"]
+
+def test_removing_documents_uses_the_id_index():
+    from utils.lexical_index import _connect
+    conn = _connect()
+    try:
+        plan = conn.execute("EXPLAIN QUERY PLAN DELETE FROM postings WHERE namespace = ? AND id = ?", ("ns", "a")).fetchall()
+    finally:
+        conn.close()
+    assert any("postings_by_id" in row[-1] for row in plan)
+
+def test_move_documents():
+    index_documents(NAMESPACE, [_doc("a", "Tocilizumab reduced IL-6 levels."), _doc("b", "Standard care.")])
+    move_documents(NAMESPACE, "tenant/7/paper1/Results", ["a"], keep_source=True)
+    assert [match["id"] for match in search_lexical("tenant/7/paper1/Results", "tocilizumab", top_k=5)] == ["a"]
+    assert [match["id"] for match in search_lexical(NAMESPACE, "tocilizumab", top_k=5)] == ["a"]
+
+    move_documents(NAMESPACE, "tenant/7/paper1/Results", ["a", "b"])
+    # Moving again once the source is gone keeps what the destination holds
+    move_documents(NAMESPACE, "tenant/7/paper1/Results", ["a", "b"])
+    assert search_lexical(NAMESPACE, "tocilizumab care", top_k=5) == []
+    assert sorted(match["id"] for match in search_lexical("tenant/7/paper1/Results", "tocilizumab care", top_k=5)) == ["a", "b"]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.parsed_document import ParsedDocument
+
+def make_document():
+    return ParsedDocument(
+        path="/files/42/paper1.pdf",
+        pages=["Title\n  Authors  \n\n1\n", "Received: 2020\nBody text\n", "Last page"],
+        first_page_blocks=["Title", "Authors"],
+        metadata={"title": "Title"}
+    )
+
+def test_text_matches_pdf_to_text_format():
+    """Whole-document text should drop blank lines and strip whitespace."""
+    assert make_document().text == "Title\nAuthors\n1\nReceived: 2020\nBody text\nLast page"
+
+def test_first_pages_text():
+    """Only the requested number of pages should be returned."""
+    text = make_document().first_pages_text(max_pages=1)
+    assert text == "Title\n  Authors  \n\n1\n\n"
+    assert "Body text" not in text
+
+def test_thematic_text_drops_page_numbers_and_footers():
+    """Page numbers and "Received:" lines are removed for thematic analysis."""
+    text = make_document().thematic_text()
+    assert "Received:" not in text
+    assert "\n1\n" not in text
+    assert "Body text" in text
+
+def test_round_trip_through_dict():
+    """Documents restored from the cache keep their content and take the new path."""
+    document = make_document()
+    restored = ParsedDocument.from_dict("/files/7/copy.pdf", document.to_dict())
+
+    assert restored.name == "copy"
+    assert restored.pages == document.pages
+    assert restored.first_page_blocks == document.first_page_blocks
+    assert restored.metadata == document.metadata
+    assert ParsedDocument.from_dict("empty.pdf", {}).pages == []
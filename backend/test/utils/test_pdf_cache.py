@@ -0,0 +1,79 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils import pdf_cache
+from utils.pdf_cache import cached_extraction, evict_cache, file_digest
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Point the extraction cache at a temporary directory."""
+    directory = tmp_path / "cache"
+    monkeypatch.setattr("utils.pdf_cache.PDF_CACHE_DIR", str(directory))
+    return directory
+
+def write_file(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+def test_cached_extraction_skips_parsing_for_unchanged_file(tmp_path, cache_dir):
+    """A second extraction of the same content should be served from disk."""
+    pdf_path = write_file(tmp_path / "paper.pdf", b"%PDF-1.4 content")
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        return "Extracted text"
+
+    assert cached_extraction(pdf_path, "test-v1", extract) == "Extracted text"
+    assert cached_extraction(pdf_path, "test-v1", extract) == "Extracted text"
+    assert len(calls) == 1
+
+    # ✅ A different extractor version must not reuse the entry
+    cached_extraction(pdf_path, "test-v2", extract)
+    assert len(calls) == 2
+
+def test_cached_extraction_keys_on_content(tmp_path, cache_dir):
+    """Renamed copies share an entry, edited files do not."""
+    first = write_file(tmp_path / "a.pdf", b"same bytes")
+    renamed = write_file(tmp_path / "b.pdf", b"same bytes")
+    extract = lambda path: f"text of {os.path.basename(path)}"
+
+    assert cached_extraction(first, "test-v1", extract) == "text of a.pdf"
+    assert cached_extraction(renamed, "test-v1", extract) == "text of a.pdf"
+
+    write_file(tmp_path / "a.pdf", b"edited bytes")
+    assert cached_extraction(first, "test-v1", extract) == "text of a.pdf"
+    assert file_digest(first) != file_digest(renamed)
+
+def test_cached_extraction_does_not_cache_failures(tmp_path, cache_dir):
+    """Empty extractions are retried on the next call."""
+    pdf_path = write_file(tmp_path / "broken.pdf", b"broken")
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        return ""
+
+    cached_extraction(pdf_path, "test-v1", extract)
+    cached_extraction(pdf_path, "test-v1", extract)
+    assert len(calls) == 2
+
+def test_cached_extraction_missing_file(cache_dir):
+    """Unreadable paths fall through to the extractor without caching."""
+    assert cached_extraction("missing.pdf", "test-v1", lambda path: "text") == "text"
+    assert not cache_dir.exists()
+
+def test_evict_cache_removes_oldest_entries(tmp_path, cache_dir):
+    """Eviction should drop least recently used entries first."""
+    for i, name in enumerate(["old", "middle", "new"]):
+        pdf_path = write_file(tmp_path / f"{name}.pdf", name.encode())
+        cached_extraction(pdf_path, "test-v1", lambda path: "x" * 100)
+        entry = os.path.join(cache_dir, f"test-v1-{file_digest(pdf_path)}.json")
+        os.utime(entry, (1000 + i, 1000 + i))
+
+    evict_cache(max_bytes=250)
+    remaining = os.listdir(cache_dir)
+    assert len(remaining) == 2
+    assert f"test-v1-{file_digest(str(tmp_path / 'old.pdf'))}.json" not in remaining
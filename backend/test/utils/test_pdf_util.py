@@ -5,14 +5,14 @@ import os
 import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
-from utils.pdf_util import pdf_to_text, clean_text, read_pdfs
+from utils.pdf_util import pdf_to_text, clean_text, read_pdfs, parse_pdf, iter_pdf_pages
 
 @patch("fitz.open")
 def test_pdf_to_text(mock_fitz_open):
     """Test extracting text from a PDF file."""
     # ✅ Simulate a PDF document with one page
     mock_page = MagicMock()
-    mock_page.get_text.return_value = "Page 1 text"
+    mock_page.get_text.side_effect = lambda mode: {"text": "Page 1 text", "dict": {}}.get(mode, [])
 
     mock_doc = MagicMock()
     mock_doc.__iter__.return_value = [mock_page]  # ✅ Ensure it returns an iterable list
@@ -52,4 +52,41 @@ def test_read_pdfs(mock_pdf_to_text, mock_listdir):
     # Verify the functions are called with correct arguments
     mock_listdir.assert_called_once_with(folder_path)
     mock_pdf_to_text.assert_any_call(os.path.join(folder_path, 'file1.pdf'))
-    mock_pdf_to_text.assert_any_call(os.path.join(folder_path, 'file2.pdf'))
\ No newline at end of file
+    mock_pdf_to_text.assert_any_call(os.path.join(folder_path, 'file2.pdf'))
+def test_parse_pdf_shares_one_parse(tmp_path, monkeypatch):
+    """Parsing a real PDF should expose pages, first-page blocks and text views."""
+    monkeypatch.setattr("utils.pdf_cache.PDF_CACHE_DIR", str(tmp_path))
+    pdf_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../papers/test_papers/P1.1.pdf"))
+
+    document = parse_pdf(pdf_path)
+    assert document.name == "P1.1"
+    assert len(document.pages) > 1
+    assert document.first_page_blocks
+    assert document.text == pdf_to_text(pdf_path)
+
+    # ✅ The second parse is served from the cache without opening the file
+    with patch("fitz.open", side_effect=AssertionError("PDF parsed twice")):
+        assert parse_pdf(pdf_path).pages == document.pages
+
+def test_parse_pdf_invalid_file(tmp_path, monkeypatch):
+    """Unreadable files produce an empty document instead of raising."""
+    monkeypatch.setattr("utils.pdf_cache.PDF_CACHE_DIR", str(tmp_path))
+    fake_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../papers/test_papers/fake.pdf"))
+
+    document = parse_pdf(fake_path)
+    assert document.pages == []
+    assert document.text == ""
+
+def test_iter_pdf_pages_matches_pdf_to_text(tmp_path, monkeypatch):
+    """Streaming page extraction should produce the same text as a whole-document parse."""
+    monkeypatch.setattr("utils.pdf_cache.PDF_CACHE_DIR", str(tmp_path))
+    pdf_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../papers/test_papers/P1.2.pdf"))
+
+    pages = iter_pdf_pages(pdf_path)
+    assert not isinstance(pages, list)
+    assert "\n".join(pages) == pdf_to_text(pdf_path)
+
+def test_iter_pdf_pages_invalid_file():
+    """Unreadable files yield nothing instead of raising."""
+    fake_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../papers/test_papers/fake.pdf"))
+    assert list(iter_pdf_pages(fake_path)) == []
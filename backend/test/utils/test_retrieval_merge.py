@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.retrieval_merge import merge_ranked_matches
+
+def _match(vector_id, score):
+    return {"id": vector_id, "score": score, "metadata": {"text": f"text {vector_id}"}}
+
+def test_merge_orders_by_score_across_papers():
+    merged = merge_ranked_matches({
+        "paperA": [_match("a1", 0.9), _match("a2", 0.5)],
+        "paperB": [_match("b2", 0.6), _match("b1", 0.8)],
+    }, top_k=3)
+    assert [match["id"] for match in merged] == ["a1", "b1", "b2"]
+    assert merged[1]["paper_id"] == "paperB"
+    assert merged[1]["text"] == "text b1"
+    assert merged[1]["score"] == 0.8
+
+def test_merge_applies_per_paper_limit():
+    merged = merge_ranked_matches({
+        "paperA": [_match("a1", 0.9), _match("a2", 0.85), _match("a3", 0.8)],
+        "paperB": [_match("b1", 0.3)],
+    }, top_k=3, per_paper_limit=2)
+    assert [match["id"] for match in merged] == ["a1", "a2", "b1"]
+
+def test_merge_is_deterministic_and_drops_duplicates():
+    first = merge_ranked_matches({
+        "paperB": [_match("x", 0.5)],
+        "paperA": [_match("y", 0.5), _match("x", 0.5)],
+    }, top_k=5)
+    second = merge_ranked_matches({
+        "paperA": [_match("x", 0.5), _match("y", 0.5)],
+        "paperB": [_match("x", 0.5)],
+    }, top_k=5)
+    assert [(match["paper_id"], match["id"]) for match in first] == [("paperA", "x"), ("paperA", "y")]
+    assert [(match["paper_id"], match["id"]) for match in second] == [("paperA", "x"), ("paperA", "y")]
+
+def test_merge_handles_empty_results():
+    assert merge_ranked_matches({}, top_k=5) == []
+    assert merge_ranked_matches({"paperA": []}, top_k=5) == []
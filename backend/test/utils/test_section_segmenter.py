@@ -0,0 +1,73 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.section_segmenter import match_section_heading, detect_page_headings, label_chunks, iter_labelled_chunks
+
+@pytest.mark.parametrize("line, expected", [
+    ("Introduction", (True, "Background")),
+    ("2. Materials and Methods", (True, "Methods")),
+    ("3.1 Results", (True, "Results")),
+    ("RESULTS AND DISCUSSION", (True, "Results")),
+    ("IV. Discussion", (True, "Discussion")),
+    ("Conclusions:", (True, "Conclusion")),
+    ("References", (True, None)),
+    ("The results of the trial were positive", (False, None)),
+    ("", (False, None)),
+])
+def test_match_section_heading(line, expected):
+    """Known IMRaD headings, optionally numbered, map to review sections."""
+    assert match_section_heading(line) == expected
+
+def make_line(text, size=9.0, flags=4):
+    return {"spans": [{"text": text, "size": size, "flags": flags}]}
+
+def test_detect_page_headings_requires_distinct_styling():
+    """Heading words in body-styled text are ignored, styled ones are kept."""
+    body = [make_line("Body text that explains the approach in detail.") for _ in range(20)]
+    page = {"blocks": [
+        {"lines": [make_line("Background", size=14.0)]},
+        {"lines": body},
+        {"lines": [make_line("Methods")]},
+        {"lines": [make_line("Results", flags=16)]},
+        {"lines": [make_line("DISCUSSION")]},
+        {"type": 1},
+    ]}
+
+    assert detect_page_headings(page) == [
+        ("Background", "Background"),
+        ("Results", "Results"),
+        ("DISCUSSION", "Discussion"),
+    ]
+    assert detect_page_headings({}) == []
+
+def test_label_chunks_follows_headings():
+    """Chunks take the section they fall under, and unknown ones stay None."""
+    headings = [("1. Introduction", "Background"), ("2. Methods", "Methods"), ("References", None)]
+    chunks = [
+        "Title of the paper\nAuthor names",
+        "1. Introduction\nCOVID-19 is a disease.",
+        "It spread quickly.\n2. Methods\nWe searched databases for randomised trials and cohort studies.",
+        "Data were extracted twice.",
+        "References\n[1] A. Author",
+    ]
+
+    assert label_chunks(chunks, headings) == [None, "Background", "Methods", "Methods", None]
+    assert label_chunks(chunks, []) == [None] * len(chunks)
+
+def test_iter_labelled_chunks_uses_headings_found_so_far():
+    """Headings appended while chunks are consumed apply to the chunks that follow."""
+    headings = []
+
+    def chunks():
+        yield "Title of the paper"
+        headings.append(("2. Methods", "Methods"))
+        yield "2. Methods\nWe searched databases."
+        yield "Data were extracted twice."
+
+    assert list(iter_labelled_chunks(chunks(), headings)) == [
+        ("Title of the paper", None),
+        ("2. Methods\nWe searched databases.", "Methods"),
+        ("Data were extracted twice.", "Methods"),
+    ]
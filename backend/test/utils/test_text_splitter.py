@@ -4,7 +4,7 @@ import os
 import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
-from utils.text_splitter import split_text_into_chunks  
+from utils.text_splitter import split_text_into_chunks, iter_text_chunks
 
 @patch("utils.text_splitter.RecursiveCharacterTextSplitter")
 def test_split_text_into_chunks(mock_splitter):
@@ -18,3 +18,32 @@ def test_split_text_into_chunks(mock_splitter):
 
     assert result == ["Chunk 1", "Chunk 2"]
     mock_splitter.assert_called_once_with(chunk_size=10, chunk_overlap=2, separators=['\n\n', '\n', '.', '?', '!'])
+
+def test_iter_text_chunks_streams_pages():
+    """Streaming chunking should cover every page while keeping chunks within the size limit."""
+    pages = [
+        "\n".join(f"Page {p} sentence {s} reports a finding." for s in range(40))
+        for p in range(10)
+    ]
+    consumed = []
+
+    def page_stream():
+        for page in pages:
+            consumed.append(page)
+            yield page
+
+    chunks = iter_text_chunks(page_stream(), chunk_size=500, overlap=100)
+    first = next(chunks)
+    # ✅ Chunks are produced before the whole document has been read
+    assert len(consumed) < len(pages)
+
+    all_chunks = [first] + list(chunks)
+    assert all(len(chunk) <= 500 for chunk in all_chunks)
+    joined = "\n".join(all_chunks)
+    for p in range(10):
+        for s in range(40):
+            assert f"Page {p} sentence {s} reports" in joined
+
+def test_iter_text_chunks_empty_input():
+    """No pages means no chunks."""
+    assert list(iter_text_chunks([])) == []
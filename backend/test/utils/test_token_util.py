@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.token_util import count_tokens, CHARS_PER_TOKEN
+
+def test_count_tokens_with_tokenizer(monkeypatch):
+    """Token counts come from the model's tokenizer when it can be loaded."""
+    class DummyEncoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+    monkeypatch.setattr("utils.token_util._get_encoding", lambda model_name: DummyEncoding())
+
+    assert count_tokens("three word text") == 3
+    assert count_tokens("") == 0
+
+def test_count_tokens_without_tokenizer(monkeypatch):
+    """Without a tokenizer the count is estimated from the text length."""
+    monkeypatch.setattr("utils.token_util._get_encoding", lambda model_name: None)
+
+    assert count_tokens("a" * (CHARS_PER_TOKEN * 10)) == 11
+    assert count_tokens(None) == 0
+
+def test_truncate_tokens(monkeypatch):
+    """Text is cut at a token boundary, and left whole when it already fits."""
+    from utils.token_util import truncate_tokens
+
+    class DummyEncoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+        def decode(self, tokens):
+            return " ".join(tokens)
+    monkeypatch.setattr("utils.token_util._get_encoding", lambda model_name: DummyEncoding())
+
+    assert truncate_tokens("one two three four", 2) == "one two"
+    assert truncate_tokens("one two", 5) == "one two"
+    assert truncate_tokens("one two", 0) == ""
+
+    monkeypatch.setattr("utils.token_util._get_encoding", lambda model_name: None)
+    assert truncate_tokens("a" * 100, 2) == "a" * (2 * CHARS_PER_TOKEN)
@@ -0,0 +1,35 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.vector_layout import storage_namespace, section_filter, matches_filter, layout_tenant, lexical_namespace
+
+def test_storage_namespace_follows_layout(monkeypatch):
+    monkeypatch.setattr("utils.vector_layout.VECTOR_LAYOUT", "paper")
+    assert storage_namespace("paper1", "Methods", tenant_id="7") == "systematic_review/paper1/Methods"
+
+    monkeypatch.setattr("utils.vector_layout.VECTOR_LAYOUT", "tenant")
+    assert storage_namespace("paper1", "Methods", tenant_id="7") == "tenant/7"
+    # Without a tenant the per-paper layout is still used
+    assert storage_namespace("paper1", "Methods") == "systematic_review/paper1/Methods"
+
+def test_matches_filter():
+    metadata = {"source": "paper1", "section": "Methods"}
+    assert matches_filter(metadata, section_filter(["paper1", "paper2"], "Methods"))
+    assert not matches_filter(metadata, section_filter(["paper2"], "Methods"))
+    assert not matches_filter(metadata, section_filter(["paper1"], "Results"))
+    assert matches_filter(metadata, {"section": "Methods", "source": {"$nin": ["paper3"]}})
+    assert matches_filter(metadata, {"$and": [{"section": {"$ne": "Results"}}, {"source": "paper1"}]})
+    assert matches_filter(metadata, None)
+    with pytest.raises(ValueError):
+        matches_filter(metadata, {"source": {"$regex": "paper"}})
+
+def test_lexical_namespace_is_per_tenant(monkeypatch):
+    monkeypatch.setattr("utils.vector_layout.VECTOR_LAYOUT", "paper")
+    assert layout_tenant("7") is None
+    assert lexical_namespace("paper1", "Methods", layout_tenant("7")) == "systematic_review/paper1/Methods"
+
+    monkeypatch.setattr("utils.vector_layout.VECTOR_LAYOUT", "tenant")
+    assert layout_tenant("7") == "7"
+    assert lexical_namespace("paper1", "Methods", layout_tenant("7")) == "tenant/7/paper1/Methods"
@@ -0,0 +1,207 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+from utils.vector_segments import SegmentedNamespace, namespace_directory, list_segment_namespaces, quantize_int8
+
+def test_search_fetch_and_reopen(tmp_path):
+    """Vectors survive reopening the directory and are stored as float16."""
+    store = SegmentedNamespace(str(tmp_path), dimension=2)
+    store.upsert([("a", [1, 0], {"text": "A"}), ("b", [0, 2], {"text": "B"})])
+
+    reopened = SegmentedNamespace(str(tmp_path), dimension=2)
+    assert len(reopened) == 2
+    assert [(vector_id, metadata) for vector_id, _, metadata in reopened.search([0.1, 1], top_k=1)] == [("b", {"text": "B"})]
+    assert reopened.fetch(["b", "missing"])["b"]["values"] == [0.0, 1.0]
+    assert os.path.getsize(tmp_path / "segment-000000.f16") == 2 * 2 * 2
+
+def test_upsert_supersedes_and_delete_tombstones(tmp_path):
+    store = SegmentedNamespace(str(tmp_path), dimension=2)
+    store.upsert([("a", [1, 0], {"v": 1}), ("b", [0, 1], {"v": 2})])
+    store.upsert([("a", [0, 1], {"v": 3})])
+    store.delete(["b", "missing"])
+
+    results = store.search([0, 1], top_k=5)
+    assert [(vector_id, metadata) for vector_id, _, metadata in results] == [("a", {"v": 3})]
+    assert results[0][1] == pytest.approx(1.0)
+    assert len(SegmentedNamespace(str(tmp_path), dimension=2)) == 1
+
+def test_rolls_over_to_new_segments(tmp_path):
+    store = SegmentedNamespace(str(tmp_path), dimension=2, max_rows=2)
+    store.upsert([(f"v{i}", [1, i], {}) for i in range(5)])
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".f16")) == [
+        "segment-000000.f16", "segment-000001.f16", "segment-000002.f16"
+    ]
+    assert [vector_id for vector_id, _, _ in store.search([1, 4], top_k=1)] == ["v4"]
+
+def test_other_instances_see_appends(tmp_path):
+    """A second reader (e.g. another worker process) picks up rows appended after it opened the files."""
+    writer = SegmentedNamespace(str(tmp_path), dimension=2)
+    reader = SegmentedNamespace(str(tmp_path), dimension=2)
+    writer.upsert([("a", [1, 0], {})])
+    assert [vector_id for vector_id, _, _ in reader.search([1, 0], top_k=1)] == ["a"]
+
+def test_uncommitted_rows_are_ignored(tmp_path):
+    store = SegmentedNamespace(str(tmp_path), dimension=2)
+    store.upsert([("a", [1, 0], {})])
+    # Vector bytes written without their sidecar line, as after a crash mid-append
+    with open(tmp_path / "segment-000000.f16", "ab") as f:
+        f.write(np.ones(2, dtype=np.float16).tobytes())
+
+    store.upsert([("b", [0, 1], {})])
+    assert store.fetch(["b"])["b"]["values"] == [0.0, 1.0]
+    assert os.path.getsize(tmp_path / "segment-000000.f16") == 2 * 2 * 2
+
+def test_namespace_directories_round_trip(tmp_path):
+    os.makedirs(namespace_directory(str(tmp_path), "systematic_review/paper 1/Methods"))
+    assert list_segment_namespaces(str(tmp_path)) == ["systematic_review/paper 1/Methods"]
+
+def test_quantize_int8_round_trip():
+    from utils.vector_segments import quantize_int8
+    vectors = np.array([[0.5, -0.25, 0.0], [0.0, 0.0, 0.0]], dtype=np.float32)
+    codes, scales = quantize_int8(vectors)
+    assert codes.dtype == np.int8
+    assert codes[0].tolist() == [127, -64, 0]
+    np.testing.assert_allclose(codes[0] * scales[0], vectors[0], atol=0.01)
+    assert codes[1].tolist() == [0, 0, 0]
+
+def test_quantized_search_matches_exact_search(tmp_path):
+    """First-stage int8 scoring plus exact re-scoring should return the exact top results."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 32)).astype(np.float32)
+    store = SegmentedNamespace(str(tmp_path), dimension=32, max_rows=200)
+    store.upsert([(f"v{i}", vectors[i], {}) for i in range(500)])
+    assert os.path.getsize(tmp_path / "segment-000000.i8") == 200 * 32
+
+    for query in rng.normal(size=(5, 32)):
+        exact = store.search(query, top_k=10, quantized=False)
+        quantized = store.search(query, top_k=10, quantized=True)
+        assert [vector_id for vector_id, _, _ in quantized] == [vector_id for vector_id, _, _ in exact]
+        # Re-scored results carry the exact float16 scores
+        assert [score for _, score, _ in quantized] == pytest.approx([score for _, score, _ in exact], abs=1e-5)
+
+def test_quantized_search_on_segments_without_codes(tmp_path):
+    """Segments written before codes were stored are quantized when opened."""
+    store = SegmentedNamespace(str(tmp_path), dimension=2)
+    store.upsert([("a", [1, 0], {}), ("b", [0, 1], {})])
+    os.remove(tmp_path / "segment-000000.i8")
+    os.remove(tmp_path / "segment-000000.scale")
+
+    reopened = SegmentedNamespace(str(tmp_path), dimension=2, quantized_min_rows=1)
+    assert [vector_id for vector_id, _, _ in reopened.search([0.2, 1], top_k=1)] == ["b"]
+
+def test_append_to_segment_without_codes_stores_codes_of_old_rows(tmp_path):
+    """The first append to a segment without codes stores the codes of its existing rows."""
+    store = SegmentedNamespace(str(tmp_path), dimension=2)
+    store.upsert([("a", [1, 0], {}), ("b", [0, 1], {})])
+    os.remove(tmp_path / "segment-000000.i8")
+    os.remove(tmp_path / "segment-000000.scale")
+
+    reopened = SegmentedNamespace(str(tmp_path), dimension=2, quantized_min_rows=1)
+    reopened.upsert([("c", [-1, 0], {})])
+    assert os.path.getsize(tmp_path / "segment-000000.i8") == 3 * 2
+
+    fresh = SegmentedNamespace(str(tmp_path), dimension=2, quantized_min_rows=1, rescore_factor=1)
+    segment = fresh._segments[0]
+    codes, scales = quantize_int8(np.asarray(segment.array, dtype=np.float32))
+    assert np.array_equal(segment.codes, codes)
+    assert np.allclose(segment.scales, scales)
+
+def test_filtered_search(tmp_path):
+    """Only rows whose metadata matches the filter are scored, in both search paths."""
+    store = SegmentedNamespace(str(tmp_path), dimension=2, max_rows=2)
+    store.upsert([
+        ("a", [1, 0], {"source": "paper1"}),
+        ("b", [1, 0.1], {"source": "paper2"}),
+        ("c", [0, 1], {"source": "paper2"}),
+    ])
+    for quantized in (False, True):
+        results = store.search([1, 0], top_k=5, quantized=quantized, filter={"source": {"$eq": "paper2"}})
+        assert [vector_id for vector_id, _, _ in results] == ["b", "c"]
+    assert store.search([1, 0], top_k=5, filter={"source": "paper3"}) == []
+
+def test_compaction_reclaims_dead_rows(tmp_path):
+    """Once dead rows outnumber live ones, live rows are rewritten and the old segment files removed."""
+    store = SegmentedNamespace(str(tmp_path), dimension=2, max_rows=4, compact_min_dead_rows=4)
+    reader = SegmentedNamespace(str(tmp_path), dimension=2, max_rows=4)
+    store.upsert([(f"v{i}", [1, i], {"i": i}) for i in range(10)])
+    assert len(reader) == 10
+
+    store.delete([f"v{i}" for i in range(8)])
+    sidecars = sorted(name for name in os.listdir(tmp_path) if name.endswith(".jsonl"))
+    # Three segments of upserts and tombstones were replaced by one holding the two live rows
+    assert len(sidecars) == 1
+    assert not os.path.exists(tmp_path / "segment-000000.jsonl")
+
+    # Deleted IDs stay deleted for a reader opened before and one opened after the compaction
+    fresh = SegmentedNamespace(str(tmp_path), dimension=2, max_rows=4)
+    for namespace in (store, reader, fresh):
+        assert len(namespace) == 2
+        assert sorted(vector_id for vector_id, _, _ in namespace.search([1, 9], top_k=5)) == ["v8", "v9"]
+        assert namespace.fetch(["v8", "v0"])["v8"]["metadata"] == {"i": 8}
+        assert list(namespace.fetch(["v8", "v0"])) == ["v8"]
+
+    # Appends after the compaction go to new segments every reader picks up
+    store.upsert([("v10", [1, 10], {})])
+    assert len(reader) == len(fresh) == 3
+
+def test_compaction_is_skipped_while_most_rows_live(tmp_path):
+    store = SegmentedNamespace(str(tmp_path), dimension=2, max_rows=4, compact_min_dead_rows=2)
+    store.upsert([(f"v{i}", [1, i], {}) for i in range(8)])
+    store.delete(["v0", "v1"])
+    assert os.path.exists(tmp_path / "segment-000000.jsonl")
+    assert len(store) == 6
+
+def test_filter_masks_match_metadata_filter(tmp_path, monkeypatch):
+    """Filters on source and section are evaluated on per-row codes and agree with the metadata filter."""
+    from utils.vector_layout import matches_filter
+    store = SegmentedNamespace(str(tmp_path), dimension=2, max_rows=2)
+    records = [
+        ("a", [1, 0], {"source": "paper1", "section": "Methods"}),
+        ("b", [1, 0.1], {"source": "paper2", "section": "Methods"}),
+        ("c", [0, 1], {"source": "paper2", "section": "Results"}),
+        ("d", [1, 1], {"source": "paper3"}),
+    ]
+    store.upsert(records)
+    store.upsert([("b", [1, 0.1], {"source": "paper2", "section": "Results"})])
+    store.delete(["a"])
+    metadata = {vector_id: m for vector_id, _, m in records}
+    metadata["b"] = {"source": "paper2", "section": "Results"}
+    live = ["b", "c", "d"]
+
+    filters = [
+        {"source": {"$in": ["paper1", "paper2"]}, "section": {"$eq": "Results"}},
+        {"section": {"$ne": "Results"}},
+        {"source": {"$nin": ["paper2"]}},
+        {"$and": [{"source": "paper2"}, {"section": {"$in": ["Results", "Discussion"]}}]},
+        {"section": None},
+        {"source": "missing"},
+    ]
+    monkeypatch.setattr("utils.vector_segments.matches_filter", lambda *args: pytest.fail("filter evaluated per record"))
+    for metadata_filter in filters:
+        found = sorted(vector_id for vector_id, _, _ in store.search([1, 0], top_k=5, filter=metadata_filter))
+        assert found == [vector_id for vector_id in live if matches_filter(metadata[vector_id], metadata_filter)]
+
+def test_filters_on_other_metadata_fall_back(tmp_path):
+    store = SegmentedNamespace(str(tmp_path), dimension=2)
+    store.upsert([("a", [1, 0], {"source": "paper1", "year": 2020}), ("b", [0, 1], {"source": "paper1", "year": 2021})])
+    assert [vector_id for vector_id, _, _ in store.search([1, 0], top_k=5, filter={"year": 2021})] == ["b"]
+    with pytest.raises(ValueError):
+        store.search([1, 0], top_k=5, filter={"source": {"$regex": "paper"}})
+
+def test_compaction_by_another_instance_keeps_deletes(tmp_path):
+    """A reader that missed tombstones compacted away by another process must not bring the deleted rows back."""
+    a = SegmentedNamespace(str(tmp_path), dimension=2, compact_min_dead_rows=1)
+    a.upsert([("x", [1, 0], {}), ("y", [0, 1], {}), ("z", [1, 1], {})])
+
+    b = SegmentedNamespace(str(tmp_path), dimension=2, compact_min_dead_rows=1)
+    b.delete(["x", "y"])  # Two dead rows against one live row: b compacts
+    assert not os.path.exists(tmp_path / "segment-000000.jsonl")
+
+    assert [vector_id for vector_id, _, _ in a.search([1, 0], top_k=5)] == ["z"]
+    a.compact()
+    fresh = SegmentedNamespace(str(tmp_path), dimension=2)
+    assert [vector_id for vector_id, _, _ in fresh.search([1, 0], top_k=5)] == ["z"]
+    assert len(a) == len(b) == len(fresh) == 1
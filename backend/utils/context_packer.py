@@ -0,0 +1,60 @@
+import math
+from utils.token_util import count_tokens, truncate_tokens
+from config import (
+    LLM_MODEL_NAME,
+    LLM_CONTEXT_WINDOW,
+    LLM_MAX_OUTPUT_TOKENS,
+    TOKENS_PER_WORD,
+    OUTPUT_TOKEN_HEADROOM,
+    SECTION_CONTEXT_TOKEN_BUDGET,
+    PREVIOUS_SECTIONS_TOKEN_SHARE
+)
+
+CHUNK_SEPARATOR = '\n\n'
+
+def max_output_tokens(word_limit):
+    '''
+    Output tokens allowed for a section of `word_limit` words, within the model's output limit.
+    The prompt states the word limit; the cap leaves OUTPUT_TOKEN_HEADROOM above it for headings
+    and a model running slightly long, so a section is not cut off before it concludes.
+    '''
+    return min(LLM_MAX_OUTPUT_TOKENS, math.ceil(word_limit * TOKENS_PER_WORD * (1 + OUTPUT_TOKEN_HEADROOM)))
+
+def context_token_budget(fixed_prompt_tokens, output_tokens):
+    '''Tokens left for context once the fixed prompt (instructions and query) and the output are reserved.'''
+    available = LLM_CONTEXT_WINDOW - fixed_prompt_tokens - output_tokens
+    return max(min(SECTION_CONTEXT_TOKEN_BUDGET, available), 0)
+
+def pack_context(token_budget, previous_sections, chunks, previous_share=None, model_name=LLM_MODEL_NAME):
+    '''
+    Fills `token_budget` in priority order: first the opening of each earlier section,
+    sharing up to `previous_share` of the budget evenly, then whole chunks in their
+    ranked order while they fit. Returns (previous_content, research_data, tokens_used).
+    '''
+    previous_share = PREVIOUS_SECTIONS_TOKEN_SHARE if previous_share is None else previous_share
+    separator_tokens = count_tokens(CHUNK_SEPARATOR, model_name)
+    sections = [str(section) for section in previous_sections or [] if str(section).strip()]
+
+    summaries = []
+    used = 0
+    if sections:
+        per_section = int(token_budget * previous_share) // len(sections) - separator_tokens
+        for section in sections:
+            summary = truncate_tokens(section, per_section, model_name)
+            if summary:
+                summaries.append(summary)
+                used += count_tokens(summary, model_name) + separator_tokens
+
+    packed = []
+    skipped = 0
+    for chunk in chunks or []:
+        tokens = count_tokens(chunk, model_name) + separator_tokens
+        if used + tokens > token_budget:
+            skipped += 1  # A shorter, lower-ranked chunk may still fit
+            continue
+        packed.append(chunk)
+        used += tokens
+
+    if skipped:
+        print(f'✂️ {skipped} chunks left out of a {token_budget}-token context budget')
+    return CHUNK_SEPARATOR.join(summaries), CHUNK_SEPARATOR.join(packed), used
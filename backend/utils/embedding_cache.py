@@ -0,0 +1,170 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_BYTES,
+    EMBEDDING_CACHE_DTYPE,
+    EMBEDDING_MEMORY_CACHE_SIZE
+)
+
+# Hot entries are served from memory; everything else from the SQLite file
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+def embedding_cache_key(model, dimensions, text):
+    '''Cache key for a text embedded by a given model at a given dimension.'''
+    return f'{model}:{dimensions or "default"}:{hashlib.sha256(text.encode("utf-8")).hexdigest()}'
+
+def _connect():
+    os.makedirs(os.path.dirname(EMBEDDING_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(EMBEDDING_CACHE_PATH, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS embeddings ('
+        ' key TEXT PRIMARY KEY,'
+        ' dtype TEXT NOT NULL,'
+        ' vector BLOB NOT NULL,'
+        ' last_used REAL NOT NULL)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)')
+    # Running size of the stored vectors, kept by triggers so eviction checks read one row
+    conn.execute('CREATE TABLE IF NOT EXISTS embeddings_size (id INTEGER PRIMARY KEY CHECK (id = 0), total_bytes INTEGER NOT NULL)')
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS embeddings_size_insert AFTER INSERT ON embeddings BEGIN'
+        ' UPDATE embeddings_size SET total_bytes = total_bytes + LENGTH(NEW.vector); END'
+    )
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS embeddings_size_update AFTER UPDATE OF vector ON embeddings BEGIN'
+        ' UPDATE embeddings_size SET total_bytes = total_bytes + LENGTH(NEW.vector) - LENGTH(OLD.vector); END'
+    )
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS embeddings_size_delete AFTER DELETE ON embeddings BEGIN'
+        ' UPDATE embeddings_size SET total_bytes = total_bytes - LENGTH(OLD.vector); END'
+    )
+    if conn.execute('SELECT 1 FROM embeddings_size').fetchone() is None:
+        # Caches written before the size was tracked are measured once
+        conn.execute(
+            'INSERT OR IGNORE INTO embeddings_size (id, total_bytes) '
+            'SELECT 0, COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings'
+        )
+    return conn
+
+def _remember(key, vector):
+    with _memory_lock:
+        _memory[key] = vector
+        _memory.move_to_end(key)
+        while len(_memory) > EMBEDDING_MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+def get_cached_embeddings(model, dimensions, texts):
+    '''Returns a list aligned with `texts` holding each cached vector, or None on a miss.'''
+    keys = [embedding_cache_key(model, dimensions, text) for text in texts]
+    vectors = [None] * len(texts)
+
+    missing = {}
+    with _memory_lock:
+        for i, key in enumerate(keys):
+            if key in _memory:
+                _memory.move_to_end(key)
+                vectors[i] = list(_memory[key])
+            else:
+                missing.setdefault(key, []).append(i)
+    if not missing:
+        return vectors
+
+    try:
+        conn = _connect()
+        try:
+            rows = []
+            missing_keys = list(missing)
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(missing_keys), 500):
+                chunk = missing_keys[start:start + 500]
+                rows.extend(conn.execute(
+                    f'SELECT key, dtype, vector FROM embeddings WHERE key IN ({",".join("?" * len(chunk))})', chunk
+                ).fetchall())
+            if rows:
+                now = time.time()
+                conn.executemany('UPDATE embeddings SET last_used = ? WHERE key = ?', [(now, key) for key, _, _ in rows])
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f'⚠️ Embedding cache unavailable: {e}')
+        return vectors
+
+    for key, dtype, blob in rows:
+        vector = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+        _remember(key, vector)
+        for i in missing[key]:
+            vectors[i] = list(vector)
+    return vectors
+
+def store_embeddings(model, dimensions, texts, vectors):
+    '''
+    Caches vectors for texts, then evicts least recently used entries if over the size limit.
+    Returns the vectors as the cache stores them (rounded to EMBEDDING_CACHE_DTYPE), so callers
+    get the same values on a miss as on later hits.
+    '''
+    if not texts:
+        return []
+    now = time.time()
+    entries = {}
+    stored = []
+    for text, vector in zip(texts, vectors):
+        key = embedding_cache_key(model, dimensions, text)
+        compact = np.asarray(vector, dtype=EMBEDDING_CACHE_DTYPE)
+        entries[key] = (EMBEDDING_CACHE_DTYPE, compact.tobytes(), now)
+        rounded = compact.astype(np.float32).tolist()
+        _remember(key, rounded)
+        stored.append(list(rounded))
+
+    try:
+        conn = _connect()
+        try:
+            conn.executemany(
+                'INSERT INTO embeddings (key, dtype, vector, last_used) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET dtype = excluded.dtype, vector = excluded.vector, last_used = excluded.last_used',
+                [(key, *entry) for key, entry in entries.items()]
+            )
+            _evict(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f'⚠️ Failed to cache {len(entries)} embeddings: {e}')
+    return stored
+
+def _evict(conn, max_bytes=None):
+    max_bytes = EMBEDDING_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    total = conn.execute('SELECT total_bytes FROM embeddings_size').fetchone()[0]
+    if total <= max_bytes:
+        return
+
+    excess = total - max_bytes
+    freed = 0
+    stale = []
+    for key, size in conn.execute('SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used'):
+        stale.append((key,))
+        freed += size
+        if freed >= excess:
+            break
+    conn.executemany('DELETE FROM embeddings WHERE key = ?', stale)
+    with _memory_lock:
+        for (key,) in stale:
+            _memory.pop(key, None)
+
+def evict_embedding_cache(max_bytes=None):
+    '''Removes least recently used vectors until the cache fits in `max_bytes`.'''
+    conn = _connect()
+    try:
+        _evict(conn, max_bytes)
+    finally:
+        conn.close()
+
+def clear_memory_cache():
+    with _memory_lock:
+        _memory.clear()
@@ -1,7 +1,78 @@
-from config import embeddings
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    embeddings,
+    EMBEDDING_BATCH_TOKEN_LIMIT,
+    EMBEDDING_BATCH_MAX_INPUTS,
+    EMBEDDING_CONCURRENCY
+)
+from utils.token_util import batch_by_tokens
+from utils.embedding_cache import get_cached_embeddings, store_embeddings
+
+def _cache_model():
+    '''(model, dimensions) used as the embedding cache namespace, or None when the model is not known.'''
+    model = getattr(embeddings, 'model', None)
+    if not isinstance(model, str):
+        return None
+    dimensions = getattr(embeddings, 'dimensions', None)
+    return model, dimensions if isinstance(dimensions, int) else None
 
 def get_text_embedding(text):
-    '''Convert text into vector embeddings using OpenAI embeddings.'''
+    '''Convert text into vector embeddings using OpenAI embeddings, served from the embedding cache when possible.'''
     if not isinstance(text, str):
         raise TypeError('❌ get_text_embedding() received a non-string input.')
-    return embeddings.embed_query(text)
\ No newline at end of file
+
+    cache_model = _cache_model()
+    if cache_model:
+        cached = get_cached_embeddings(*cache_model, [text])[0]
+        if cached is not None:
+            return cached
+
+    vector = embeddings.embed_query(text)
+    if cache_model:
+        vector = store_embeddings(*cache_model, [text], [vector])[0]
+    return vector
+
+def make_embedding_batches(texts, token_limit=None, max_inputs=None):
+    '''Groups text indices into batches that stay within the per-request token and input limits.'''
+    return batch_by_tokens(
+        texts,
+        token_limit or EMBEDDING_BATCH_TOKEN_LIMIT,
+        max_inputs or EMBEDDING_BATCH_MAX_INPUTS,
+        model_name='text-embedding-ada-002'
+    )
+
+def get_text_embeddings(texts):
+    '''
+    Convert many texts into vector embeddings with as few OpenAI requests as possible.
+    Cached texts are not sent again and repeated texts are embedded once.
+    Batches are sent with bounded concurrency and vectors are returned in input order.
+    '''
+    if not all(isinstance(text, str) for text in texts):
+        raise TypeError('❌ get_text_embeddings() received a non-string input.')
+
+    cache_model = _cache_model()
+    vectors = get_cached_embeddings(*cache_model, texts) if cache_model else [None] * len(texts)
+
+    # Unique texts still to embed, each with the positions it fills
+    positions = {}
+    for i, text in enumerate(texts):
+        if vectors[i] is None:
+            positions.setdefault(text, []).append(i)
+    if not positions:
+        return vectors
+
+    pending = list(positions)
+    batches = make_embedding_batches(pending)
+
+    with ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY) as executor:
+        batch_vectors = executor.map(lambda batch: embeddings.embed_documents([pending[i] for i in batch]), batches)
+        for batch, batch_result in zip(batches, batch_vectors):
+            batch_texts = [pending[i] for i in batch]
+            if cache_model:
+                # Served as the cache stores them, so a text embeds the same whether it was cached or not
+                batch_result = store_embeddings(*cache_model, batch_texts, batch_result)
+            for text, vector in zip(batch_texts, batch_result):
+                for i in positions[text]:
+                    vectors[i] = vector
+
+    return vectors
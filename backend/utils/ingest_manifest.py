@@ -0,0 +1,89 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+from config import INGEST_MANIFEST_DIR
+from utils.vector_layout import paper_key
+
+# `tenant_id` below is the user a paper is stored for in the tenant layout (see `layout_tenant`),
+# None for the per-paper layout, where paper IDs are global.
+
+def chunk_id(paper_id, chunk, tenant_id=None):
+    '''Content-addressed vector ID: the same chunk text always maps to the same ID.'''
+    return f'{paper_key(paper_id, tenant_id)}-{hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:16]}'
+
+def _file_name(key):
+    return re.sub(r'[^\w.-]', '_', str(key))
+
+def _manifest_path(paper_id, tenant_id=None):
+    if tenant_id is None:
+        return os.path.join(INGEST_MANIFEST_DIR, _file_name(paper_id) + '.json')
+    return os.path.join(INGEST_MANIFEST_DIR, 'tenant', _file_name(tenant_id), _file_name(paper_id) + '.json')
+
+def load_manifest(paper_id, tenant_id=None):
+    '''
+    Returns what is known to be stored for a paper:
+    {'file_digest': digest of the ingested PDF or None, 'chunks': {chunk ID: section}}
+    '''
+    try:
+        with open(_manifest_path(paper_id, tenant_id), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return {'file_digest': manifest.get('file_digest'), 'chunks': dict(manifest.get('chunks', {}))}
+    except (OSError, ValueError, AttributeError):
+        return {'file_digest': None, 'chunks': {}}
+
+def save_manifest(paper_id, manifest, tenant_id=None):
+    '''Writes a paper's manifest atomically.'''
+    path = _manifest_path(paper_id, tenant_id)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # The paper ID is kept because sanitised file names cannot be mapped back to it
+            json.dump({**manifest, 'paper_id': paper_id}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f'⚠️ Failed to save ingestion manifest for "{paper_id}": {e}')
+
+def stored_paper_ids(tenant_id):
+    '''IDs of the papers of a tenant with chunks recorded as stored.'''
+    directory = os.path.dirname(_manifest_path('', tenant_id))
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    except OSError:
+        return []
+    paper_ids = []
+    for name in names:
+        try:
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(manifest, dict) and manifest.get('chunks'):
+            paper_ids.append(manifest.get('paper_id') or name[:-len('.json')])
+    return paper_ids
+
+def is_file_ingested(paper_id, digest, tenant_id=None):
+    '''True if the PDF with this content digest was fully stored for the paper.'''
+    return digest is not None and load_manifest(paper_id, tenant_id)['file_digest'] == digest
+
+def mark_file_ingested(paper_id, digest, tenant_id=None):
+    '''Records that every chunk of the PDF with this digest is stored, so the next ingest can skip it.'''
+    manifest = load_manifest(paper_id, tenant_id)
+    manifest['file_digest'] = digest
+    save_manifest(paper_id, manifest, tenant_id)
+
+def clear_manifests(paper_ids=None, tenant_id=None):
+    '''
+    Forgets what was stored for the given papers, or for every paper of every user when
+    `paper_ids` is None, e.g. after the index was recreated empty. Their next ingest stores every chunk again.
+    '''
+    if paper_ids is None:
+        shutil.rmtree(INGEST_MANIFEST_DIR, ignore_errors=True)
+        return
+    for paper_id in paper_ids:
+        try:
+            os.remove(_manifest_path(paper_id, tenant_id))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import math
+import sqlite3
+from collections import Counter
+from config import LEXICAL_INDEX_PATH, BM25_K1, BM25_B, BM25_SATURATION, LEXICAL_WEIGHT
+
+# Keeps drug names, gene symbols and trial acronyms whole: "IL-6", "BRCA1", "COVID-19", "5-FU"
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:[-/.][a-z0-9]+)*')
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'it',
+    'its', 'of', 'on', 'or', 'that', 'the', 'their', 'this', 'to', 'was', 'were', 'which', 'with'
+}
+
+def tokenize(text):
+    '''Lowercased terms of a text; compound terms are also indexed by their parts.'''
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.strip('.')
+        if not token or token in STOPWORDS:
+            continue
+        terms.append(token)
+        if re.search(r'[-/.]', token):
+            terms.extend(part for part in re.split(r'[-/.]', token) if part and part not in STOPWORDS)
+    return terms
+
+def _connect():
+    os.makedirs(os.path.dirname(LEXICAL_INDEX_PATH), exist_ok=True)
+    conn = sqlite3.connect(LEXICAL_INDEX_PATH, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS documents ('
+        ' namespace TEXT NOT NULL, id TEXT NOT NULL, length INTEGER NOT NULL, metadata TEXT NOT NULL,'
+        ' PRIMARY KEY (namespace, id))'
+    )
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS postings ('
+        ' namespace TEXT NOT NULL, term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL,'
+        ' PRIMARY KEY (namespace, term, id))'
+    )
+    # Removing a document looks its postings up by ID, which the (namespace, term, id) key cannot serve
+    conn.execute('CREATE INDEX IF NOT EXISTS postings_by_id ON postings (namespace, id)')
+    return conn
+
+def _remove(conn, namespace, ids):
+    conn.executemany('DELETE FROM postings WHERE namespace = ? AND id = ?', [(namespace, i) for i in ids])
+    conn.executemany('DELETE FROM documents WHERE namespace = ? AND id = ?', [(namespace, i) for i in ids])
+
+def index_documents(namespace, documents):
+    '''Adds or replaces (id, text, metadata) documents in a namespace's inverted index.'''
+    if not documents:
+        return
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        _remove(conn, namespace, [vector_id for vector_id, _, _ in documents])
+        for vector_id, text, metadata in documents:
+            terms = Counter(tokenize(text))
+            conn.execute(
+                'INSERT INTO documents (namespace, id, length, metadata) VALUES (?, ?, ?, ?)',
+                (namespace, vector_id, sum(terms.values()), json.dumps(metadata, ensure_ascii=False))
+            )
+            conn.executemany(
+                'INSERT INTO postings (namespace, term, id, tf) VALUES (?, ?, ?, ?)',
+                [(namespace, term, vector_id, tf) for term, tf in terms.items()]
+            )
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def delete_documents(namespace, ids):
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        _remove(conn, namespace, ids)
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+def move_documents(source, destination, ids, keep_source=False):
+    '''
+    Moves (or with `keep_source` copies) indexed documents to another namespace. IDs are
+    content-addressed, so a document already in the destination is the same one and is kept.
+    '''
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.executemany(
+            'INSERT OR REPLACE INTO documents (namespace, id, length, metadata)'
+            ' SELECT ?, id, length, metadata FROM documents WHERE namespace = ? AND id = ?',
+            [(destination, source, i) for i in ids]
+        )
+        conn.executemany(
+            'INSERT OR REPLACE INTO postings (namespace, term, id, tf)'
+            ' SELECT ?, term, id, tf FROM postings WHERE namespace = ? AND id = ?',
+            [(destination, source, i) for i in ids]
+        )
+        if not keep_source:
+            _remove(conn, source, ids)
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+def search_lexical(namespace, query, top_k):
+    '''BM25 search of a namespace. Returns matches shaped like vector store matches.'''
+    terms = set(tokenize(query))
+    if not terms or top_k <= 0:
+        return []
+
+    conn = _connect()
+    try:
+        count, average_length = conn.execute(
+            'SELECT COUNT(*), AVG(length) FROM documents WHERE namespace = ?', (namespace,)
+        ).fetchone()
+        if not count:
+            return []
+        postings = conn.execute(
+            f'SELECT term, id, tf FROM postings WHERE namespace = ? AND term IN ({",".join("?" * len(terms))})',
+            (namespace, *terms)
+        ).fetchall()
+        if not postings:
+            return []
+        ids = {vector_id for _, vector_id, _ in postings}
+        documents = {
+            vector_id: (length, metadata)
+            for vector_id, length, metadata in conn.execute(
+                f'SELECT id, length, metadata FROM documents WHERE namespace = ? AND id IN ({",".join("?" * len(ids))})',
+                (namespace, *ids)
+            )
+        }
+    finally:
+        conn.close()
+
+    document_frequency = Counter(term for term, _, _ in postings)
+    average_length = average_length or 1
+    scores = Counter()
+    for term, vector_id, tf in postings:
+        idf = math.log(1 + (count - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        length = documents[vector_id][0]
+        scores[vector_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+
+    return [
+        {'id': vector_id, 'score': score, 'metadata': json.loads(documents[vector_id][1])}
+        for vector_id, score in scores.most_common(top_k)
+    ]
+
+def fuse_rankings(dense_matches, lexical_matches, top_k, weight=None):
+    '''
+    Blends dense and BM25 matches into (1 - weight) * cosine + weight * saturated BM25.
+    BM25 is mapped to [0, 1) by a fixed saturation rather than by the namespace's best
+    score, so fused scores of different papers stay comparable. Keyword-only hits are
+    given the lowest dense score returned, an upper bound on their real similarity.
+    '''
+    weight = LEXICAL_WEIGHT if weight is None else weight
+    floor = min((match['score'] for match in dense_matches), default=0.0)
+    dense = {match['id']: match for match in dense_matches}
+    lexical = {match['id']: match for match in lexical_matches}
+
+    fused = []
+    for vector_id, match in {**lexical, **dense}.items():
+        bm25 = lexical[vector_id]['score'] if vector_id in lexical else 0.0
+        dense_score = dense[vector_id]['score'] if vector_id in dense else floor
+        fused.append(dict(match, score=(1 - weight) * dense_score + weight * bm25 / (bm25 + BM25_SATURATION)))
+    return sorted(fused, key=lambda match: (-match['score'], match['id']))[:top_k]
@@ -0,0 +1,61 @@
+import os
+
+class ParsedDocument:
+    '''
+    A PDF parsed once and shared by ingestion and the quality checks.
+
+    Holds the raw text of every page, the text blocks of the first page in
+    reading order (title, authors, affiliations, abstract), the PDF metadata
+    and the section headings found in the layout, so each consumer can derive
+    its own view without re-opening the file.
+    '''
+
+    def __init__(self, path, pages, first_page_blocks=None, metadata=None, headings=None):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.pages = pages
+        self.first_page_blocks = first_page_blocks or []
+        self.metadata = metadata or {}
+        self.headings = [tuple(heading) for heading in headings or []]
+
+    @property
+    def text(self):
+        '''Whole document text with blank lines removed and lines stripped.'''
+        return '\n'.join(
+            line.strip() for page in self.pages for line in page.split('\n') if line.strip()
+        )
+
+    def first_pages_text(self, max_pages=2):
+        '''Text of the first `max_pages` pages, one line per extracted line.'''
+        return ''.join(page + '\n' for page in self.pages[:max_pages])
+
+    def thematic_text(self):
+        '''Page text without bare page numbers and "Received:" footers.'''
+        text_pages = []
+        for page in self.pages:
+            if page.strip():
+                text_pages.append('\n'.join(
+                    line for line in page.split('\n')
+                    if not line.strip().isdigit()
+                    and not line.startswith('Received:')
+                ))
+        return '\n'.join(text_pages)
+
+    def to_dict(self):
+        return {
+            'pages': self.pages,
+            'first_page_blocks': self.first_page_blocks,
+            'metadata': self.metadata,
+            'headings': self.headings
+        }
+
+    @classmethod
+    def from_dict(cls, path, data):
+        data = data or {}
+        return cls(
+            path=path,
+            pages=data.get('pages', []),
+            first_page_blocks=data.get('first_page_blocks', []),
+            metadata=data.get('metadata', {}),
+            headings=data.get('headings', [])
+        )
@@ -0,0 +1,80 @@
+import os
+import json
+import hashlib
+from config import PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES
+
+def file_digest(path, block_size=1024 * 1024):
+    '''Returns the SHA-256 hex digest of a file's content.'''
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _entry_path(digest, extractor):
+    return os.path.join(PDF_CACHE_DIR, f'{extractor}-{digest}.json')
+
+def load_cached(digest, extractor):
+    '''Returns the cached extraction for a file digest, or None on a miss.'''
+    path = _entry_path(digest, extractor)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            value = json.load(f)
+        os.utime(path)  # Mark as recently used for eviction
+    except (OSError, ValueError):
+        return None
+    return value
+
+def store_cached(digest, extractor, value):
+    '''Writes an extraction to the cache atomically, then evicts old entries if over the size limit.'''
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    path = _entry_path(digest, extractor)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f'⚠️ Failed to cache extraction for {digest[:12]}: {e}')
+        return
+    evict_cache()
+
+def evict_cache(max_bytes=None):
+    '''Removes the least recently used cache entries until the cache fits in `max_bytes`.'''
+    max_bytes = PDF_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        entries = []
+        for name in os.listdir(PDF_CACHE_DIR):
+            if name.endswith('.json'):
+                stat = os.stat(os.path.join(PDF_CACHE_DIR, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+    except OSError:
+        return
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(PDF_CACHE_DIR, name))
+            total -= size
+        except OSError:
+            pass
+
+def cached_extraction(path, extractor, extract):
+    '''
+    Returns `extract(path)`, served from the on-disk cache when a file with
+    the same content was already processed by the same extractor version.
+    Empty results are not cached so that failed reads are retried.
+    '''
+    try:
+        digest = file_digest(path)
+    except OSError:
+        return extract(path)
+
+    value = load_cached(digest, extractor)
+    if value is None:
+        value = extract(path)
+        if value:
+            store_cached(digest, extractor, value)
+    return value
@@ -1,19 +1,75 @@
 import os
+import mmap
 from re import sub
 import fitz  # PyMuPDF
+from utils.pdf_cache import cached_extraction
+from utils.parsed_document import ParsedDocument
+from utils.section_segmenter import detect_page_headings
 
-def pdf_to_text(pdf_path):
-    '''Extracts text from a PDF file.'''
+# Bump when the parsing logic changes to invalidate cached documents
+PDF_EXTRACTOR_VERSION = 3
+PDF_DOCUMENT_EXTRACTOR = f'pymupdf-{fitz.VersionBind}-document-v{PDF_EXTRACTOR_VERSION}'
+
+def parse_pdf(pdf_path):
+    '''Parses a PDF into a ParsedDocument, reusing the cached parse if the file is unchanged.'''
+    return ParsedDocument.from_dict(pdf_path, cached_extraction(pdf_path, PDF_DOCUMENT_EXTRACTOR, _parse_pdf))
+
+def parse_pdfs(folder_path):
+    '''Parses every PDF in a folder once.'''
+    pdf_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith('.pdf')]
+    return [parse_pdf(pdf) for pdf in pdf_files]
+
+def _parse_pdf(pdf_path):
     try:
         doc = fitz.open(pdf_path)
-        text = '\n'.join([page.get_text('text') for page in doc])
+        try:
+            pages = []
+            first_page_blocks = []
+            headings = []
+            for page_no, page in enumerate(doc):
+                pages.append(page.get_text('text'))
+                headings.extend(detect_page_headings(page.get_text('dict')))
+                if page_no == 0:
+                    # Text blocks are (x0, y0, x1, y1, text, block_no, block_type), type 0 is text
+                    first_page_blocks = [
+                        block[4].strip() for block in page.get_text('blocks')
+                        if block[6] == 0 and block[4].strip()
+                    ]
+            metadata = {key: value for key, value in (doc.metadata or {}).items() if value}
+        finally:
+            doc.close()
+    except Exception as e:
+        print(f'Error reading PDF: {str(e)}')
+        return {}
+    return {'pages': pages, 'first_page_blocks': first_page_blocks, 'metadata': metadata, 'headings': headings}
+
+def pdf_to_text(pdf_path):
+    '''Extracts text from a PDF file.'''
+    return parse_pdf(pdf_path).text
 
-        # Clean text: remove unnecessary whitespace & empty lines
-        text = '\n'.join([line.strip() for line in text.split('\n') if line.strip()])
+def iter_pdf_pages(pdf_path, headings=None):
+    '''
+    Yields the cleaned text of each page, one page at a time.
+    The file is memory-mapped so its bytes stay in the OS page cache instead of
+    being copied onto the heap, and only the current page's text is held.
+    If a `headings` list is given, the section headings found on each page are appended to it.
+    '''
+    try:
+        with open(pdf_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            buffer = memoryview(mapped)
+            doc = fitz.open(stream=buffer, filetype='pdf')
+            try:
+                for page in doc:
+                    if headings is not None:
+                        headings.extend(detect_page_headings(page.get_text('dict')))
+                    text = '\n'.join(line.strip() for line in page.get_text('text').split('\n') if line.strip())
+                    if text:
+                        yield text
+            finally:
+                doc.close()
+                buffer.release()
     except Exception as e:
         print(f'Error reading PDF: {str(e)}')
-        return ''
-    return text
 
 def read_pdfs(folder_path):
     pdf_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith('.pdf')]
@@ -0,0 +1,44 @@
+import heapq
+
+def merge_ranked_matches(matches_by_paper, top_k, per_paper_limit=None):
+    '''
+    Global top_k over the matches of several papers, merged k-way with a heap.
+    Each paper's matches are ranked by score; at most `per_paper_limit` are taken
+    from one paper, and an ID found twice is kept once. Ties are broken by paper ID
+    then match ID, so the result does not depend on which query finished first.
+    Returns [{'id', 'score', 'paper_id', 'text', 'metadata', 'values'}] best first,
+    where 'values' is None unless the matches carried their vectors.
+    '''
+    ranked = {
+        paper_id: sorted(matches, key=lambda match: (-match['score'], match['id']))
+        for paper_id, matches in matches_by_paper.items()
+    }
+    heap = [
+        (-matches[0]['score'], paper_id, matches[0]['id'], 0)
+        for paper_id, matches in ranked.items() if matches
+    ]
+    heapq.heapify(heap)
+
+    merged = []
+    seen = set()
+    taken = {}
+    while heap and len(merged) < top_k:
+        _, paper_id, vector_id, position = heapq.heappop(heap)
+        match = ranked[paper_id][position]
+        if vector_id not in seen:
+            seen.add(vector_id)
+            taken[paper_id] = taken.get(paper_id, 0) + 1
+            metadata = match.get('metadata') or {}
+            merged.append({
+                'id': vector_id,
+                'score': match['score'],
+                'paper_id': paper_id,
+                'text': metadata.get('text', ''),
+                'metadata': metadata,
+                'values': match.get('values')
+            })
+        # The paper's next match only competes while the paper is under its quota
+        if position + 1 < len(ranked[paper_id]) and (per_paper_limit is None or taken.get(paper_id, 0) < per_paper_limit):
+            following = ranked[paper_id][position + 1]
+            heapq.heappush(heap, (-following['score'], paper_id, following['id'], position + 1))
+    return merged
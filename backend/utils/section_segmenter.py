@@ -0,0 +1,110 @@
+import re
+from collections import Counter
+
+# IMRaD headings and the review section they map to. Headings that end the
+# body of the paper (references, acknowledgements, ...) map to None so the
+# text after them is left for the LLM classifier.
+SECTION_HEADINGS = [
+    ('Background', r'introduction|background|literature review'),
+    ('Methods', r'(materials|patients|subjects) and methods|methods?|methodology|study design|experimental (procedures|section)'),
+    ('Results', r'results?( and discussion)?|findings'),
+    ('Discussion', r'discussion|general discussion'),
+    ('Conclusion', r'conclusions?|concluding remarks|summary and conclusions?'),
+    (None, r'abstract|references|bibliography|acknowledge?ments?|funding|conflicts? of interest|'
+           r'declaration of competing interest|author contributions|supplementary (material|data)'),
+]
+
+HEADING_PATTERN = re.compile(
+    r'^\s*(?:(?:\d+|[IVX]+)(?:\.\d+)*\.?\s*)?(?:' + '|'.join(f'(?P<h{i}>{p})' for i, (_, p) in enumerate(SECTION_HEADINGS)) + r')\s*:?\s*$',
+    re.IGNORECASE
+)
+
+MAX_HEADING_LENGTH = 60
+BOLD_FLAG = 16  # PyMuPDF span flag for bold text
+
+def match_section_heading(line):
+    '''Returns (True, section) if the line reads like an IMRaD heading, otherwise (False, None).'''
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_LENGTH:
+        return False, None
+    match = HEADING_PATTERN.match(line)
+    if not match:
+        return False, None
+    for i, (section, _) in enumerate(SECTION_HEADINGS):
+        if match.group(f'h{i}'):
+            return True, section
+    return False, None
+
+def detect_page_headings(page_dict):
+    '''
+    Finds IMRaD headings on a page from PyMuPDF's `get_text('dict')` output.
+    A line counts as a heading when it matches a known heading and is set apart
+    from the body text: a larger font, bold, or all capitals.
+    Returns a list of (heading text, section).
+    '''
+    lines = []
+    sizes = Counter()
+    for block in page_dict.get('blocks', []):
+        for line in block.get('lines', []):
+            spans = [span for span in line.get('spans', []) if span.get('text', '').strip()]
+            if spans:
+                lines.append(spans)
+                for span in spans:
+                    sizes[round(span.get('size', 0), 1)] += len(span['text'])
+
+    if not sizes:
+        return []
+    body_size = sizes.most_common(1)[0][0]
+
+    headings = []
+    for spans in lines:
+        text = ''.join(span['text'] for span in spans).strip()
+        is_heading, section = match_section_heading(text)
+        if not is_heading:
+            continue
+        larger = max(span.get('size', 0) for span in spans) >= body_size + 0.5
+        bold = all(span.get('flags', 0) & BOLD_FLAG for span in spans)
+        if larger or bold or text.isupper():
+            headings.append((text, section))
+    return headings
+
+def _normalise(line):
+    return ' '.join(line.split()).lower()
+
+def label_chunks(chunks, headings):
+    '''
+    Tags each chunk with the section it falls under, using the headings found in the layout.
+    Chunks are assumed to be in document order. A chunk spanning a heading takes the
+    section that covers most of its text. Returns None for chunks whose section
+    cannot be determined (e.g. before the first heading or after the references).
+    '''
+    return [section for _, section in iter_labelled_chunks(chunks, headings)]
+
+def iter_labelled_chunks(chunks, headings):
+    '''
+    Streaming version of `label_chunks`: yields (chunk, section) as chunks arrive. `headings`
+    may still be growing, as when `iter_pdf_pages` appends each page's headings before
+    yielding its text, so every chunk is labelled with the headings found up to it.
+    '''
+    heading_sections = {}
+    known = 0
+    current = None
+
+    for chunk in chunks:
+        for text, section in headings[known:]:
+            heading_sections[_normalise(text)] = section
+        known = len(headings)
+
+        coverage = Counter()
+        segment_start = 0
+        position = 0
+        for line in chunk.split('\n'):
+            key = _normalise(line)
+            if key in heading_sections:
+                coverage[current] += position - segment_start
+                current = heading_sections[key]
+                segment_start = position
+            position += len(line) + 1
+        coverage[current] += position - segment_start
+
+        yield chunk, coverage.most_common(1)[0][0] if coverage else current
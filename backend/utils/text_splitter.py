@@ -5,4 +5,26 @@ def split_text_into_chunks(text, chunk_size=1500, overlap=300):
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap, 
                                                    separators=['\n\n', '\n', '.', '?', '!'])
     chunks = text_splitter.split_text(text)
-    return chunks
\ No newline at end of file
+    return chunks
+
+def iter_text_chunks(texts, chunk_size=1500, overlap=300):
+    '''
+    Streaming version of `split_text_into_chunks` for an iterable of text pieces (e.g. pages).
+    Only a couple of chunks' worth of text is buffered at any time, so memory use
+    depends on the chunk size rather than the document size.
+    '''
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap, 
+                                                   separators=['\n\n', '\n', '.', '?', '!'])
+    buffer = ''
+    for text in texts:
+        buffer = f'{buffer}\n{text}' if buffer else text
+        if len(buffer) < 2 * chunk_size:
+            continue
+
+        chunks = text_splitter.split_text(buffer)
+        yield from chunks[:-1]
+        # The last chunk may continue on the next page, and already carries the overlap with the one before it
+        buffer = chunks[-1] if chunks else ''
+
+    if buffer:
+        yield from text_splitter.split_text(buffer)
\ No newline at end of file
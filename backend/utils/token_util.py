@@ -0,0 +1,47 @@
+from functools import lru_cache
+import tiktoken
+
+# Rough size of one token for English text, used when the tokenizer is unavailable
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name):
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except Exception as e:
+        print(f'⚠️ Tokenizer for {model_name} unavailable ({e}). Estimating token counts from length.')
+        return None
+
+def count_tokens(text, model_name='gpt-3.5-turbo'):
+    '''Counts the model tokens in `text`, estimating from its length if the tokenizer cannot be loaded.'''
+    if not text:
+        return 0
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text, max_tokens, model_name='gpt-3.5-turbo'):
+    '''The longest prefix of `text` that is at most `max_tokens` model tokens.'''
+    if not text or max_tokens <= 0:
+        return ''
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+def batch_by_tokens(texts, token_limit, max_items, model_name='gpt-3.5-turbo'):
+    '''Groups text indices, in order, into batches within `token_limit` tokens and `max_items` texts.'''
+    batches = []
+    batch, batch_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text, model_name)
+        if batch and (batch_tokens + tokens > token_limit or len(batch) >= max_items):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
@@ -0,0 +1,68 @@
+from config import VECTOR_LAYOUT
+
+PAPER_NAMESPACE_PREFIX = 'systematic_review/'
+TENANT_NAMESPACE_PREFIX = 'tenant/'
+
+def paper_namespace(paper_id, section):
+    '''Namespace of one paper's section in the per-paper layout; also keys its lexical index there.'''
+    return f'{PAPER_NAMESPACE_PREFIX}{paper_id}/{section}'
+
+def tenant_namespace(tenant_id):
+    '''Namespace holding every paper of one user in the tenant layout.'''
+    return f'{TENANT_NAMESPACE_PREFIX}{tenant_id}'
+
+def uses_tenant_layout(tenant_id):
+    return VECTOR_LAYOUT == 'tenant' and tenant_id is not None
+
+def layout_tenant(tenant_id):
+    '''The user that keys stored papers under the configured layout: `tenant_id` in the tenant layout, else None.'''
+    return tenant_id if uses_tenant_layout(tenant_id) else None
+
+def paper_key(paper_id, tenant_id=None):
+    '''
+    Identifies a paper in chunk IDs and manifests. File names are only unique per user,
+    so papers stored for a tenant are qualified by it.
+    '''
+    return paper_id if tenant_id is None else f'{tenant_id}/{paper_id}'
+
+def lexical_namespace(paper_id, section, tenant_id=None):
+    '''Lexical index key of one paper's section, kept apart per tenant like its chunk IDs.'''
+    if tenant_id is None:
+        return paper_namespace(paper_id, section)
+    return f'{tenant_namespace(tenant_id)}/{paper_id}/{section}'
+
+def storage_namespace(paper_id, section, tenant_id=None):
+    '''Namespace a chunk of `paper_id` in `section` is stored in under the configured layout.'''
+    if uses_tenant_layout(tenant_id):
+        return tenant_namespace(tenant_id)
+    return paper_namespace(paper_id, section)
+
+def section_filter(paper_ids, section):
+    '''Metadata filter selecting one section of the given papers inside a tenant namespace.'''
+    return {'source': {'$in': list(paper_ids)}, 'section': {'$eq': section}}
+
+def matches_filter(metadata, metadata_filter):
+    '''Evaluates the subset of Pinecone's filter language used here: $eq, $ne, $in, $nin, $and and bare values.'''
+    if not metadata_filter:
+        return True
+    metadata = metadata or {}
+    for key, condition in metadata_filter.items():
+        if key == '$and':
+            if not all(matches_filter(metadata, part) for part in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for operator, operand in condition.items():
+            if operator == '$eq' and value != operand:
+                return False
+            if operator == '$ne' and value == operand:
+                return False
+            if operator == '$in' and value not in operand:
+                return False
+            if operator == '$nin' and value in operand:
+                return False
+            if operator not in ('$eq', '$ne', '$in', '$nin'):
+                raise ValueError(f'Unsupported filter operator: {operator}')
+    return True
@@ -0,0 +1,517 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+import numpy as np
+from utils.vector_layout import matches_filter
+from config import LOCAL_QUANTIZED_SEARCH_MIN_VECTORS, LOCAL_RESCORE_FACTOR, LOCAL_COMPACT_MIN_DEAD_ROWS
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends from several processes are not serialised
+    fcntl = None
+
+SEGMENT_SUFFIX = '.f16'
+CODES_SUFFIX = '.i8'
+SCALES_SUFFIX = '.scale'
+SIDECAR_SUFFIX = '.jsonl'
+SCORE_BLOCK_ROWS = 8192  # Rows scored per block, bounding the float32 working copy
+RESCORE_MIN_CANDIDATES = 50
+FILTER_FIELDS = ('source', 'section')  # Metadata kept as per-row codes, so filters on them are array masks
+FILTER_OPERATORS = ('$eq', '$ne', '$in', '$nin')
+MISSING_CODE = -1      # Row without the field
+UNINDEXED_CODE = -2    # Row whose value cannot be coded; filters on the field fall back to the metadata
+UNKNOWN_CODE = -3      # Filter value no row holds
+
+def namespace_directory(root, namespace):
+    return os.path.join(root, quote(namespace, safe=''))
+
+def list_segment_namespaces(root):
+    '''Namespaces that have segment files under `root`.'''
+    try:
+        return [unquote(name) for name in os.listdir(root) if os.path.isdir(os.path.join(root, name))]
+    except OSError:
+        return []
+
+def _segment_number(name):
+    try:
+        return int(name[len('segment-'):-len(SIDECAR_SUFFIX)]) if name.startswith('segment-') and name.endswith(SIDECAR_SUFFIX) else None
+    except ValueError:
+        return None
+
+def _unit(values):
+    vector = np.asarray(values, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def quantize_int8(vectors):
+    '''Symmetric per-vector int8 codes: each row is approximately codes * scale.'''
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1, initial=0) / 127
+    codes = np.rint(vectors / np.where(scales == 0, 1, scales)[:, None])
+    return np.clip(codes, -127, 127).astype(np.int8), scales.astype(np.float32)
+
+def _append_rows(path, expected_bytes, data):
+    with open(path, 'ab') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() != expected_bytes:
+            f.truncate(expected_bytes)  # Drop rows of an append that never committed
+        f.write(data)
+
+class _Segment:
+    def __init__(self, directory, number):
+        self.vector_path = os.path.join(directory, f'segment-{number:06d}{SEGMENT_SUFFIX}')
+        self.codes_path = os.path.join(directory, f'segment-{number:06d}{CODES_SUFFIX}')
+        self.scales_path = os.path.join(directory, f'segment-{number:06d}{SCALES_SUFFIX}')
+        self.sidecar_path = os.path.join(directory, f'segment-{number:06d}{SIDECAR_SUFFIX}')
+        self.ids = []          # row -> ID, None for tombstones
+        self.fields = {field: np.zeros(0, dtype=np.int32) for field in FILTER_FIELDS}  # row -> value code
+        self.live = np.zeros(0, dtype=bool)
+        self.array = None      # read-only memmap of the committed float16 rows
+        self.codes = None      # int8 codes of the same rows
+        self.scales = None     # float32 scale per row
+        self.codes_on_disk = True  # False for segments written before codes were stored
+        self.removed = False   # Deleted by a compaction; its rows live on in later segments
+        self.sidecar_offset = 0
+
+    def release(self):
+        '''Drops the mappings of a segment whose rows are all superseded or deleted.'''
+        self.array = self.codes = self.scales = None
+
+    def remove_files(self):
+        # The sidecar goes first: without it the segment no longer exists for readers
+        for path in (self.sidecar_path, self.vector_path, self.codes_path, self.scales_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.removed = True
+
+class SegmentedNamespace:
+    '''
+    One namespace stored as append-only segment files:
+      segment-NNNNNN.f16    unit vectors as raw float16 rows
+      segment-NNNNNN.i8     the same rows quantized to int8 codes
+      segment-NNNNNN.scale  one float32 scale per row for the codes
+      segment-NNNNNN.jsonl  one {"id", "metadata"} record per row, or {"id", "deleted": true}
+    A sidecar line commits its row, so a crash mid-append leaves no half-written vector visible.
+    Later records supersede earlier ones with the same ID. Segments are opened with mmap, so
+    every process serving the corpus shares one copy through the page cache, and appends by
+    other processes are picked up on the next read. The `source` and `section` of each row are
+    kept as integer codes, so filtered searches build their row masks without visiting every record.
+    Once superseded and deleted rows outnumber the live ones, the live rows are rewritten into
+    new segments and the old segment files are removed, oldest first.
+    '''
+
+    def __init__(self, directory, dimension, max_rows=65536, quantized_min_rows=None, rescore_factor=None,
+                 compact_min_dead_rows=None):
+        self.directory = directory
+        self.dimension = dimension
+        self.max_rows = max_rows
+        self.quantized_min_rows = LOCAL_QUANTIZED_SEARCH_MIN_VECTORS if quantized_min_rows is None else quantized_min_rows
+        self.rescore_factor = rescore_factor or LOCAL_RESCORE_FACTOR
+        self.compact_min_dead_rows = LOCAL_COMPACT_MIN_DEAD_ROWS if compact_min_dead_rows is None else compact_min_dead_rows
+        self._segments = []
+        self._locations = {}   # ID -> (segment number, row)
+        self._metadata = {}    # ID -> metadata
+        self._values = {field: {} for field in FILTER_FIELDS}  # value -> code of each filter field
+        self._unindexed = set()  # Filter fields holding values that cannot be coded
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def __len__(self):
+        self.refresh()
+        return len(self._locations)
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def refresh(self):
+        '''Reads records committed since the last refresh, by this or any other process.'''
+        with self._lock:
+            number = max(len(self._segments) - 1, 0)
+            changed = False
+            while True:
+                if number == len(self._segments):
+                    segment = _Segment(self.directory, number)
+                    if not os.path.exists(segment.sidecar_path):
+                        if self._segments and not self._segments[-1].removed:
+                            break
+                        # Opening, or a compaction removed segments not fully read here. The segments
+                        # left on disk hold every live row, so they are read again from the first one.
+                        number = self._reload()
+                        changed = True
+                        if number is None:
+                            break
+                        continue
+                    self._segments.append(segment)
+                try:
+                    changed = self._read_new_records(number) or changed
+                except FileNotFoundError:
+                    # Another process compacted the segment away, possibly before its last records
+                    # (e.g. tombstones) were read here, so everything is read again from disk
+                    number = self._reload()
+                    changed = True
+                    if number is None:
+                        break
+                    continue
+                number += 1
+            if changed:
+                for segment in self._segments[:-1]:
+                    if segment.array is not None and not segment.live.any():
+                        segment.release()
+
+    def _reload(self):
+        '''Forgets every record read so far; returns the number of the first segment on disk, or None.'''
+        self._segments = []
+        self._locations = {}
+        self._metadata = {}
+        self._values = {field: {} for field in FILTER_FIELDS}
+        self._unindexed = set()
+        try:
+            numbers = [_segment_number(name) for name in os.listdir(self.directory)]
+        except OSError:
+            return None
+        numbers = [number for number in numbers if number is not None]
+        if not numbers:
+            return None
+        first = min(numbers)
+        for number in range(first):
+            placeholder = _Segment(self.directory, number)
+            placeholder.removed = True
+            self._segments.append(placeholder)
+        return first
+
+    def _read_new_records(self, number):
+        '''
+        Reads a segment's newly committed records; returns True if there were any.
+        Raises FileNotFoundError if a compaction removed the segment.
+        '''
+        segment = self._segments[number]
+        try:
+            with open(segment.sidecar_path, 'rb') as f:
+                f.seek(segment.sidecar_offset)
+                data = f.read()
+        except FileNotFoundError:
+            raise
+        except OSError:  # Unreadable for now; retried on the next refresh
+            return False
+        # Only newline-terminated lines are committed
+        data = data[:data.rfind(b'\n') + 1]
+        if not data:
+            return False
+
+        lines = data.splitlines()
+        start = len(segment.ids)
+        segment.ids.extend([None] * len(lines))
+        segment.live = np.concatenate([segment.live, np.zeros(len(lines), dtype=bool)])
+        codes = {field: np.full(len(lines), MISSING_CODE, dtype=np.int32) for field in FILTER_FIELDS}
+
+        for row, line in enumerate(lines, start=start):
+            record = json.loads(line)
+            vector_id = record['id']
+            previous = self._locations.pop(vector_id, None)
+            if previous is not None:
+                self._segments[previous[0]].live[previous[1]] = False
+            self._metadata.pop(vector_id, None)
+            if not record.get('deleted'):
+                segment.ids[row] = vector_id
+                segment.live[row] = True
+                self._locations[vector_id] = (number, row)
+                self._metadata[vector_id] = record.get('metadata') or {}
+                for field in FILTER_FIELDS:
+                    codes[field][row - start] = self._value_code(field, self._metadata[vector_id].get(field))
+        for field in FILTER_FIELDS:
+            segment.fields[field] = np.concatenate([segment.fields[field], codes[field]])
+
+        segment.sidecar_offset += len(data)
+        rows = len(segment.ids)
+        # A compaction may remove the vectors after the sidecar was read; the caller then reloads
+        segment.array = np.memmap(segment.vector_path, dtype=np.float16, mode='r', shape=(rows, self.dimension))
+        try:
+            segment.codes = np.memmap(segment.codes_path, dtype=np.int8, mode='r', shape=(rows, self.dimension))
+            segment.scales = np.memmap(segment.scales_path, dtype=np.float32, mode='r', shape=(rows,))
+            segment.codes_on_disk = True
+        except (OSError, ValueError):
+            # Segments written before codes were stored are quantized in memory
+            segment.codes, segment.scales = quantize_int8(segment.array)
+            segment.codes_on_disk = False
+        return True
+
+    def _append(self, records):
+        '''Appends (ID, vector or None for a tombstone, metadata) records under the directory lock.'''
+        with self._lock, self._file_lock():
+            self.refresh()
+            self._append_locked(records)
+            self._compact_if_mostly_dead()
+
+    def _append_locked(self, records, new_segment=False):
+        while records:
+            last = self._segments[-1] if self._segments else None
+            if new_segment or last is None or last.removed or len(last.ids) >= self.max_rows:
+                self._segments.append(_Segment(self.directory, len(self._segments)))
+                new_segment = False
+            segment = self._segments[-1]
+            room = self.max_rows - len(segment.ids)
+            batch, records = records[:room], records[room:]
+
+            vectors = np.zeros((len(batch), self.dimension), dtype=np.float16)
+            lines = []
+            for i, (vector_id, vector, metadata) in enumerate(batch):
+                if vector is None:
+                    lines.append(json.dumps({'id': vector_id, 'deleted': True}))
+                else:
+                    vectors[i] = _unit(vector)
+                    lines.append(json.dumps({'id': vector_id, 'metadata': metadata or {}}, ensure_ascii=False))
+
+            codes, scales = quantize_int8(vectors)
+
+            # Vectors and codes first; the sidecar lines then commit them
+            committed = len(segment.ids)
+            if committed and not segment.codes_on_disk:
+                self._write_codes(segment)
+            _append_rows(segment.vector_path, committed * self.dimension * 2, vectors.tobytes())
+            _append_rows(segment.codes_path, committed * self.dimension, codes.tobytes())
+            _append_rows(segment.scales_path, committed * 4, scales.tobytes())
+            with open(segment.sidecar_path, 'ab') as f:
+                f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            self.refresh()
+
+    def _compact_if_mostly_dead(self):
+        total = sum(len(segment.ids) for segment in self._segments if not segment.removed)
+        dead = total - len(self._locations)
+        if dead >= self.compact_min_dead_rows and dead > len(self._locations):
+            self._compact_locked()
+
+    def compact(self):
+        '''Rewrites the live rows into new segments and removes the old ones, reclaiming superseded and deleted rows.'''
+        with self._lock, self._file_lock():
+            self.refresh()
+            self._compact_locked()
+
+    def _matches_disk(self):
+        '''True if every record committed on disk has been read here.'''
+        try:
+            on_disk = {number for number in map(_segment_number, os.listdir(self.directory)) if number is not None}
+        except OSError:
+            return False
+        held = {number for number, segment in enumerate(self._segments) if not segment.removed}
+        if on_disk != held:
+            return False
+        for number in held:
+            segment = self._segments[number]
+            try:
+                with open(segment.sidecar_path, 'rb') as f:
+                    f.seek(segment.sidecar_offset)
+                    if b'\n' in f.read():
+                        return False
+            except OSError:
+                return False
+        return True
+
+    def _compact_locked(self):
+        # Compacting rewrites every row this instance believes live, so it must have read every
+        # record on disk, including tombstones another process wrote before its own compaction
+        if not self._matches_disk():
+            self._reload()
+            self.refresh()
+            if not self._matches_disk():
+                print(f'⚠️ Skipped compacting {self.directory}: its segments changed while being read')
+                return
+        old = [segment for segment in self._segments if not segment.removed]
+        dead = sum(len(segment.ids) for segment in old) - len(self._locations)
+        live_rows = {}
+        for vector_id, (number, row) in self._locations.items():
+            live_rows.setdefault(number, []).append((vector_id, row))
+
+        # Rows are copied segment by segment to bound the working set; the copies start a new segment
+        new_segment = True
+        for number in sorted(live_rows):
+            segment = self._segments[number]
+            self._append_locked(
+                [(vector_id, segment.array[row], self._metadata[vector_id]) for vector_id, row in live_rows[number]],
+                new_segment=new_segment
+            )
+            new_segment = False
+        # Oldest first, so an interrupted compaction never leaves a record without the records that supersede it
+        for segment in old:
+            try:
+                segment.remove_files()
+            except OSError as e:
+                print(f'⚠️ Failed to remove compacted segment files in {self.directory}: {e}')
+                break
+            segment.release()
+        print(f'📦 Compacted {self.directory}: {dead} dead rows removed, {len(self._locations)} kept')
+
+    def _write_codes(self, segment):
+        '''Stores the in-memory codes of a segment written before codes were, so appends extend them.'''
+        for path, data in ((segment.codes_path, segment.codes), (segment.scales_path, segment.scales)):
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+            os.replace(temp_path, path)
+        segment.codes_on_disk = True
+
+    def upsert(self, vectors):
+        self._append([(vector_id, values, metadata) for vector_id, values, metadata in vectors])
+
+    def delete(self, ids):
+        with self._lock:
+            self.refresh()
+            existing = [vector_id for vector_id in ids if vector_id in self._locations]
+        if existing:
+            self._append([(vector_id, None, None) for vector_id in existing])
+
+    def list_ids(self):
+        self.refresh()
+        with self._lock:
+            return list(self._locations)
+
+    def fetch(self, ids):
+        self.refresh()
+        with self._lock:
+            vectors = {}
+            for vector_id in ids:
+                location = self._locations.get(vector_id)
+                if location is not None:
+                    number, row = location
+                    vectors[vector_id] = {
+                        'id': vector_id,
+                        'values': self._segments[number].array[row].astype(np.float32).tolist(),
+                        'metadata': dict(self._metadata[vector_id])
+                    }
+            return vectors
+
+    def _value_code(self, field, value):
+        if value is None:
+            return MISSING_CODE
+        values = self._values[field]
+        try:
+            return values.setdefault(value, len(values))
+        except TypeError:
+            self._unindexed.add(field)
+            return UNINDEXED_CODE
+
+    def _is_coded(self, metadata_filter):
+        '''True if the filter only tests coded fields with the supported operators.'''
+        for key, condition in metadata_filter.items():
+            if key == '$and':
+                if not all(self._is_coded(part) for part in condition):
+                    return False
+                continue
+            if key not in FILTER_FIELDS or key in self._unindexed:
+                return False
+            if isinstance(condition, dict):
+                if any(operator not in FILTER_OPERATORS for operator in condition):
+                    return False
+                operands = [value for operator, operand in condition.items()
+                            for value in (operand if operator in ('$in', '$nin') else [operand])]
+            else:
+                operands = [condition]
+            if not all(isinstance(value, (str, int, float, bool, type(None))) for value in operands):
+                return False
+        return True
+
+    def _lookup(self, field, value):
+        return MISSING_CODE if value is None else self._values[field].get(value, UNKNOWN_CODE)
+
+    def _coded_mask(self, segment, metadata_filter):
+        '''Rows of a segment matching a filter accepted by `_is_coded`, evaluated on the value codes.'''
+        mask = np.ones(len(segment.ids), dtype=bool)
+        for key, condition in metadata_filter.items():
+            if key == '$and':
+                for part in condition:
+                    mask &= self._coded_mask(segment, part)
+                continue
+            codes = segment.fields[key]
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            for operator, operand in condition.items():
+                if operator in ('$eq', '$ne'):
+                    matched = codes == self._lookup(key, operand)
+                else:
+                    matched = np.isin(codes, [self._lookup(key, value) for value in operand])
+                mask &= matched if operator in ('$eq', '$in') else ~matched
+        return mask
+
+    def _allowed_rows(self, metadata_filter):
+        '''Per-segment masks of the live rows whose metadata matches the filter.'''
+        if self._is_coded(metadata_filter):
+            return [self._coded_mask(segment, metadata_filter) & segment.live for segment in self._segments]
+
+        # Filters on other metadata are evaluated record by record
+        masks = [np.zeros(len(segment.ids), dtype=bool) for segment in self._segments]
+        for vector_id, (number, row) in self._locations.items():
+            if matches_filter(self._metadata[vector_id], metadata_filter):
+                masks[number][row] = True
+        return masks
+
+    def _scan(self, query, top_k, use_codes, allowed=None):
+        '''Scores every live (and allowed) row block by block and returns the best (score, segment, row) candidates.'''
+        candidates = []
+        for number, segment in enumerate(self._segments):
+            if segment.array is None:
+                continue  # Released: every row is superseded or deleted
+            rows = len(segment.ids)
+            for start in range(0, rows, SCORE_BLOCK_ROWS):
+                end = min(start + SCORE_BLOCK_ROWS, rows)
+                if use_codes:
+                    scores = (segment.codes[start:end] @ query) * segment.scales[start:end]
+                else:
+                    scores = segment.array[start:end] @ query
+                scores[~segment.live[start:end]] = -np.inf
+                if allowed is not None:
+                    scores[~allowed[number][start:end]] = -np.inf
+                k = min(top_k, end - start)
+                best = np.argpartition(-scores, k - 1)[:k]
+                candidates.extend(
+                    (float(scores[i]), number, start + int(i)) for i in best if np.isfinite(scores[i])
+                )
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return candidates[:top_k]
+
+    def _rescore(self, query, candidates):
+        '''Exact scores for candidates from the float16 rows, reading only the candidate rows.'''
+        by_segment = {}
+        for _, number, row in candidates:
+            by_segment.setdefault(number, []).append(row)
+        rescored = []
+        for number, rows in by_segment.items():
+            scores = self._segments[number].array[rows].astype(np.float32) @ query
+            rescored.extend((float(score), number, row) for score, row in zip(scores, rows))
+        rescored.sort(key=lambda candidate: candidate[0], reverse=True)
+        return rescored
+
+    def search(self, vector, top_k, quantized=None, filter=None):
+        '''
+        Returns [(ID, cosine score, metadata)] of the top_k live vectors whose metadata matches `filter`.
+        Large namespaces are scanned on the int8 codes first and only the best
+        `top_k * rescore_factor` candidates are re-scored against the float16 vectors.
+        '''
+        self.refresh()
+        query = _unit(vector)
+        with self._lock:
+            allowed = self._allowed_rows(filter) if filter else None
+            if quantized is None:
+                quantized = len(self._locations) >= self.quantized_min_rows
+            if quantized:
+                pool = max(top_k * self.rescore_factor, RESCORE_MIN_CANDIDATES)
+                candidates = self._rescore(query, self._scan(query, pool, use_codes=True, allowed=allowed))[:top_k]
+            else:
+                candidates = self._scan(query, top_k, use_codes=False, allowed=allowed)
+
+            results = []
+            for score, number, row in candidates:
+                vector_id = self._segments[number].ids[row]
+                results.append((vector_id, score, dict(self._metadata[vector_id])))
+            return results